@@ -0,0 +1,277 @@
+"""
+Batched fact extraction for chat ingestion.
+
+Each `memory.add` call sends the long custom fact-extraction prompt to the LLM,
+so per-message ingestion is dominated by fixed prompt overhead. Here several
+messages from the same agent_id/run_id scope share ONE extraction call: the
+messages are numbered, the LLM tags every fact with its source number, and the
+facts are then written with the metadata of the message that produced them.
+
+The post-extraction stage (dedup against existing memories, ADD/UPDATE/DELETE)
+mirrors mem0's `Memory._add_to_vector_store` and runs once per source message
+that actually yielded facts.
+"""
+import asyncio
+import json
+import os
+from copy import deepcopy
+from typing import Any, Awaitable, Callable
+
+# mem0 helpers are imported where used: main imports this module at startup,
+# before mem0 itself has been loaded by the background initializer
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+BATCH_MAX_MESSAGES = int(os.getenv("MEMORY_BATCH_MAX_MESSAGES", "20"))
+# Window for coalescing single /memories/add calls; 0 disables micro-batching
+BATCH_WINDOW_MS = int(os.getenv("MEMORY_BATCH_WINDOW_MS", "0"))
+
+BATCH_PROMPT_SUFFIX = """
+═══════════════════════════════════════════════════════════════
+📦 CHẾ ĐỘ NHIỀU TIN NHẮN
+═══════════════════════════════════════════════════════════════
+Input gồm NHIỀU tin nhắn, mỗi tin được đánh số: [1], [2], ...
+Áp dụng TẤT CẢ quy tắc trên cho TỪNG tin nhắn một cách độc lập.
+Mỗi fact PHẢI ghi rõ số thứ tự tin nhắn tạo ra nó.
+Tin nhắn không có thông tin cần trích xuất → không tạo fact nào.
+
+Trả về JSON: {"facts": [{"source": 1, "text": "..."}, {"source": 3, "text": "..."}]}
+"""
+
+
+def scope_key(add_kwargs: dict) -> str:
+    """Batching key: messages are only coalesced within one agent_id/run_id scope."""
+    return f"{add_kwargs.get('agent_id')}|{add_kwargs.get('run_id') or ''}"
+
+
+def _parse_json_response(response: str) -> dict:
+    from mem0.memory.utils import extract_json, remove_code_blocks
+
+    cleaned = remove_code_blocks(response or "")
+    if not cleaned:
+        return {}
+    try:
+        return json.loads(cleaned, strict=False)
+    except json.JSONDecodeError:
+        return json.loads(extract_json(response), strict=False)
+
+
+# =============================================================================
+# Extraction
+# =============================================================================
+
+def extract_facts_batch(memory, items: list[dict]) -> list[list[str]]:
+    """
+    Extract facts for several messages with a single LLM call.
+
+    `items` are `{"messages": [...], "add_kwargs": {...}}` dicts as built by
+    `prepare_add`. Returns one list of facts per item, in input order.
+    """
+    lines = []
+    for index, item in enumerate(items, 1):
+        sender = item["add_kwargs"]["metadata"].get("sender_name") or item["add_kwargs"].get("user_id")
+        content = " ".join(m["content"] for m in item["messages"]).replace("\n", " | ")
+        lines.append(f"[{index}] {sender}: {content}")
+
+    system_prompt = (memory.config.custom_fact_extraction_prompt or "") + BATCH_PROMPT_SUFFIX
+    response = memory.llm.generate_response(
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "Input:\n" + "\n".join(lines)},
+        ],
+        response_format={"type": "json_object"},
+    )
+
+    facts_per_item: list[list[str]] = [[] for _ in items]
+    try:
+        facts = _parse_json_response(response).get("facts", [])
+    except Exception as e:
+        print(f"[Memory Service] Batch extraction returned invalid JSON: {e}")
+        return facts_per_item
+
+    for fact in facts:
+        if isinstance(fact, dict):
+            text = fact.get("text") or fact.get("fact")
+            try:
+                index = int(fact.get("source", 0)) - 1
+            except (TypeError, ValueError):
+                continue
+        elif len(items) == 1:
+            # Unattributed facts are only safe to keep for a single message
+            text, index = fact, 0
+        else:
+            continue
+        if text and 0 <= index < len(items):
+            facts_per_item[index].append(str(text).strip())
+    return facts_per_item
+
+
+def embed_texts(memory, texts: list[str], memory_action: str = "add") -> list[list[float]]:
+    """Embed many texts, in one batch when the embedder supports it."""
+    embed_batch = getattr(memory.embedding_model, "embed_batch", None)
+    if embed_batch is not None:
+        return list(embed_batch(texts, memory_action))
+    return [memory.embedding_model.embed(text, memory_action) for text in texts]
+
+
+def apply_facts(memory, facts: list[str], add_kwargs: dict) -> list[dict]:
+    """
+    Reconcile extracted facts with existing memories (mem0 update stage).
+
+    Raises when the update-stage LLM call fails; nothing has been written then.
+    """
+    from mem0.configs.prompts import get_update_memory_messages
+    from mem0.memory.main import _build_filters_and_metadata
+
+    metadata, filters = _build_filters_and_metadata(
+        user_id=add_kwargs.get("user_id"),
+        agent_id=add_kwargs.get("agent_id"),
+        run_id=add_kwargs.get("run_id"),
+        input_metadata=add_kwargs.get("metadata"),
+    )
+    embeddings = embed_texts(memory, facts)
+    new_embeddings = dict(zip(facts, embeddings))
+
+    # Existing memories similar to any new fact, de-duplicated by id
+    existing: dict[str, str] = {}
+    for fact, vector in zip(facts, embeddings):
+        for mem in memory.vector_store.search(query=fact, vectors=vector, limit=5, filters=filters):
+            existing[mem.id] = mem.payload.get("data", "")
+
+    # Integer ids guard against UUID hallucinations (same trick as mem0)
+    id_map = {str(i): memory_id for i, memory_id in enumerate(existing)}
+    old_memory = [{"id": str(i), "text": text} for i, text in enumerate(existing.values())]
+
+    prompt = get_update_memory_messages(old_memory, facts, memory.config.custom_update_memory_prompt)
+    try:
+        response = memory.llm.generate_response(
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+        )
+        actions = _parse_json_response(response).get("memory", [])
+    except Exception as e:
+        print(f"[Memory Service] Batch update stage failed: {e}")
+        raise
+
+    results = []
+    for action in actions:
+        text = action.get("text")
+        event = action.get("event")
+        memory_id = id_map.get(str(action.get("id")))
+        if not text:
+            continue
+        try:
+            if event == "ADD":
+                if text not in new_embeddings:
+                    new_embeddings[text] = memory.embedding_model.embed(text, "add")
+                new_id = memory._create_memory(data=text, existing_embeddings=new_embeddings, metadata=deepcopy(metadata))
+                results.append({"id": new_id, "memory": text, "event": event})
+            elif event == "UPDATE" and memory_id:
+                if text not in new_embeddings:
+                    new_embeddings[text] = memory.embedding_model.embed(text, "update")
+                memory._update_memory(
+                    memory_id=memory_id, data=text, existing_embeddings=new_embeddings, metadata=deepcopy(metadata)
+                )
+                results.append(
+                    {"id": memory_id, "memory": text, "event": event, "previous_memory": action.get("old_memory")}
+                )
+            elif event == "DELETE" and memory_id:
+                memory._delete_memory(memory_id=memory_id)
+                results.append({"id": memory_id, "memory": text, "event": event})
+        except Exception as e:
+            print(f"[Memory Service] Batch action {event} failed: {e}")
+    return results
+
+
+def process_batch(memory, items: list[dict]) -> list[dict]:
+    """
+    Ingest a batch of same-scope messages. Blocking; run on the write pool.
+
+    Returns one `{"results": [...]}` per item, like `memory.add`, or the
+    exception of an item whose update stage failed, so that callers report it
+    instead of an empty result that would be remembered as the message's outcome.
+    """
+    if len(items) == 1:
+        item = items[0]
+        result = memory.add(item["messages"], **item["add_kwargs"])
+        return [result if result else {"results": []}]
+
+    facts_per_item = extract_facts_batch(memory, items)
+    results: list[Any] = []
+    for item, facts in zip(items, facts_per_item):
+        try:
+            results.append({"results": apply_facts(memory, facts, item["add_kwargs"]) if facts else []})
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+# =============================================================================
+# Micro-batcher
+# =============================================================================
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-message adds per scope.
+
+    A scope's bucket is flushed when it reaches `max_size` messages or when
+    `window_seconds` has passed since its first message, whichever is first.
+    Every caller awaits the result for its own message.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[list[dict]], Awaitable[list[Any]]],
+        max_size: int = BATCH_MAX_MESSAGES,
+        window_seconds: float = BATCH_WINDOW_MS / 1000,
+    ):
+        self._process = process
+        self.max_size = max_size
+        self.window_seconds = window_seconds
+        self._pending: dict[str, list[tuple[dict, asyncio.Future]]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    async def submit(self, key: str, item: dict) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        bucket = self._pending.setdefault(key, [])
+        bucket.append((item, future))
+        if len(bucket) >= self.max_size:
+            self._flush(key)
+        elif len(bucket) == 1:
+            self._timers[key] = loop.call_later(self.window_seconds, self._flush, key)
+        return await future
+
+    def _flush(self, key: str) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        bucket = self._pending.pop(key, [])
+        if bucket:
+            task = asyncio.ensure_future(self._run(bucket))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, bucket: list[tuple[dict, asyncio.Future]]) -> None:
+        try:
+            results = await self._process([item for item, _ in bucket])
+        except Exception as e:
+            for _, future in bucket:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(bucket, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
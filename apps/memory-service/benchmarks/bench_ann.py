@@ -0,0 +1,195 @@
+"""
+ANN benchmark: recall vs. latency for pgvector HNSW / IVFFlat at several sizes.
+
+For each size, fills a scratch table `bench_ann_<size>_<dims>` with clustered
+synthetic unit vectors (reused across runs), computes exact top-k neighbours
+with a sequential scan, then builds each index type and sweeps its query knob
+(hnsw.ef_search / ivfflat.probes), reporting recall@k and latency.
+
+With --tenants N, rows are spread over N tenants (like agent_id scopes) and
+queries filter on one tenant, which is where plain ANN search loses recall;
+pass --iterative-scan relaxed_order to measure pgvector >= 0.8 iterative scans.
+
+Connects with the service's DB_* variables. Needs numpy.
+
+Usage:
+    python benchmarks/bench_ann.py [--sizes 10000,100000,1000000] [--dims 1536]
+        [--index hnsw,ivfflat] [--ef 10,20,40,80,160,320] [--probes 1,2,4,8,16,32]
+        [--queries 100] [--k 10] [--tenants 0] [--iterative-scan MODE] [--drop]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from main import get_base_config  # noqa: E402
+from pgvector_store import PG_HNSW_EF_CONSTRUCTION, PG_HNSW_M, ivfflat_lists  # noqa: E402
+
+BATCH_ROWS = 20000
+CLUSTERS = 256
+
+
+def connect():
+    config = get_base_config()["vector_store"]["config"]
+    return psycopg2.connect(
+        host=config["host"],
+        port=config["port"],
+        user=config["user"],
+        password=config["password"],
+        dbname=config["dbname"],
+    )
+
+
+def literal(vector: np.ndarray) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def sample(rng: np.random.Generator, centers: np.ndarray, n: int) -> np.ndarray:
+    """Clustered unit vectors: a random center plus gaussian noise, normalized."""
+    picks = centers[rng.integers(0, len(centers), n)]
+    vectors = picks + rng.normal(scale=1.4 / np.sqrt(centers.shape[1]), size=picks.shape)
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def fill(conn, table: str, size: int, dims: int, tenants: int, centers: np.ndarray) -> None:
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        if cur.fetchone()[0]:
+            cur.execute(f"SELECT COUNT(*) FROM {table}")
+            if cur.fetchone()[0] == size:
+                return
+            cur.execute(f"DROP TABLE {table}")
+        cur.execute(f"CREATE TABLE {table} (id BIGINT PRIMARY KEY, tenant INT NOT NULL, vector vector({dims}))")
+        conn.commit()
+
+    rng = np.random.default_rng(42)
+    started = time.monotonic()
+    for start in range(0, size, BATCH_ROWS):
+        rows = min(BATCH_ROWS, size - start)
+        vectors = sample(rng, centers, rows)
+        buffer = io.StringIO()
+        for i, vector in enumerate(vectors, start):
+            tenant = i % tenants if tenants else 0
+            buffer.write(f"{i}\t{tenant}\t{literal(vector)}\n")
+        buffer.seek(0)
+        with conn.cursor() as cur:
+            cur.copy_expert(f"COPY {table} (id, tenant, vector) FROM STDIN", buffer)
+        conn.commit()
+        print(f"\r  loading {table}: {start + rows}/{size}", end="", flush=True)
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE INDEX ON {table} (tenant)")
+        cur.execute(f"ANALYZE {table}")
+    conn.commit()
+    print(f"\r  loaded {table}: {size} rows in {time.monotonic() - started:.0f}s")
+
+
+def top_k(cur, table: str, query: np.ndarray, k: int, tenant) -> list[int]:
+    if tenant is None:
+        cur.execute(f"SELECT id FROM {table} ORDER BY vector <=> %s::vector LIMIT %s", (literal(query), k))
+    else:
+        cur.execute(
+            f"SELECT id FROM {table} WHERE tenant = %s ORDER BY vector <=> %s::vector LIMIT %s",
+            (tenant, literal(query), k),
+        )
+    return [row[0] for row in cur.fetchall()]
+
+
+def exact(conn, table: str, queries: np.ndarray, k: int, tenants: int) -> list[set[int]]:
+    truth = []
+    with conn.cursor() as cur:
+        for n, query in enumerate(queries):
+            cur.execute("SET LOCAL enable_indexscan = off")
+            truth.append(set(top_k(cur, table, query, k, n % tenants if tenants else None)))
+            conn.rollback()
+    return truth
+
+
+def build_index(conn, table: str, index: str, size: int) -> float:
+    started = time.monotonic()
+    with conn.cursor() as cur:
+        cur.execute(f"DROP INDEX IF EXISTS {table}_ann_idx")
+        if index == "hnsw":
+            cur.execute(
+                f"CREATE INDEX {table}_ann_idx ON {table} USING hnsw (vector vector_cosine_ops) "
+                f"WITH (m = {PG_HNSW_M}, ef_construction = {PG_HNSW_EF_CONSTRUCTION})"
+            )
+        else:
+            cur.execute(
+                f"CREATE INDEX {table}_ann_idx ON {table} USING ivfflat (vector vector_cosine_ops) "
+                f"WITH (lists = {ivfflat_lists(size)})"
+            )
+    conn.commit()
+    return time.monotonic() - started
+
+
+def sweep(conn, table, index, knob, queries, truth, k, tenants, iterative_scan) -> tuple[float, float, float]:
+    recalls, latencies = [], []
+    setting = "hnsw.ef_search" if index == "hnsw" else "ivfflat.probes"
+    with conn.cursor() as cur:
+        for n, query in enumerate(queries):
+            cur.execute(f"SET LOCAL {setting} = {int(knob)}")
+            if iterative_scan:
+                cur.execute(f"SET LOCAL {index}.iterative_scan = {iterative_scan}")
+            started = time.perf_counter()
+            ids = top_k(cur, table, query, k, n % tenants if tenants else None)
+            latencies.append(time.perf_counter() - started)
+            conn.rollback()
+            recalls.append(len(truth[n] & set(ids)) / max(1, len(truth[n])))
+    latencies.sort()
+    return statistics.mean(recalls), statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--index", default="hnsw,ivfflat")
+    parser.add_argument("--ef", default="10,20,40,80,160,320")
+    parser.add_argument("--probes", default="1,2,4,8,16,32")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--tenants", type=int, default=0, help="spread rows over N tenants and filter queries")
+    parser.add_argument("--iterative-scan", default="", help="relaxed_order | strict_order (pgvector >= 0.8)")
+    parser.add_argument("--drop", action="store_true", help="drop the scratch tables afterwards")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    centers = rng.normal(size=(CLUSTERS, args.dims)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    queries = sample(np.random.default_rng(1234), centers, args.queries)
+
+    conn = connect()
+    with conn.cursor() as cur:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    conn.commit()
+
+    print(f"dims={args.dims} k={args.k} queries={args.queries} tenants={args.tenants or '-'}")
+    print(f"{'rows':>8} {'index':>8} {'knob':>6} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        table = f"bench_ann_{size}_{args.dims}"
+        fill(conn, table, size, args.dims, args.tenants, centers)
+        truth = exact(conn, table, queries, args.k, args.tenants)
+        for index in args.index.split(","):
+            build_seconds = build_index(conn, table, index, size)
+            print(f"{size:>8} {index:>8}  built in {build_seconds:.1f}s")
+            knobs = args.ef if index == "hnsw" else args.probes
+            for knob in [int(x) for x in knobs.split(",")]:
+                recall, p50, p95 = sweep(
+                    conn, table, index, knob, queries, truth, args.k, args.tenants, args.iterative_scan
+                )
+                print(f"{size:>8} {index:>8} {knob:>6} {recall:>7.3f} {p50:>8.2f} {p95:>8.2f}")
+        if args.drop:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE {table}")
+            conn.commit()
+
+
+if __name__ == "__main__":
+    main()
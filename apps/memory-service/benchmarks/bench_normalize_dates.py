@@ -0,0 +1,214 @@
+"""
+Micro-benchmark for normalize_vietnamese_dates.
+
+Compares the current precompiled implementation (dates.py) with the original
+per-call implementation (kept below verbatim as the baseline), after checking
+that both produce identical output on the chat corpus plus randomized variants.
+
+Usage:
+    python benchmarks/bench_normalize_dates.py [--corpus PATH] [--rounds N] [--variants N]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from dates import normalize_vietnamese_dates  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vietnamese_chat.txt")
+
+
+# =============================================================================
+# Baseline (original implementation)
+# =============================================================================
+
+def normalize_vietnamese_dates_legacy(text: str, reference_date: Optional[datetime] = None) -> str:
+    """
+    Normalize Vietnamese relative dates to absolute dates.
+
+    ONLY normalizes when there's a CLEAR TIME INDICATOR (giờ, lúc, sáng, chiều, tối).
+    This avoids false positives like "mai mốt đi ăn nghe" (idiom meaning "sometime").
+
+    Patterns handled (only with time indicators):
+    - Exact days: hôm nay, ngày mai, hôm qua, ngày kia
+    - Weeks: tuần sau, tuần tới, tuần này
+    - Months: tháng sau, tháng tới, tháng này
+    """
+    if not reference_date:
+        reference_date = datetime.now()
+
+    # Time indicators that signal a real schedule (not idiom)
+    # Must be followed by actual time info, not just "sáng nay trời đẹp"
+    time_indicators = r'(?:lúc\s*\d|giờ|sáng\s*(?:họp|bay|gặp|đi)|chiều\s*(?:họp|bay|gặp|đi)|tối\s*(?:họp|bay|gặp|đi)|trưa\s*(?:họp|ăn|gặp)|\d{1,2}h|\d{1,2}:\d{2})'
+
+    # Idiom patterns that should NEVER be normalized (casual "sometime" expressions)
+    idiom_patterns = [
+        r'\bmai mốt\b',      # "sometime later" idiom
+        r'\bmai này\b',      # "some day" idiom
+        r'\bmai kia\b',      # "see you later" idiom
+        r'\bbữa nào\b',      # "someday"
+        r'\bhôm nào\b',      # "when/some day"
+        r'\blúc nào\b',      # "when/sometime"
+        r'\bkhi nào\b',      # "when"
+    ]
+
+    # Check if message contains idioms - if so, skip day normalization entirely
+    has_idiom = any(re.search(p, text, re.IGNORECASE) for p in idiom_patterns)
+
+    result = text
+
+    # Day patterns - only process if NOT an idiom and has time indicator
+    if not has_idiom:
+        # Pattern: "ngày mai lúc 10h" or "mai 10h họp"
+        day_patterns_with_time = [
+            (r'\bngày mai\s+' + time_indicators, 1, 'ngày mai'),
+            (r'\bmai\s+' + time_indicators, 1, 'mai'),
+            (r'\bhôm nay\s+' + time_indicators, 0, 'hôm nay'),
+            (r'\bhôm qua\s+' + time_indicators, -1, 'hôm qua'),
+            (r'\bngày kia\s+' + time_indicators, 2, 'ngày kia'),
+            (r'\bngày mốt\s+' + time_indicators, 2, 'ngày mốt'),
+        ]
+
+        for pattern, days_offset, original in day_patterns_with_time:
+            def replace_day(match, offset=days_offset, orig=original):
+                target_date = reference_date + timedelta(days=offset)
+                date_str = f"ngày {target_date.strftime('%d/%m/%Y')}"
+                # Keep the time part, replace only the day reference
+                return match.group(0).replace(orig, date_str, 1)
+
+            result = re.sub(pattern, replace_day, result, flags=re.IGNORECASE)
+
+        # Also handle patterns like "họp lúc 10h ngày mai"
+        reverse_patterns = [
+            (time_indicators + r'\s+ngày mai\b', 1, 'ngày mai'),
+            (time_indicators + r'\s+hôm nay\b', 0, 'hôm nay'),
+            (time_indicators + r'\s+ngày kia\b', 2, 'ngày kia'),
+        ]
+
+        for pattern, days_offset, original in reverse_patterns:
+            def replace_reverse(match, offset=days_offset, orig=original):
+                target_date = reference_date + timedelta(days=offset)
+                date_str = f"ngày {target_date.strftime('%d/%m/%Y')}"
+                return match.group(0).replace(orig, date_str, 1)
+
+            result = re.sub(pattern, replace_reverse, result, flags=re.IGNORECASE)
+
+    # Week patterns - these are usually specific enough
+    week_patterns = [
+        (r'\btuần sau\b', 1),
+        (r'\btuần tới\b', 1),
+        (r'\btuần trước\b', -1),
+    ]
+
+    for pattern, weeks_offset in week_patterns:
+        current_weekday = reference_date.weekday()
+        start_of_week = reference_date - timedelta(days=current_weekday) + timedelta(weeks=weeks_offset)
+        end_of_week = start_of_week + timedelta(days=6)
+        date_range = f"tuần {start_of_week.strftime('%d/%m')}-{end_of_week.strftime('%d/%m/%Y')}"
+        result = re.sub(pattern, date_range, result, flags=re.IGNORECASE)
+
+    # Month patterns - these are usually specific enough
+    month_patterns = [
+        (r'\btháng sau\b', 1),
+        (r'\btháng tới\b', 1),
+        (r'\btháng trước\b', -1),
+    ]
+
+    for pattern, months_offset in month_patterns:
+        target_month = reference_date.month + months_offset
+        target_year = reference_date.year
+        while target_month > 12:
+            target_month -= 12
+            target_year += 1
+        while target_month < 1:
+            target_month += 12
+            target_year -= 1
+        month_str = f"tháng {target_month}/{target_year}"
+        result = re.sub(pattern, month_str, result, flags=re.IGNORECASE)
+
+    return result
+
+
+# =============================================================================
+# Benchmark
+# =============================================================================
+
+# Fragments used to build randomized variants around tricky boundaries
+FRAGMENTS = [
+    "ngày mai", "Ngày mai", "mai", "MAI", "hôm nay", "Hôm nay", "hôm qua", "ngày kia", "ngày mốt",
+    "lúc 10h", "LÚC 9", "10h", "14:30", "giờ", "sáng họp", "Chiều gặp", "tối đi", "trưa ăn",
+    "tuần sau", "Tuần tới", "tuần trước", "tháng sau", "tháng tới", "Tháng trước",
+    "mai mốt", "bữa nào", "khi nào", "họp", "team", "với anh Tuấn", ":30", ",", "  ",
+]
+
+
+def build_variants(lines: list[str], count: int, seed: int = 42) -> list[str]:
+    rng = random.Random(seed)
+    variants = []
+    for _ in range(count):
+        parts = [rng.choice(FRAGMENTS) for _ in range(rng.randint(2, 8))]
+        if lines and rng.random() < 0.3:
+            parts.insert(rng.randint(0, len(parts)), rng.choice(lines))
+        variants.append(" ".join(parts))
+    return variants
+
+
+def check_identical(texts: list[str], reference_dates: list[datetime]) -> int:
+    mismatches = 0
+    for reference_date in reference_dates:
+        for text in texts:
+            expected = normalize_vietnamese_dates_legacy(text, reference_date)
+            actual = normalize_vietnamese_dates(text, reference_date)
+            if expected != actual:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  MISMATCH: {text!r}\n    legacy:  {expected!r}\n    current: {actual!r}")
+    return mismatches
+
+
+def measure(fn, texts: list[str], reference_date: datetime, rounds: int) -> float:
+    """Messages per second over `rounds` passes of the corpus."""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            fn(text, reference_date)
+    elapsed = time.perf_counter() - start
+    return rounds * len(texts) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--variants", type=int, default=20000)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        lines = [line.strip() for line in f if line.strip()]
+
+    # Month/year boundaries and both ends of the week
+    reference_dates = [datetime(2025, 12, 31, 9), datetime(2026, 1, 5, 9), datetime(2026, 10, 18, 21)]
+    print(f"Checking output equivalence ({len(lines)} corpus lines + {args.variants} variants)...")
+    mismatches = check_identical(lines + build_variants(lines, args.variants), reference_dates)
+    if mismatches:
+        print(f"FAILED: {mismatches} mismatches")
+        sys.exit(1)
+    print("  identical")
+
+    reference_date = datetime(2026, 10, 18, 9)
+    legacy = measure(normalize_vietnamese_dates_legacy, lines, reference_date, args.rounds)
+    current = measure(normalize_vietnamese_dates, lines, reference_date, args.rounds)
+    print(f"\n{'implementation':<16}{'msgs/sec':>14}")
+    print(f"{'legacy':<16}{legacy:>14,.0f}")
+    print(f"{'precompiled':<16}{current:>14,.0f}")
+    print(f"speedup: {current / legacy:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
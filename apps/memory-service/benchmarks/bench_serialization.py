@@ -0,0 +1,129 @@
+"""
+Micro-benchmark: response encoding CPU and bytes on the wire.
+
+For typical payloads (a search, a /memories/context bundle, /memories/all
+pages) compares FastAPI's default path (response_model serialization by
+pydantic, then json.dumps in JSONResponse) with MemoryJSONResponse (orjson,
+or MessagePack), and reports the body size raw, gzip'ed and brotli'ed with
+the service's compression settings plus the time compression takes.
+
+Usage:
+    python benchmarks/bench_serialization.py [--rounds N]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+from context import build_bundle  # noqa: E402
+from main import MemoryResponse  # noqa: E402
+from serialization import BROTLI_QUALITY, GZIP_LEVEL, MemoryJSONResponse, _Compressor, _wire_format  # noqa: E402
+
+SENDERS = ["Nguyễn Văn Nam", "Trần Thị Lan", "Lê Hùng", "Phạm Minh Tuấn"]
+FACTS = [
+    "Họp với anh Tuấn bên ABC Corp về dự án ERP lúc 10h ngày {d}/12/2026",
+    "Deadline báo cáo Q4 là {d}/12, gửi cho sếp Hùng",
+    "Chị Lan thích uống cà phê đen không đường",
+    "Dự án X đang bị delay {d} ngày, cần tăng tốc",
+]
+
+
+def make_item(rng: random.Random, i: int) -> dict:
+    """A memory as mem0 returns it, with the chat message it came from."""
+    sender = rng.choice(SENDERS)
+    fact = rng.choice(FACTS).format(d=i % 28 + 1)
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "memory": fact,
+        "hash": uuid.UUID(int=rng.getrandbits(128)).hex,
+        "metadata": {
+            "sender_name": sender,
+            "group_name": "Team Dự Án",
+            "platform": "telegram",
+            "sent_at": f"2026-10-{i % 28 + 1:02d}T09:15:00",
+            "original_message": f"[{sender}]: {fact.lower()}, mọi người nhớ chuẩn bị tài liệu giúp mình nhé",
+        },
+        "score": round(rng.random(), 6),
+        "created_at": f"2026-10-{i % 28 + 1:02d}T09:15:02.123456+00:00",
+        "updated_at": None,
+        "user_id": "user-123",
+        "agent_id": "workspace_1",
+        "run_id": "group_456",
+    }
+
+
+def payloads() -> dict[str, object]:
+    rng = random.Random(7)
+    items = [make_item(rng, i) for i in range(1000)]
+    bundle = build_bundle([items[0:5], items[3:8], items[6:11]], items[20:23], 1000, "compact")
+    return {
+        "search (5)": {"results": items[:5]},
+        "context bundle": bundle,
+        "all page (100)": {"results": items[:100], "next_cursor": items[99]["id"]},
+        "all page (1000)": {"results": items, "next_cursor": items[-1]["id"]},
+    }
+
+
+def timed(fn, rounds: int) -> tuple[float, bytes]:
+    """Best of three batches, ms per call."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            body = fn()
+        best = min(best, (time.perf_counter() - started) / rounds * 1000)
+    return best, body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=0, help="calls per batch (default: scaled to payload size)")
+    args = parser.parse_args()
+
+    field = create_model_field(name="Response_bench", type_=MemoryResponse, mode="serialization")
+    loop = asyncio.new_event_loop()
+
+    def fastapi_default(response: MemoryResponse) -> bytes:
+        content = loop.run_until_complete(serialize_response(field=field, response_content=response))
+        return JSONResponse(content).body
+
+    def encoded(response: MemoryResponse, wire_format: str) -> bytes:
+        token = _wire_format.set(wire_format)
+        try:
+            return MemoryJSONResponse(response).body
+        finally:
+            _wire_format.reset(token)
+
+    print(f"gzip level {GZIP_LEVEL}, brotli quality {BROTLI_QUALITY}; times are ms per response")
+    print(f"{'payload':<16} {'encoder':<8} {'encode':>8} {'bytes':>9} {'gzip':>8} {'gzip ms':>8} {'br':>8} {'br ms':>7}")
+    for name, data in payloads().items():
+        response = MemoryResponse(success=True, data=data)
+        size = len(encoded(response, "json"))
+        rounds = args.rounds or max(5, 2_000_000 // size)
+        encoders = {
+            "fastapi": lambda: fastapi_default(response),
+            "orjson": lambda: encoded(response, "json"),
+            "msgpack": lambda: encoded(response, "msgpack"),
+        }
+        for encoder, fn in encoders.items():
+            encode_ms, body = timed(fn, rounds)
+            gzip_ms, gzipped = timed(lambda: _Compressor.compress_whole("gzip", body), rounds)
+            br_ms, brotlied = timed(lambda: _Compressor.compress_whole("br", body), rounds)
+            print(
+                f"{name:<16} {encoder:<8} {encode_ms:>8.3f} {len(body):>9} "
+                f"{len(gzipped):>8} {gzip_ms:>8.3f} {len(brotlied):>8} {br_ms:>7.3f}"
+            )
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
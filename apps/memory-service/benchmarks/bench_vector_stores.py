@@ -0,0 +1,237 @@
+"""
+Vector store benchmark: the embedded local store (flat and HNSW) against
+pgvector on the same workload, through mem0's vector store interface as the
+service calls it.
+
+Each store gets the same clustered synthetic unit vectors (see bench_ann),
+spread over --tenants agent_ids and 8 run_ids per tenant, then:
+
+- insert: rows in batches of --batch (upserts with the caller's ids)
+- search: top --k filtered on one agent_id, recall against an exact scan
+- search_run: top --k filtered on agent_id + run_id
+- get / update (payload) / delete: single rows picked at random
+
+HNSW graphs of the local store are built in the background after a scope's
+first search; the benchmark waits for them (reported as `build`) so searches
+measure the graph. Only scopes of at least --hnsw-min-rows rows get one.
+
+pgvector connects with the service's DB_* variables and goes through the
+service's pool and indexes (MEMORY_PG_*), in a scratch collection dropped
+afterwards. Local stores are written to a temporary directory.
+
+Usage:
+    python benchmarks/bench_vector_stores.py [--stores local-flat,local-hnsw,pgvector]
+        [--rows 30000] [--dims 1536] [--tenants 3] [--queries 200] [--k 10]
+        [--batch 500] [--ef 40] [--hnsw-min-rows 10000]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import local_store  # noqa: E402
+from bench_ann import CLUSTERS, sample  # noqa: E402
+from main import get_base_config  # noqa: E402
+from pgvector_store import search_tuning  # noqa: E402
+
+RUNS_PER_TENANT = 8
+COLLECTION = "bench_vector_stores"
+ID_NAMESPACE = uuid.UUID("6f1c0b1e-5d0a-4c2b-9a57-1d3e2f4a5b6c")
+
+
+def open_store(name: str, dims: int, directory: str):
+    if name.startswith("local-"):
+        return local_store.LocalVectorStore(
+            collection_name=COLLECTION, embedding_model_dims=dims, path=directory, ann_index=name[len("local-"):]
+        )
+    if name != "pgvector":
+        raise SystemExit(f"unknown store {name!r} (local-flat | local-hnsw | pgvector)")
+    from mem0.utils.factory import VectorStoreFactory
+    from pgvector_store import attach_pool, ensure_indexes, service_store
+
+    config = {**get_base_config()["vector_store"]["config"], "collection_name": COLLECTION}
+    config["embedding_model_dims"] = dims
+    attach_pool(config)
+    store = service_store(VectorStoreFactory.create("pgvector", config))
+    # Start from an empty table, in case an interrupted run left rows behind
+    store.reset()
+    ensure_indexes(store)
+    return store
+
+
+def close_store(store) -> None:
+    store.delete_col()
+    if isinstance(store, local_store.LocalVectorStore):
+        store.close()
+    elif getattr(store, "connection_pool", None) is not None:
+        store.connection_pool.closeall()
+
+
+def payload(i: int, tenants: int) -> dict:
+    created_at = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=i)
+    return {
+        "data": f"memory {i}",
+        "agent_id": f"tenant-{i % tenants}",
+        "run_id": f"run-{(i // tenants) % RUNS_PER_TENANT}",
+        "created_at": created_at.isoformat(),
+    }
+
+
+def percentiles(latencies: list[float]) -> tuple[float, float]:
+    latencies = sorted(latencies)
+    return statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.95)] * 1000
+
+
+def report(store: str, operation: str, latencies: list[float], count: int, recall=None) -> None:
+    p50, p95 = percentiles(latencies)
+    rate = count / sum(latencies)
+    recall_text = f"{recall:>7.3f}" if recall is not None else f"{'-':>7}"
+    print(f"{store:>11} {operation:>10} {count:>7} {rate:>10.0f} {p50:>8.2f} {p95:>8.2f} {recall_text}")
+
+
+def exact_top_k(vectors: np.ndarray, members: np.ndarray, query: np.ndarray, k: int) -> set[int]:
+    distances = 1 - vectors[members] @ query
+    return set(members[np.argsort(distances)[:k]].tolist())
+
+
+def wait_for_graphs(store, tenants: int, rows_per_tenant: int, query: np.ndarray, timeout: float) -> float:
+    """Trigger the background HNSW builds with one search per tenant and wait for them."""
+    started = time.monotonic()
+    for tenant in range(tenants):
+        store.search("", query.tolist(), limit=1, filters={"agent_id": f"tenant-{tenant}"})
+    while time.monotonic() - started < timeout:
+        graphs = store.col_info()["graphs"]
+        if len(graphs) == tenants and all(size >= rows_per_tenant for size in graphs.values()):
+            break
+        time.sleep(0.5)
+    return time.monotonic() - started
+
+
+def run(name: str, args, vectors: np.ndarray, queries: np.ndarray, ids: list[str]) -> None:
+    directory = tempfile.mkdtemp(prefix="bench_vector_stores_")
+    store = None
+    try:
+        store = open_store(name, args.dims, directory)
+        latencies = []
+        for start in range(0, args.rows, args.batch):
+            stop = min(start + args.batch, args.rows)
+            started = time.perf_counter()
+            store.insert(
+                vectors=vectors[start:stop].tolist(),
+                payloads=[payload(i, args.tenants) for i in range(start, stop)],
+                ids=ids[start:stop],
+            )
+            latencies.append(time.perf_counter() - started)
+        p50, p95 = percentiles(latencies)
+        rate = args.rows / sum(latencies)
+        print(f"{name:>11} {'insert':>10} {args.rows:>7} {rate:>10.0f} {p50:>8.2f} {p95:>8.2f} {'-':>7}")
+
+        tenant_of = np.arange(args.rows) % args.tenants
+        run_of = (np.arange(args.rows) // args.tenants) % RUNS_PER_TENANT
+        if name == "local-hnsw":
+            rows_per_tenant = int(np.bincount(tenant_of).min())
+            if rows_per_tenant >= local_store.LOCAL_HNSW_MIN_ROWS:
+                seconds = wait_for_graphs(store, args.tenants, rows_per_tenant, queries[0], args.build_timeout)
+                print(f"{name:>11} {'build':>10} {len(store.col_info()['graphs']):>7} graphs in {seconds:.1f}s")
+            else:
+                print(f"{name:>11} {'build':>10}  skipped: {rows_per_tenant} rows per tenant < --hnsw-min-rows")
+
+        index_of = {vector_id: i for i, vector_id in enumerate(ids)}
+        token = search_tuning.set({"ef_search": args.ef})
+        try:
+            for operation, with_run in (("search", False), ("search_run", True)):
+                latencies, recalls = [], []
+                for n, query in enumerate(queries):
+                    tenant, run_number = n % args.tenants, n % RUNS_PER_TENANT
+                    filters = {"agent_id": f"tenant-{tenant}"}
+                    members = tenant_of == tenant
+                    if with_run:
+                        filters["run_id"] = f"run-{run_number}"
+                        members &= run_of == run_number
+                    started = time.perf_counter()
+                    found = store.search("", query.tolist(), limit=args.k, filters=filters)
+                    latencies.append(time.perf_counter() - started)
+                    truth = exact_top_k(vectors, np.flatnonzero(members), query, args.k)
+                    got = {index_of[str(row.id)] for row in found}
+                    recalls.append(len(truth & got) / max(1, len(truth)))
+                report(name, operation, latencies, len(queries), statistics.mean(recalls))
+        finally:
+            search_tuning.reset(token)
+
+        rng = random.Random(5)
+        picked = rng.sample(range(args.rows), min(args.queries, args.rows))
+        latencies = []
+        for i in picked:
+            started = time.perf_counter()
+            store.get(ids[i])
+            latencies.append(time.perf_counter() - started)
+        report(name, "get", latencies, len(picked))
+
+        latencies = []
+        for i in picked:
+            updated = {**payload(i, args.tenants), "data": f"memory {i} (updated)"}
+            started = time.perf_counter()
+            store.update(ids[i], payload=updated)
+            latencies.append(time.perf_counter() - started)
+        report(name, "update", latencies, len(picked))
+
+        latencies = []
+        for i in picked:
+            started = time.perf_counter()
+            store.delete(ids[i])
+            latencies.append(time.perf_counter() - started)
+        report(name, "delete", latencies, len(picked))
+    finally:
+        if store is not None:
+            close_store(store)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stores", default="local-flat,local-hnsw,pgvector")
+    parser.add_argument("--rows", type=int, default=30000)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--tenants", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--ef", type=int, default=40, help="ef_search for HNSW searches (local and pgvector)")
+    parser.add_argument(
+        "--hnsw-min-rows", type=int, default=local_store.LOCAL_HNSW_MIN_ROWS,
+        help="smallest agent_id scope given a local HNSW graph (MEMORY_LOCAL_HNSW_MIN_ROWS)",
+    )
+    parser.add_argument("--build-timeout", type=float, default=600, help="seconds to wait for local HNSW graphs")
+    args = parser.parse_args()
+    local_store.LOCAL_HNSW_MIN_ROWS = args.hnsw_min_rows
+
+    rng = np.random.default_rng(7)
+    centers = rng.normal(size=(CLUSTERS, args.dims)).astype(np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    vectors = sample(np.random.default_rng(42), centers, args.rows)
+    queries = sample(np.random.default_rng(1234), centers, args.queries)
+    ids = [str(uuid.uuid5(ID_NAMESPACE, str(i))) for i in range(args.rows)]
+
+    print(f"rows={args.rows} dims={args.dims} tenants={args.tenants} k={args.k} ef={args.ef}")
+    print(f"{'store':>11} {'operation':>10} {'count':>7} {'ops/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'recall':>7}")
+    for name in args.stores.split(","):
+        try:
+            run(name.strip(), args, vectors, queries, ids)
+        except Exception as e:
+            if name.strip() != "pgvector":
+                raise
+            print(f"{name:>11} skipped: {type(e).__name__}: {e}")
+
+
+if __name__ == "__main__":
+    main()
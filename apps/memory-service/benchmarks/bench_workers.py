@@ -0,0 +1,155 @@
+"""
+Load test: throughput of the service vs. number of uvicorn workers.
+
+For each worker count, starts `uvicorn benchmarks.fake_service:app --workers N`
+(production app and mem0 on the fake LLM, embedder and vector store of
+fake_backends.py) with its state files in a temp dir, drives a mix of
+/memories/add and /memories/search at fixed concurrency, and reports
+requests/sec and latency percentiles. The search cache, add dedup and the
+pre-LLM filter are disabled so every request reaches the (fake) backends.
+
+Usage:
+    python benchmarks/bench_workers.py [--workers 1,2,4] [--concurrency 64]
+        [--duration 15] [--io-ms 20] [--cpu-ms 2] [--port 8765]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MESSAGES = [
+    "Ngày mai 10h họp với anh Tuấn bên ABC Corp về dự án ERP",
+    "Deadline báo cáo Q4 là 25/12, gửi cho sếp Hùng",
+    "Tôi thích uống cà phê đen không đường",
+    "Dự án X đang bị delay, cần tăng tốc",
+]
+QUERIES = ["lịch họp", "deadline báo cáo", "sở thích cà phê", "dự án X"]
+
+
+def start_server(workers: int, port: int, state_dir: str, io_ms: float, cpu_ms: float) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "BENCH_LLM_LATENCY_MS": str(io_ms),
+        "BENCH_EMBED_LATENCY_MS": str(io_ms),
+        "BENCH_LLM_CPU_MS": str(cpu_ms),
+        "BENCH_JITTER": "0",
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "fake"),
+        "MEM0_DIR": state_dir,
+        "MEMORY_PG_POOL_ENABLED": "false",
+        "MEMORY_SEARCH_CACHE_SIZE": "0",
+        "MEMORY_DEDUP_TTL": "0",
+        "MEMORY_PREFILTER_MODE": "off",
+        "MEMORY_EMBED_CACHE_DB": "",
+        "MEMORY_JOBS_DB": os.path.join(state_dir, "jobs.db"),
+        "MEMORY_DEDUP_DB": os.path.join(state_dir, "dedup.db"),
+        "MEMORY_SHARED_STATE_DB": os.path.join(state_dir, "state.db"),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.fake_service:app",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=SERVICE_DIR,
+        env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, workers: int, timeout: float = 60) -> None:
+    """Wait until /health has been answered by `workers` distinct processes."""
+    pids = set()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/health")
+            if response.status_code == 200 and response.json().get("mem0"):
+                pids.add(response.json()["pid"])
+                if len(pids) >= workers:
+                    return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.05)
+    print(f"  warning: saw {len(pids)}/{workers} workers before starting")
+
+
+async def drive(client: httpx.AsyncClient, concurrency: int, duration: float) -> tuple[int, int, list[float]]:
+    latencies: list[float] = []
+    errors = 0
+    stop_at = time.monotonic() + duration
+
+    async def user(n: int) -> None:
+        nonlocal errors
+        i = n
+        while time.monotonic() < stop_at:
+            i += 1
+            if i % 2:
+                path = "/memories/add"
+                body = {"user_id": f"u{n}", "group_id": f"g{n % 8}", "message": MESSAGES[i % len(MESSAGES)]}
+            else:
+                path = "/memories/search"
+                body = {"user_id": f"u{n}", "group_id": f"g{n % 8}", "query": QUERIES[i % len(QUERIES)]}
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code == 200 and response.json().get("success")
+            except httpx.TransportError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    await asyncio.gather(*[user(n) for n in range(concurrency)])
+    return len(latencies), errors, latencies
+
+
+async def run_one(workers: int, args) -> dict:
+    with tempfile.TemporaryDirectory() as state_dir:
+        server = start_server(workers, args.port, state_dir, args.io_ms, args.cpu_ms)
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=30) as client:
+                await wait_ready(client, workers)
+                total, errors, latencies = await drive(client, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    latencies.sort()
+    return {
+        "workers": workers,
+        "requests": total,
+        "errors": errors,
+        "rps": total / args.duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--io-ms", type=float, default=20, help="simulated LLM and embedding latency per call")
+    parser.add_argument("--cpu-ms", type=float, default=2, help="simulated GIL-bound work per LLM call")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"cpus={os.cpu_count()} concurrency={args.concurrency} io={args.io_ms}ms cpu={args.cpu_ms}ms")
+    print(f"{'workers':>7} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'scaling':>8}")
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(",")]:
+        result = asyncio.run(run_one(workers, args))
+        baseline = baseline or result["rps"]
+        print(
+            f"{result['workers']:>7} {result['requests']:>9} {result['errors']:>7} {result['rps']:>9.1f} "
+            f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['rps'] / baseline:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
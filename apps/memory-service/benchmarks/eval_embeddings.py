@@ -0,0 +1,183 @@
+"""
+Embedding storage evaluation: recall and latency per dimensions / quantization.
+
+Samples memories from the production collection, embeds them (and a set of
+queries) with gemini-embedding-001 at each requested size, loads each size
+into a scratch table `eval_embeddings_<dims>`, and for each quantization
+builds the ANN index and runs the same query the service would (quantized
+shortlist re-scored with full vectors). Recall@k is measured against exact
+full-precision search at the largest size.
+
+Queries default to the original chat messages behind the sampled memories
+(`metadata.original_message`), or come one per line from --queries-file.
+Embeddings go through the service's embedding cache, so reruns only pay for
+new texts. Needs numpy, GEMINI_API_KEY and the DB_* variables.
+
+Usage:
+    python benchmarks/eval_embeddings.py [--dims 1536,768,256]
+        [--quantization none,halfvec,binary] [--sample 5000] [--queries 200]
+        [--queries-file FILE] [--k 10] [--rerank-factor 4] [--drop]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pgvector_admin import connect, embedder_for  # noqa: E402
+from pgvector_store import (  # noqa: E402
+    PG_RERANK_FACTOR,
+    ann_index_name,
+    ann_index_names,
+    ann_index_sql,
+    ivfflat_lists,
+    quantized_distance,
+)
+
+
+def literal(vector) -> str:
+    return "[" + ",".join(f"{x:.7g}" for x in vector) + "]"
+
+
+def sample_memories(conn, collection: str, size: int) -> list[tuple[str, str, str]]:
+    """(id, memory text, original message) of a random sample."""
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            f"SELECT id, payload->>'data', COALESCE(payload->>'original_message', payload->>'data') "
+            f"FROM {collection} WHERE payload->>'data' <> '' ORDER BY random() LIMIT %s",
+            (size,),
+        )
+        return [(str(r[0]), r[1], r[2]) for r in cur.fetchall()]
+
+
+def embed(dims: int, texts: list[str], batch: int = 100) -> np.ndarray:
+    embedder = embedder_for(dims)
+    vectors = []
+    for start in range(0, len(texts), batch):
+        vectors.extend(embedder.embed_batch(texts[start:start + batch], "search"))
+        print(f"\r  embedding at {dims} dims: {min(start + batch, len(texts))}/{len(texts)}", end="", flush=True)
+    print()
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> list[set[int]]:
+    corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ corpus.T
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+
+def load(conn, table: str, vectors: np.ndarray) -> None:
+    with conn, conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {table}")
+        cur.execute(f"CREATE TABLE {table} (id INT PRIMARY KEY, vector vector({vectors.shape[1]}))")
+        buffer = io.StringIO("".join(f"{i}\t{literal(v)}\n" for i, v in enumerate(vectors)))
+        cur.copy_expert(f"COPY {table} (id, vector) FROM STDIN", buffer)
+        cur.execute(f"ANALYZE {table}")
+
+
+def relation_mb(cur, name: str) -> float:
+    cur.execute("SELECT pg_total_relation_size(to_regclass(%s))", (name,))
+    return (cur.fetchone()[0] or 0) / 1e6
+
+
+def evaluate(conn, table: str, dims: int, quantization: str, queries: np.ndarray, truth, k: int, factor: int) -> dict:
+    with conn, conn.cursor() as cur:
+        for name in ann_index_names(table):
+            cur.execute(f"DROP INDEX IF EXISTS {name}")
+        cur.execute(f"SELECT COUNT(*) FROM {table}")
+        lists = ivfflat_lists(cur.fetchone()[0])
+        started = time.monotonic()
+        cur.execute(ann_index_sql(table, dims, quantization=quantization, lists=lists))
+        build_seconds = time.monotonic() - started
+        table_mb = relation_mb(cur, table)
+        index_mb = relation_mb(cur, ann_index_name(table, quantization=quantization))
+
+    candidates = k * factor if quantization != "none" else k
+    if quantization == "none":
+        sql = f"SELECT id FROM {table} ORDER BY vector <=> %s::vector LIMIT %s"
+    else:
+        sql = (
+            f"SELECT id FROM (SELECT id, vector FROM {table} "
+            f"ORDER BY {quantized_distance(dims, quantization).format('%s')} LIMIT %s) AS shortlist "
+            "ORDER BY vector <=> %s::vector LIMIT %s"
+        )
+    recalls, latencies = [], []
+    with conn.cursor() as cur:
+        for n, query in enumerate(queries):
+            vector = literal(query)
+            params = (vector, k) if quantization == "none" else (vector, candidates, vector, k)
+            cur.execute(f"SET LOCAL hnsw.ef_search = {max(40, candidates)}")
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            ids = {row[0] for row in cur.fetchall()}
+            latencies.append(time.perf_counter() - started)
+            conn.rollback()
+            recalls.append(len(ids & truth[n]) / k)
+    latencies.sort()
+    return {
+        "table_mb": table_mb,
+        "index_mb": index_mb,
+        "build_s": build_seconds,
+        "recall": statistics.mean(recalls),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dims", default="1536,768,256")
+    parser.add_argument("--quantization", default="none,halfvec,binary")
+    parser.add_argument("--sample", type=int, default=5000, help="memories to sample")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--queries-file", help="one query per line instead of sampled chat messages")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=PG_RERANK_FACTOR)
+    parser.add_argument("--drop", action="store_true", help="drop the scratch tables afterwards")
+    args = parser.parse_args()
+
+    conn, collection = connect()
+    memories = sample_memories(conn, collection, args.sample)
+    if len(memories) <= args.k:
+        sys.exit(f"Only {len(memories)} memories in {collection}")
+    corpus_texts = [m[1] for m in memories]
+    if args.queries_file:
+        with open(args.queries_file, encoding="utf-8") as f:
+            query_texts = [line.strip() for line in f if line.strip()][:args.queries]
+    else:
+        query_texts = [m[2] for m in memories[:args.queries]]
+
+    sizes = sorted((int(d) for d in args.dims.split(",")), reverse=True)
+    embedded = {dims: (embed(dims, corpus_texts), embed(dims, query_texts)) for dims in sizes}
+    # Ground truth: exact full-precision neighbours at the largest size
+    truth = exact_top_k(*embedded[sizes[0]], args.k)
+
+    print(f"{len(memories)} memories, {len(query_texts)} queries, k={args.k}, truth={sizes[0]} dims exact")
+    print(f"{'dims':>5} {'quant':>8} {'table MB':>9} {'index MB':>9} {'build s':>8} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for dims in sizes:
+        corpus, queries = embedded[dims]
+        table = f"eval_embeddings_{dims}"
+        load(conn, table, corpus)
+        exact_recall = statistics.mean(
+            len(found & expected) / args.k for found, expected in zip(exact_top_k(corpus, queries, args.k), truth)
+        )
+        print(f"{dims:>5} {'exact':>8} {'':>9} {'':>9} {'':>8} {exact_recall:>7.3f}")
+        for quantization in args.quantization.split(","):
+            result = evaluate(conn, table, dims, quantization, queries, truth, args.k, args.rerank_factor)
+            print(
+                f"{dims:>5} {quantization:>8} {result['table_mb']:>9.1f} {result['index_mb']:>9.1f} "
+                f"{result['build_s']:>8.1f} {result['recall']:>7.3f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}"
+            )
+        if args.drop:
+            with conn, conn.cursor() as cur:
+                cur.execute(f"DROP TABLE {table}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Deterministic stand-ins for Gemini and pgvector, for load tests.
+
+- FakeLLM answers the three prompts the service sends (single-message fact
+  extraction, batched extraction, the ADD/UPDATE/NONE update stage) after a
+  configurable delay. Messages of 4+ words that are not questions become one
+  fact each; a fact whose text is already stored becomes NONE.
+- FakeEmbedder hashes words and word pairs into a unit vector, so texts
+  sharing words land close together and the same text always embeds the same.
+- InMemoryVectorStore is a brute-force numpy store with mem0's vector store
+  interface and pgvector's scoring (cosine distance, lower is better).
+
+`install()` swaps mem0's factories so `Memory.from_config` builds these; the
+service code runs unchanged on top. Latencies come from the environment so
+every uvicorn worker picks them up:
+
+    BENCH_LLM_LATENCY_MS (default 800), BENCH_EMBED_LATENCY_MS (60),
+    BENCH_VECTOR_LATENCY_MS (2, in-memory store only), BENCH_JITTER (0.2),
+    BENCH_LLM_CPU_MS (0: GIL-held work per LLM response, like parsing it),
+    BENCH_VECTOR_STORE (memory | service: the store MEMORY_VECTOR_STORE selects)
+"""
+import ast
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Optional
+
+import numpy as np
+
+from mem0.configs.embeddings.base import BaseEmbedderConfig
+from mem0.utils.factory import EmbedderFactory, LlmFactory, VectorStoreFactory
+from mem0.vector_stores.base import VectorStoreBase
+from mem0.vector_stores.pgvector import OutputData
+
+
+LLM_LATENCY_MS = float(os.getenv("BENCH_LLM_LATENCY_MS", "800"))
+EMBED_LATENCY_MS = float(os.getenv("BENCH_EMBED_LATENCY_MS", "60"))
+VECTOR_LATENCY_MS = float(os.getenv("BENCH_VECTOR_LATENCY_MS", "2"))
+JITTER = float(os.getenv("BENCH_JITTER", "0.2"))
+LLM_CPU_MS = float(os.getenv("BENCH_LLM_CPU_MS", "0"))
+VECTOR_STORE = os.getenv("BENCH_VECTOR_STORE", "memory")
+
+BATCH_MARKER = "CHẾ ĐỘ NHIỀU TIN NHẮN"
+BATCH_LINE_RE = re.compile(r"^\[(\d+)\] [^:]*: (.+)$")
+BACKTICK_BLOCK_RE = re.compile(r"```\s*(.*?)\s*```", re.S)
+WORD_RE = re.compile(r"\w+")
+MIN_FACT_WORDS = 4
+
+_rng = random.Random(os.getpid())
+
+
+def pause(milliseconds: float) -> None:
+    """Sleep for about `milliseconds`, +/- JITTER."""
+    if milliseconds > 0:
+        time.sleep(milliseconds * (1 + _rng.uniform(-JITTER, JITTER)) / 1000)
+
+
+def spin(milliseconds: float) -> None:
+    """Busy-wait for `milliseconds` holding the GIL."""
+    deadline = time.perf_counter() + milliseconds / 1000
+    while time.perf_counter() < deadline:
+        pass
+
+
+def is_fact(text: str) -> bool:
+    text = text.strip()
+    return len(WORD_RE.findall(text)) >= MIN_FACT_WORDS and not text.endswith("?")
+
+
+# =============================================================================
+# LLM
+# =============================================================================
+
+class FakeLLM:
+    """Rule-based replacement for the Gemini LLM."""
+
+    def __init__(self, config=None):
+        self.config = config
+
+    def generate_response(self, messages, response_format=None, tools=None, tool_choice="auto", **kwargs):
+        pause(LLM_LATENCY_MS)
+        spin(LLM_CPU_MS)
+        system = messages[0]["content"] if messages[0]["role"] == "system" else ""
+        prompt = messages[-1]["content"]
+        if BATCH_MARKER in system:
+            return json.dumps({"facts": self.batch_facts(prompt)}, ensure_ascii=False)
+        if system:
+            return json.dumps({"facts": self.facts(prompt)}, ensure_ascii=False)
+        if "The new retrieved facts" in prompt:
+            return json.dumps({"memory": self.update_actions(prompt)}, ensure_ascii=False)
+        return "{}"
+
+    @staticmethod
+    def facts(prompt: str) -> list[str]:
+        # mem0's user prompt: "Input:\nuser: <message>\n..."
+        lines = prompt.split("Input:", 1)[-1].strip().splitlines()
+        texts = [line.split(":", 1)[1].strip() for line in lines if ":" in line]
+        return [text for text in texts if is_fact(text)]
+
+    @staticmethod
+    def batch_facts(prompt: str) -> list[dict]:
+        facts = []
+        for line in prompt.splitlines():
+            match = BATCH_LINE_RE.match(line.strip())
+            if match and is_fact(match.group(2)):
+                facts.append({"source": int(match.group(1)), "text": match.group(2).strip()})
+        return facts
+
+    @staticmethod
+    def update_actions(prompt: str) -> list[dict]:
+        """ADD new facts, NONE for facts already stored word for word."""
+        old_memory, facts = [], []
+        if "Below is the current content of my memory" in prompt:
+            old_part = prompt.split("Below is the current content of my memory", 1)[1]
+            old_memory = ast.literal_eval(BACKTICK_BLOCK_RE.search(old_part).group(1))
+        new_part = prompt.split("The new retrieved facts", 1)[1]
+        facts = ast.literal_eval(BACKTICK_BLOCK_RE.search(new_part).group(1))
+
+        stored = {item["text"]: item["id"] for item in old_memory}
+        actions = [{"id": item["id"], "text": item["text"], "event": "NONE"} for item in old_memory]
+        for n, fact in enumerate(facts):
+            if fact not in stored:
+                actions.append({"id": str(len(old_memory) + n), "text": fact, "event": "ADD"})
+        return actions
+
+
+# =============================================================================
+# Embedder
+# =============================================================================
+
+class FakeEmbedder:
+    """Feature-hashing embedder: words and adjacent word pairs, signed buckets."""
+
+    def __init__(self, dims: int):
+        self.dims = dims
+        self.config = BaseEmbedderConfig(model="fake-hash", embedding_dims=dims)
+
+    def vector(self, text: str) -> np.ndarray:
+        words = WORD_RE.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for feature in features or [""]:
+            digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+            vector[digest % self.dims] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, text, memory_action: Optional[str] = None):
+        pause(EMBED_LATENCY_MS)
+        return self.vector(text).tolist()
+
+
+# =============================================================================
+# Vector store
+# =============================================================================
+
+class InMemoryVectorStore(VectorStoreBase):
+    """Brute-force cosine search over numpy arrays, indexed by agent_id."""
+
+    def __init__(self, collection_name: str = "memories", embedding_model_dims: int = 1536):
+        self.collection_name = collection_name
+        self.embedding_model_dims = embedding_model_dims
+        self._lock = threading.Lock()
+        self._vectors: dict[str, np.ndarray] = {}
+        self._payloads: dict[str, dict] = {}
+        self._by_agent: dict[Optional[str], set[str]] = {}
+
+    @staticmethod
+    def _matches(payload: dict, filters: Optional[dict]) -> bool:
+        return all(payload.get(key) == value for key, value in (filters or {}).items())
+
+    def _candidates(self, filters: Optional[dict]) -> list[str]:
+        if filters and "agent_id" in filters:
+            ids = self._by_agent.get(filters["agent_id"], ())
+        else:
+            ids = self._payloads
+        return [i for i in ids if self._matches(self._payloads[i], filters)]
+
+    def _put(self, vector_id: str, vector, payload: dict) -> None:
+        old = self._payloads.get(vector_id)
+        if old is not None:
+            self._by_agent.get(old.get("agent_id"), set()).discard(vector_id)
+        if vector is not None:
+            self._vectors[vector_id] = np.asarray(vector, dtype=np.float32)
+        self._payloads[vector_id] = payload
+        self._by_agent.setdefault(payload.get("agent_id"), set()).add(vector_id)
+
+    def create_col(self, name, vector_size, distance):
+        pass
+
+    def insert(self, vectors, payloads=None, ids=None):
+        pause(VECTOR_LATENCY_MS)
+        ids = ids or [str(uuid.uuid4()) for _ in vectors]
+        payloads = payloads or [{} for _ in vectors]
+        with self._lock:
+            for vector_id, vector, payload in zip(ids, vectors, payloads):
+                self._put(str(vector_id), vector, dict(payload))
+
+    def search(self, query, vectors, limit=5, filters=None):
+        pause(VECTOR_LATENCY_MS)
+        with self._lock:
+            ids = self._candidates(filters)
+            if not ids:
+                return []
+            matrix = np.stack([self._vectors[i] for i in ids])
+            payloads = [self._payloads[i] for i in ids]
+        query_vector = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query_vector) or 1.0)
+        distances = 1.0 - (matrix @ query_vector) / np.where(norms == 0, 1.0, norms)
+        order = np.argsort(distances)[:limit]
+        return [OutputData(id=ids[n], score=float(distances[n]), payload=payloads[n]) for n in order]
+
+    def delete(self, vector_id):
+        pause(VECTOR_LATENCY_MS)
+        with self._lock:
+            payload = self._payloads.pop(str(vector_id), None)
+            self._vectors.pop(str(vector_id), None)
+            if payload is not None:
+                self._by_agent.get(payload.get("agent_id"), set()).discard(str(vector_id))
+
+    def update(self, vector_id, vector=None, payload=None):
+        pause(VECTOR_LATENCY_MS)
+        with self._lock:
+            if str(vector_id) in self._payloads:
+                self._put(str(vector_id), vector, dict(payload or self._payloads[str(vector_id)]))
+
+    def get(self, vector_id):
+        pause(VECTOR_LATENCY_MS)
+        with self._lock:
+            payload = self._payloads.get(str(vector_id))
+        return OutputData(id=str(vector_id), score=None, payload=payload) if payload is not None else None
+
+    def list_cols(self):
+        return [self.collection_name]
+
+    def delete_col(self):
+        self.reset()
+
+    def col_info(self):
+        return {"name": self.collection_name, "count": len(self._payloads)}
+
+    def list(self, filters=None, limit=None):
+        pause(VECTOR_LATENCY_MS)
+        with self._lock:
+            ids = sorted(self._candidates(filters))[:limit]
+            return [[OutputData(id=i, score=None, payload=self._payloads[i]) for i in ids]]
+
+    def reset(self):
+        with self._lock:
+            self._vectors, self._payloads, self._by_agent = {}, {}, {}
+
+
+# =============================================================================
+# Installation
+# =============================================================================
+
+def install(vector_store: str = VECTOR_STORE) -> None:
+    """Make mem0's factories build the fakes (the service's own vector store unless 'memory')."""
+    create_vector_store = VectorStoreFactory.create
+
+    def llm(provider_name, config=None, **kwargs):
+        return FakeLLM(config)
+
+    def embedder(provider_name, config, vector_config):
+        return FakeEmbedder((config or {}).get("embedding_dims") or 1536)
+
+    def store(provider_name, config):
+        if vector_store != "memory":
+            return create_vector_store(provider_name, config)
+        return InMemoryVectorStore(config.collection_name, config.embedding_model_dims)
+
+    LlmFactory.create = staticmethod(llm)
+    EmbedderFactory.create = staticmethod(embedder)
+    VectorStoreFactory.create = staticmethod(store)
@@ -0,0 +1,20 @@
+"""
+ASGI app for load tests: the real `main.app` on fake Gemini/pgvector backends.
+
+mem0 itself runs here: only its LLM, embedder and (by default) vector store
+are swapped for the stand-ins in fake_backends.py, so extraction, dedup,
+history and the service's batching paths all execute.
+
+    uvicorn benchmarks.fake_service:app --workers 4
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("MEM0_TELEMETRY", "false")
+
+from benchmarks import fake_backends  # noqa: E402
+
+fake_backends.install()
+
+from main import app  # noqa: E402,F401
@@ -0,0 +1,421 @@
+"""
+Load test: replay Vietnamese group-chat traffic against the memory service.
+
+Starts `benchmarks.fake_service:app` (fake_backends.py: a deterministic LLM
+and embedder with configurable latency, and an in-memory or local pgvector
+store), seeds every group with a few messages, then runs `--concurrency`
+closed-loop clients for `--duration` seconds over a mix of adds, searches and
+/memories/all pages across many workspaces. Hot workspaces get most of the
+traffic (Zipf-like). Half of the messages are lines of the chat corpus
+(data/vietnamese_chat.txt, chatter included), half are generated facts, so
+every group's memory keeps growing.
+
+Reports throughput, p50/p95/p99 latency and errors per operation, and the
+service's resident memory (sum over its worker processes, sampled every
+0.5s; Linux only). With --save the results are written as JSON; with
+--baseline the run fails (exit 1) when throughput drops or p95 grows by more
+than --tolerance, so a regression in main.py shows up before deploy.
+
+Pass --url to load an already running service instead (its backends and
+memory are then up to that deployment). Needs numpy and httpx.
+
+Usage:
+    python benchmarks/load_test.py [--duration 30] [--concurrency 32]
+        [--workspaces 50] [--groups 3] [--seed-messages 20]
+        [--mix add=0.3,search=0.6,all=0.1] [--search-mode vector|hybrid]
+        [--llm-ms 800] [--embed-ms 60] [--store memory|local|pgvector] [--workers 1]
+        [--env KEY=VALUE ...] [--corpus PATH] [--save FILE] [--baseline FILE]
+        [--tolerance 0.2] [--url http://localhost:8000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import httpx
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vietnamese_chat.txt")
+
+# =============================================================================
+# Traffic
+# =============================================================================
+
+NAMES = ["Lan", "Minh", "Hùng", "Trang", "Tuấn", "Hoa", "Nam", "Linh", "Dũng", "Mai", "Phương", "Quân", "Thảo", "Khoa"]
+TOPICS = ["sprint planning", "báo cáo quý", "chiến dịch marketing", "ngân sách 2026", "tuyển dụng", "release app"]
+DRINKS = ["cà phê sữa đá", "trà đào", "bạc xỉu", "trà sữa trân châu", "nước cam"]
+COMPANIES = ["Vinamilk", "FPT", "Thế Giới Di Động", "Viettel", "Highlands"]
+
+FACTS = [
+    "{name} ơi, mai {hour}h họp {topic} ở phòng {room} nhé",
+    "Deadline {topic} là ngày {day}/{month}, mọi người nhớ nộp đúng hạn nha",
+    "Xe của {name} biển số 51{letter}-{plate}, để ở hầm B{room}",
+    "Số điện thoại mới của {name} là 09{phone}",
+    "{name} thích uống {drink}, ít đường",
+    "Tuần sau {name} nghỉ phép từ thứ {weekday} đến chủ nhật",
+    "Sinh nhật {name} là ngày {day}/{month}, cả team chuẩn bị quà nhé",
+    "Khách hàng {company} chốt đơn {amount} triệu, giao hàng trước ngày {day}/{month}",
+    "Wifi phòng họp tầng {room} tên là Office-{room}, mật khẩu {phone}",
+    "Chiều nay {hour}h {name} đi gặp khách hàng {company} ở quận {room}",
+]
+QUERIES = [
+    "{name} thích uống gì",
+    "biển số xe của {name}",
+    "họp {topic} lúc mấy giờ",
+    "deadline {topic} khi nào",
+    "số điện thoại của {name}",
+    "sinh nhật {name} ngày nào",
+    "khách hàng {company} chốt bao nhiêu",
+    "mật khẩu wifi phòng họp",
+    "{name} nghỉ phép ngày nào",
+    "lịch gặp khách hàng {company}",
+]
+CORPUS_RATIO = 0.5
+
+
+def fill(template: str, rng: random.Random) -> str:
+    return template.format(
+        name=rng.choice(NAMES), topic=rng.choice(TOPICS), drink=rng.choice(DRINKS), company=rng.choice(COMPANIES),
+        hour=rng.randint(8, 17), room=rng.randint(1, 9), day=rng.randint(1, 28), month=rng.randint(1, 12),
+        letter=rng.choice("ABCDGH"), plate=rng.randint(10000, 99999), phone=rng.randint(10000000, 99999999),
+        weekday=rng.randint(2, 6), amount=rng.randint(5, 900),
+    )
+
+
+class Traffic:
+    """Deterministic stream of requests over workspaces/groups/users."""
+
+    def __init__(
+        self, seed: int, corpus: list[str], workspaces: int, groups: int, users: int, search_mode: Optional[str]
+    ):
+        self.rng = random.Random(seed)
+        self.corpus = corpus
+        self.scopes = [(f"ws{w}", f"ws{w}-g{g}") for w in range(workspaces) for g in range(groups)]
+        # Zipf-like: workspace w gets weight 1 / (w + 1), shared by its groups
+        self.weights = [1.0 / (int(ws[2:]) + 1) for ws, _ in self.scopes]
+        self.users = users
+        self.search_mode = search_mode
+
+    def scope(self) -> dict:
+        workspace_id, group_id = self.rng.choices(self.scopes, weights=self.weights)[0]
+        return {"workspace_id": workspace_id, "group_id": group_id, "user_id": f"{group_id}-u{self.rng.randrange(self.users)}"}
+
+    def message(self) -> str:
+        if self.corpus and self.rng.random() < CORPUS_RATIO:
+            return self.rng.choice(self.corpus)
+        return fill(self.rng.choice(FACTS), self.rng)
+
+    def add(self, scope: Optional[dict] = None) -> dict:
+        scope = scope or self.scope()
+        sent_at = datetime.now(timezone.utc) - timedelta(minutes=self.rng.randrange(0, 60 * 24 * 7))
+        return {
+            **scope,
+            "message": self.message(),
+            "sender_name": self.rng.choice(NAMES),
+            "platform": "telegram",
+            "sent_at": sent_at.isoformat(),
+        }
+
+    def search(self) -> dict:
+        body = {**self.scope(), "query": fill(self.rng.choice(QUERIES), self.rng), "limit": 5}
+        if self.search_mode:
+            body["mode"] = self.search_mode
+        return body
+
+    def all(self) -> dict:
+        return {**self.scope(), "limit": 50}
+
+
+# =============================================================================
+# Service process
+# =============================================================================
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_service(args, data_dir: str) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    env = {
+        **os.environ,
+        "BENCH_LLM_LATENCY_MS": str(args.llm_ms),
+        "BENCH_EMBED_LATENCY_MS": str(args.embed_ms),
+        "BENCH_VECTOR_STORE": args.store,
+        "GEMINI_API_KEY": os.getenv("GEMINI_API_KEY", "fake"),
+        "MEM0_DIR": data_dir,
+        "MEMORY_JOBS_DB": os.path.join(data_dir, "jobs.db"),
+        "MEMORY_EMBED_CACHE_DB": os.path.join(data_dir, "embeddings.db"),
+        "MEMORY_SHARED_STATE_DB": os.path.join(data_dir, "state.db"),
+        "PROMETHEUS_MULTIPROC_DIR": os.path.join(data_dir, "metrics"),
+    }
+    os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+    if args.store == "memory":
+        env["MEMORY_PG_POOL_ENABLED"] = "false"
+    elif args.store == "local":
+        env["MEMORY_VECTOR_STORE"] = "local"
+        env["MEMORY_LOCAL_STORE_PATH"] = os.path.join(data_dir, "vectors")
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "benchmarks.fake_service:app",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning",
+        ],
+        cwd=SERVICE_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit(f"Service exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{url}/health/ready", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    sys.exit("Service did not become ready within 60s")
+
+
+def process_tree_rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of `pid` and its descendants, from /proc."""
+    if not os.path.isdir("/proc"):
+        return None
+    parents: dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        children = [child for child, ppid in parents.items() if ppid == parent and child not in tree]
+        tree.update(children)
+        frontier.extend(children)
+    total_kb = 0
+    for member in tree:
+        try:
+            with open(f"/proc/{member}/status") as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration):
+            continue
+    return total_kb / 1024
+
+
+async def sample_memory(pid: int, samples: list[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        rss = process_tree_rss_mb(pid)
+        if rss is not None:
+            samples.append(rss)
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+# =============================================================================
+# Load
+# =============================================================================
+
+ENDPOINTS = {"add": "/memories/add", "search": "/memories/search", "all": "/memories/all"}
+
+
+async def seed(client: httpx.AsyncClient, traffic: Traffic, per_group: int) -> None:
+    """Give every group some history, through /memories/add-batch."""
+    async def seed_group(workspace_id: str, group_id: str) -> None:
+        scope = {"workspace_id": workspace_id, "group_id": group_id, "user_id": f"{group_id}-u0"}
+        messages = [traffic.add(scope) for _ in range(per_group)]
+        for start in range(0, len(messages), 20):
+            response = await client.post("/memories/add-batch", json={"messages": messages[start:start + 20]})
+            response.raise_for_status()
+
+    limit = asyncio.Semaphore(8)
+
+    async def bounded(scope):
+        async with limit:
+            await seed_group(*scope)
+
+    await asyncio.gather(*(bounded(scope) for scope in traffic.scopes))
+
+
+async def client_loop(client, traffic: Traffic, mix: dict[str, float], deadline: float, results: dict) -> None:
+    operations, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline:
+        operation = traffic.rng.choices(operations, weights=weights)[0]
+        body = getattr(traffic, operation)()
+        started = time.perf_counter()
+        try:
+            response = await client.post(ENDPOINTS[operation], json=body)
+            elapsed = time.perf_counter() - started
+            if response.status_code in (429, 503):
+                outcome = "rejected"
+            elif response.status_code != 200 or not response.json().get("success"):
+                outcome = "error"
+            else:
+                outcome = "ok"
+        except httpx.HTTPError:
+            elapsed, outcome = time.perf_counter() - started, "error"
+        result = results[operation]
+        result[outcome] += 1
+        if outcome == "ok":
+            result["latencies"].append(elapsed)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(results: dict, duration: float, rss: list[float]) -> dict:
+    summary = {"duration_s": round(duration, 1), "operations": {}}
+    total = 0
+    for operation, result in results.items():
+        latencies = sorted(result["latencies"])
+        total += result["ok"]
+        summary["operations"][operation] = {
+            "ok": result["ok"],
+            "errors": result["error"],
+            "rejected": result["rejected"],
+            "rps": round(result["ok"] / duration, 2),
+            "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else 0.0,
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        }
+    summary["rps"] = round(total / duration, 2)
+    if rss:
+        summary["rss_mb"] = {"start": round(rss[0], 1), "peak": round(max(rss), 1), "end": round(rss[-1], 1)}
+    return summary
+
+
+def print_summary(summary: dict) -> None:
+    print(f"\n{'operation':>9} {'ok':>7} {'errors':>7} {'503/429':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for operation, row in summary["operations"].items():
+        print(
+            f"{operation:>9} {row['ok']:>7} {row['errors']:>7} {row['rejected']:>7} {row['rps']:>8.2f} "
+            f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}"
+        )
+    print(f"{'total':>9} {'':>7} {'':>7} {'':>6} {summary['rps']:>8.2f}")
+    if "rss_mb" in summary:
+        rss = summary["rss_mb"]
+        print(f"service RSS: {rss['start']:.1f} MB at start, {rss['peak']:.1f} MB peak, {rss['end']:.1f} MB at end")
+
+
+def regressions(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    found = []
+    if summary["rps"] < baseline["rps"] * (1 - tolerance):
+        found.append(f"throughput {summary['rps']} req/s vs {baseline['rps']} baseline")
+    for operation, row in summary["operations"].items():
+        before = baseline["operations"].get(operation)
+        if before and before["p95_ms"] and row["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            found.append(f"{operation} p95 {row['p95_ms']} ms vs {before['p95_ms']} ms baseline")
+    return found
+
+
+async def run(args, url: str, pid: Optional[int]) -> dict:
+    mix = {}
+    for part in args.mix.split(","):
+        operation, _, weight = part.partition("=")
+        if operation not in ENDPOINTS:
+            sys.exit(f"Unknown operation in --mix: {operation}")
+        mix[operation] = float(weight)
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [line.strip() for line in f if line.strip()]
+    traffic = Traffic(args.seed, corpus, args.workspaces, args.groups, args.users, args.search_mode)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as client:
+        if args.seed_messages:
+            started = time.monotonic()
+            print(f"Seeding {len(traffic.scopes)} groups x {args.seed_messages} messages...")
+            await seed(client, traffic, args.seed_messages)
+            print(f"  seeded in {time.monotonic() - started:.1f}s")
+
+        results = {operation: {"ok": 0, "error": 0, "rejected": 0, "latencies": []} for operation in mix}
+        rss: list[float] = []
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(sample_memory(pid, rss, stop)) if pid else None
+        print(f"Running {args.concurrency} clients for {args.duration}s ({args.mix})...")
+        started = time.monotonic()
+        deadline = started + args.duration
+        await asyncio.gather(*(
+            client_loop(client, traffic, mix, deadline, results) for _ in range(args.concurrency)
+        ))
+        duration = time.monotonic() - started
+        stop.set()
+        if sampler:
+            await sampler
+    return summarize(results, duration, rss)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workspaces", type=int, default=50)
+    parser.add_argument("--groups", type=int, default=3, help="groups per workspace")
+    parser.add_argument("--users", type=int, default=8, help="users per group")
+    parser.add_argument("--seed-messages", type=int, default=20, help="messages per group before the run")
+    parser.add_argument("--mix", default="add=0.3,search=0.6,all=0.1")
+    parser.add_argument("--search-mode", choices=["vector", "hybrid"], help="mode sent with searches")
+    parser.add_argument("--llm-ms", type=float, default=800, help="fake LLM latency")
+    parser.add_argument("--embed-ms", type=float, default=60, help="fake embedding latency")
+    parser.add_argument("--store", choices=["memory", "local", "pgvector"], default="memory",
+                        help="local: the embedded store (one worker); pgvector uses the DB_* database: "
+                             "point it at a scratch database")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--env", action="append", default=[], help="extra service env, KEY=VALUE")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--url", help="load an already running service instead")
+    parser.add_argument("--save", help="write the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix="memory-load-") as data_dir:
+        if args.url:
+            url = args.url
+        else:
+            process, url = start_service(args, data_dir)
+        try:
+            summary = asyncio.run(run(args, url, process.pid if process else None))
+        finally:
+            if process:
+                process.terminate()
+                process.wait(timeout=30)
+
+    summary["config"] = {key: value for key, value in vars(args).items() if key not in ("save", "baseline")}
+    print_summary(summary)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(summary, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION: {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
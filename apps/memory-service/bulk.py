@@ -0,0 +1,205 @@
+"""
+Bulk updates and deletes for cleanup jobs.
+
+mem0 handles one memory per call: a vector store read, a write, an embedding
+call (updates) and a history INSERT, each in its own transaction. Here many
+operations share a few set-based statements per batch of BULK_BATCH_SIZE:
+
+- deletes: one DELETE ... WHERE id = ANY(...) RETURNING payload
+- updates: one SELECT of the current payloads, one embedding batch for the new
+  texts, one UPDATE ... FROM unnest(...)
+- scope deletes (delete-all): DELETE ... RETURNING in batches, so a large
+  workspace is never loaded into Python at once
+- the history rows of a batch are written in one SQLite transaction
+
+Payloads and history rows are built exactly as mem0's `update` / `delete` do.
+With a non-pgvector store the operations fall back to mem0's per-item calls.
+"""
+import hashlib
+import os
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from mem0.memory.main import _normalize_iso_timestamp_to_utc
+from mem0.vector_stores.pgvector import PGVector
+
+from batching import embed_texts
+from pgvector_store import delete_ids, delete_scope_batch, fetch_payloads, update_rows
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+BULK_MAX_OPERATIONS = int(os.getenv("MEMORY_BULK_MAX_OPERATIONS", "1000"))
+BULK_BATCH_SIZE = int(os.getenv("MEMORY_BULK_BATCH_SIZE", "500"))
+
+# Session keys carried over from the existing payload on update (mem0 semantics)
+PRESERVED_KEYS = ("user_id", "agent_id", "run_id", "actor_id", "role")
+
+HISTORY_INSERT = (
+    "INSERT INTO history (id, memory_id, old_memory, new_memory, event, "
+    "created_at, updated_at, is_deleted, actor_id, role) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def not_found(memory_id: str) -> str:
+    return f"Memory with id {memory_id} not found"
+
+
+def write_history(memory, rows: list[tuple]) -> None:
+    """Write history rows through mem0's SQLiteManager in one transaction."""
+    if not rows:
+        return
+    db = memory.db
+    with db._lock:
+        try:
+            db.connection.execute("BEGIN")
+            db.connection.executemany(HISTORY_INSERT, rows)
+            db.connection.execute("COMMIT")
+        except Exception:
+            db.connection.execute("ROLLBACK")
+            raise
+
+
+def deletion_history(deleted: dict[str, dict]) -> list[tuple]:
+    updated_at = datetime.now(timezone.utc).isoformat()
+    return [
+        (
+            str(uuid.uuid4()), memory_id, payload.get("data", ""), None, "DELETE",
+            _normalize_iso_timestamp_to_utc(payload.get("created_at")), updated_at, 1,
+            payload.get("actor_id"), payload.get("role"),
+        )
+        for memory_id, payload in deleted.items()
+    ]
+
+
+def scopes_of(payloads) -> set[tuple[Optional[str], Optional[str]]]:
+    return {(payload.get("agent_id"), payload.get("run_id")) for payload in payloads}
+
+
+def batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# =============================================================================
+# Operations
+# =============================================================================
+# Each returns per-id errors (None on success) and the (agent_id, run_id)
+# scopes it touched, for the caller to invalidate. Blocking; run on the
+# write pool.
+
+def bulk_delete(memory, memory_ids: list[str]) -> tuple[dict[str, Optional[str]], set]:
+    """Delete many memories by id."""
+    errors: dict[str, Optional[str]] = {}
+    scopes: set = set()
+    store = memory.vector_store
+    if not isinstance(store, PGVector):
+        for memory_id in memory_ids:
+            try:
+                existing = memory.get(memory_id)
+                memory.delete(memory_id)
+                errors[memory_id] = None
+                scopes |= scopes_of([existing or {}])
+            except Exception as e:
+                errors[memory_id] = str(e)
+        return errors, scopes
+
+    for batch in batches(memory_ids, BULK_BATCH_SIZE):
+        try:
+            deleted = delete_ids(store, batch)
+            write_history(memory, deletion_history(deleted))
+        except Exception as e:
+            errors.update({memory_id: str(e) for memory_id in batch})
+            continue
+        for memory_id in batch:
+            errors[memory_id] = None if memory_id in deleted else not_found(memory_id)
+        scopes |= scopes_of(deleted.values())
+    return errors, scopes
+
+
+def bulk_update(memory, updates: dict[str, str]) -> tuple[dict[str, Optional[str]], set]:
+    """Replace the text of many memories (re-embedded in one batch per chunk)."""
+    errors: dict[str, Optional[str]] = {}
+    scopes: set = set()
+    store = memory.vector_store
+    if not isinstance(store, PGVector):
+        for memory_id, data in updates.items():
+            try:
+                existing = memory.get(memory_id)
+                memory.update(memory_id, data)
+                errors[memory_id] = None
+                scopes |= scopes_of([existing or {}])
+            except Exception as e:
+                errors[memory_id] = str(e)
+        return errors, scopes
+
+    for batch in batches(list(updates), BULK_BATCH_SIZE):
+        try:
+            existing = update_batch(memory, store, {memory_id: updates[memory_id] for memory_id in batch})
+        except Exception as e:
+            errors.update({memory_id: str(e) for memory_id in batch})
+            continue
+        for memory_id in batch:
+            errors[memory_id] = None if memory_id in existing else not_found(memory_id)
+        scopes |= scopes_of(existing.values())
+    return errors, scopes
+
+
+def update_batch(memory, store: PGVector, updates: dict[str, str]) -> dict[str, dict]:
+    """Update the memories of one batch that exist; returns their previous payloads."""
+    existing = fetch_payloads(store, list(updates))
+    found = [memory_id for memory_id in updates if memory_id in existing]
+    if not found:
+        return existing
+
+    embeddings = embed_texts(memory, [updates[memory_id] for memory_id in found], "update")
+    updated_at = datetime.now(timezone.utc).isoformat()
+    rows, history = [], []
+    for memory_id, vector in zip(found, embeddings):
+        old, data = existing[memory_id], updates[memory_id]
+        payload = {
+            "data": data,
+            "hash": hashlib.md5(data.encode()).hexdigest(),
+            "created_at": _normalize_iso_timestamp_to_utc(old.get("created_at")),
+            "updated_at": updated_at,
+            **{key: old[key] for key in PRESERVED_KEYS if key in old},
+        }
+        rows.append((memory_id, vector, payload))
+        history.append((
+            str(uuid.uuid4()), memory_id, old.get("data"), data, "UPDATE",
+            payload["created_at"], updated_at, 0, payload.get("actor_id"), payload.get("role"),
+        ))
+    update_rows(store, rows)
+    write_history(memory, history)
+    return existing
+
+
+def bulk_delete_scope(memory, filters: dict) -> int:
+    """
+    Delete every memory matching `filters` (user_id/agent_id/run_id).
+
+    Returns the number deleted. Other stores go through mem0's per-memory
+    delete, a page at a time (`memory.delete_all` reports no count and only
+    deletes the first page of `list`).
+    """
+    store = memory.vector_store
+    if not isinstance(store, PGVector):
+        total = 0
+        while True:
+            rows = store.list(filters=filters, limit=BULK_BATCH_SIZE)[0]
+            for row in rows:
+                memory._delete_memory(row.id)
+            total += len(rows)
+            if len(rows) < BULK_BATCH_SIZE:
+                return total
+
+    total = 0
+    while True:
+        deleted = delete_scope_batch(store, filters, BULK_BATCH_SIZE)
+        write_history(memory, deletion_history(deleted))
+        total += len(deleted)
+        if len(deleted) < BULK_BATCH_SIZE:
+            return total
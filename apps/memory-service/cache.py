@@ -0,0 +1,136 @@
+"""
+In-process caches for search traffic.
+
+- TTLCache: thread-safe LRU + TTL map with hit/miss counters and tag-based
+  invalidation. Each tag carries a generation number so a result computed
+  before an invalidation is never stored after it.
+
+Embeddings are cached separately (and persistently) in embedding_cache.py.
+
+Search results are tagged with their agent_id/run_id scope; every write to a
+scope invalidates that scope's entries.
+"""
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+SEARCH_CACHE_SIZE = int(os.getenv("MEMORY_SEARCH_CACHE_SIZE", "1024"))
+SEARCH_CACHE_TTL = float(os.getenv("MEMORY_SEARCH_CACHE_TTL", "300"))
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form for cache keys: NFC, lowercase, collapsed whitespace."""
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+def scope_tag(agent_id: Optional[str], run_id: Optional[str]) -> str:
+    """Invalidation tag for an agent_id/run_id scope."""
+    return f"{agent_id}|{run_id or ''}"
+
+
+# =============================================================================
+# Caches
+# =============================================================================
+
+class TTLCache:
+    """Bounded LRU cache with per-entry TTL and tag invalidation."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any, Optional[str]]] = OrderedDict()
+        self._tags: dict[str, set[Hashable]] = {}
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, tag = self._data.pop(key)
+        if tag is not None:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a live entry (refreshing its LRU position) or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, tag: str) -> int:
+        """Current generation of a tag; pass it back to `set` to detect races."""
+        with self._lock:
+            return self._generations.get(tag, 0)
+
+    def set(self, key: Hashable, value: Any, tag: Optional[str] = None, generation: Optional[int] = None) -> None:
+        """Store an entry unless its tag was invalidated since `generation` was read."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if tag is not None and generation is not None and self._generations.get(tag, 0) != generation:
+                return
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, value, tag)
+            if tag is not None:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate_tag(self, tag: str) -> None:
+        """Drop every entry of a tag and bump its generation."""
+        with self._lock:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in list(self._tags.get(tag, ())):
+                self._drop(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._tags.clear()
+            for tag in self._generations:
+                self._generations[tag] += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+search_cache = TTLCache("search", SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
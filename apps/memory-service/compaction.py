@@ -0,0 +1,436 @@
+"""
+Background compaction of near-duplicate and expired memories.
+
+Groups restate the same fact ("Lịch họp ngày 18/12/2026 lúc 10:00 ..." from
+three people) and keep schedule facts long after their date. Both crowd
+better memories out of small search limits. A compaction cycle walks the
+collection one agent_id at a time, in keyset pages of MEMORY_COMPACTION_BATCH
+rows, and archives:
+
+- duplicates: each memory added or updated since the agent's last complete
+  pass is compared with its MEMORY_COMPACTION_NEIGHBORS nearest memories in
+  the same agent_id/run_id scope (one ANN probe). Pairs within
+  MEMORY_COMPACTION_MAX_DISTANCE (cosine) that carry the same numbers (dates,
+  times, amounts) are clustered; the longest text, then the newest, is kept.
+  Facts that differ only in a date or time are never merged.
+- expired facts: schedule facts ("lịch họp", "cuộc hẹn", "hạn nộp", "deadline",
+  ...; whole phrases, so "lịch sử" or "hạn chế" do not count) whose latest
+  absolute date, as written by normalize_vietnamese_dates and the extraction
+  prompt (dd/mm/yyyy, "tháng m/yyyy"), is more than
+  MEMORY_COMPACTION_RETENTION_DAYS in the past. Birthdays and anniversaries
+  are kept.
+
+Archived rows move to <collection>_archive with their vector, payload and
+reason, and get a DELETE history entry like any delete; `python
+compaction.py restore` moves them back. Progress is stored per agent_id in
+<collection>_compaction, so cycles resume where the previous one stopped.
+
+Bounded: a cycle stops after MEMORY_COMPACTION_MAX_SECONDS, pauses
+MEMORY_COMPACTION_PAUSE_MS between pages, holds one database connection at a
+time and waits while requests are queued for the read/write pools. The
+background worker runs each page on the write pool, attributed to its
+agent_id like a request, so it also counts against the bounded workers and
+that tenant's fair share. Each host
+runs one cycle per MEMORY_COMPACTION_INTERVAL, whichever worker starts it
+first; with several hosts, enable it on one. Only the pgvector store is
+supported.
+
+    python compaction.py run [--agent workspace_1] [--dry-run] [--max-seconds 600]
+    python compaction.py restore --agent workspace_1 [--run group_2] [--reason duplicate|expired]
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Iterable, Optional
+
+from metrics import COMPACTION_ARCHIVED, COMPACTION_SCANNED
+from shared import shared_state
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# shadow: count what would be archived | enforce: archive | off. Shadow by
+# default: switch to enforce once the shadow counts look right for your data
+COMPACTION_MODE = os.getenv("MEMORY_COMPACTION_MODE", "shadow").lower()
+# Seconds between cycles (per host); 0 disables the background worker
+COMPACTION_INTERVAL = float(os.getenv("MEMORY_COMPACTION_INTERVAL", "3600"))
+COMPACTION_MAX_SECONDS = float(os.getenv("MEMORY_COMPACTION_MAX_SECONDS", "60"))
+COMPACTION_BATCH = int(os.getenv("MEMORY_COMPACTION_BATCH", "200"))
+COMPACTION_PAUSE = float(os.getenv("MEMORY_COMPACTION_PAUSE_MS", "100")) / 1000
+# Cosine distance under which two memories of a scope may be duplicates
+DUPLICATE_MAX_DISTANCE = float(os.getenv("MEMORY_COMPACTION_MAX_DISTANCE", "0.05"))
+DUPLICATE_NEIGHBORS = int(os.getenv("MEMORY_COMPACTION_NEIGHBORS", "5"))
+# Days after its last date a schedule fact is archived; 0 disables expiry
+RETENTION_DAYS = int(os.getenv("MEMORY_COMPACTION_RETENTION_DAYS", "30"))
+
+# How often workers check whether this interval's cycle has started
+POLL_SECONDS = 60
+
+
+# =============================================================================
+# Facts
+# =============================================================================
+
+DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+MONTH_RE = re.compile(r"\btháng (\d{1,2})/(\d{4})\b", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\d+")
+# Facts about an event that is over once its date has passed. Whole phrases:
+# the bare syllables (lịch, hạn, gặp, bay) also start everyday words such as
+# "lịch sử", "du lịch", "hạn chế" or "gặp vợ lần đầu", which are permanent facts
+SCHEDULE_RE = re.compile(
+    r"\b(?:lịch (?:họp|hẹn|bay|khám|phỏng vấn|trình)|cuộc họp|buổi họp|hẹn họp|họp (?:khách hàng|team|nhóm|với)"
+    r"|cuộc hẹn|có hẹn|hẹn gặp|hạn chót|hạn nộp|nộp (?:báo cáo|hồ sơ)|chuyến bay|buổi phỏng vấn"
+    r"|buổi demo|deadline|meeting)\b",
+    re.IGNORECASE,
+)
+# Dated facts that stay true
+PERMANENT_RE = re.compile(r"\b(?:sinh nhật|ngày sinh|sinh ngày|kỷ niệm|thành lập|ngày giỗ)\b", re.IGNORECASE)
+
+
+def last_date(text: str) -> Optional[date]:
+    """Latest absolute date in a fact: dd/mm/yyyy, or the end of "tháng m/yyyy"."""
+    dates = []
+    for day, month, year in DATE_RE.findall(text):
+        try:
+            dates.append(date(int(year), int(month), int(day)))
+        except ValueError:
+            continue
+    for month, year in MONTH_RE.findall(text):
+        month, year = int(month), int(year)
+        if 1 <= month <= 12:
+            dates.append(date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1))
+    return max(dates) if dates else None
+
+
+def is_expired(text: str, today: date) -> bool:
+    if RETENTION_DAYS <= 0 or not SCHEDULE_RE.search(text) or PERMANENT_RE.search(text):
+        return False
+    latest = last_date(text)
+    return latest is not None and latest + timedelta(days=RETENTION_DAYS) < today
+
+
+def number_signature(text: str) -> tuple[str, ...]:
+    """Numbers in a fact; duplicates must agree on them (dates, times, amounts)."""
+    return tuple(sorted(NUMBER_RE.findall(text)))
+
+
+def changed_at(payload: dict) -> Optional[datetime]:
+    """When a memory was last written (updated_at, else created_at), timezone-aware."""
+    value = payload.get("updated_at") or payload.get("created_at")
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def clusters(edges: Iterable[tuple[str, str]]) -> list[set[str]]:
+    """Connected components of the duplicate graph (union-find)."""
+    parent: dict[str, str] = {}
+
+    def find(node: str) -> str:
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b in edges:
+        parent[find(a)] = find(b)
+    groups: dict[str, set[str]] = {}
+    for node in parent:
+        groups.setdefault(find(node), set()).add(node)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def pick_survivor(cluster: set[str], payloads: dict[str, dict]) -> str:
+    """The copy kept: longest text, then most recently written (then id, for determinism)."""
+    oldest = datetime.min.replace(tzinfo=timezone.utc)
+    return max(
+        cluster,
+        key=lambda memory_id: (
+            len(payloads[memory_id].get("data", "")),
+            changed_at(payloads[memory_id]) or oldest,
+            memory_id,
+        ),
+    )
+
+
+# =============================================================================
+# Cycles
+# =============================================================================
+
+def new_state(agent_id: str) -> dict:
+    return {"agent_id": agent_id, "after_id": None, "pass_started_at": None, "checked_until": None}
+
+
+def compact_page(
+    memory,
+    state: dict,
+    enforce: bool,
+    on_archived: Optional[Callable[[set], None]] = None,
+) -> tuple[dict, Counter]:
+    """
+    Compact the next page of an agent_id; returns its new state (after_id
+    None once the pass is complete) and counts. Blocking.
+    """
+    from bulk import deletion_history, scopes_of, write_history
+    from pgvector_store import archive_ids, list_page, near_duplicates
+
+    store = memory.vector_store
+    agent_id = state["agent_id"]
+    rows = list_page(store, {"agent_id": agent_id}, state["after_id"], COMPACTION_BATCH)
+    stats = Counter(scanned=len(rows))
+    COMPACTION_SCANNED.inc(len(rows))
+    today = date.today()
+    payloads = {row.id: row.payload or {} for row in rows}
+    archive = {memory_id: "expired" for memory_id, p in payloads.items() if is_expired(p.get("data", ""), today)}
+
+    # Only memories written since the last complete pass are probed for duplicates
+    checked_until = state["checked_until"]
+    fresh = [
+        memory_id for memory_id, payload in payloads.items()
+        if memory_id not in archive
+        and (checked_until is None or (changed_at(payload) or checked_until) >= checked_until)
+    ]
+    if fresh:
+        edges = []
+        for memory_id, other_id, _, other in near_duplicates(
+            store, agent_id, fresh, DUPLICATE_MAX_DISTANCE, DUPLICATE_NEIGHBORS
+        ):
+            other = payloads.setdefault(other_id, other or {})
+            text, other_text = payloads[memory_id].get("data", ""), other.get("data", "")
+            if other_id in archive or is_expired(other_text, today):
+                continue
+            if number_signature(text) == number_signature(other_text):
+                edges.append((memory_id, other_id))
+        for cluster in clusters(edges):
+            survivor = pick_survivor(cluster, payloads)
+            archive.update({memory_id: "duplicate" for memory_id in cluster if memory_id != survivor})
+
+    mode = "enforce" if enforce else "shadow"
+    scopes: set = set()
+    for reason in ("expired", "duplicate"):
+        ids = [memory_id for memory_id, why in archive.items() if why == reason]
+        if not ids:
+            continue
+        if enforce:
+            moved = archive_ids(store, ids, reason)
+            write_history(memory, deletion_history(moved))
+            scopes |= scopes_of(moved.values())
+            count = len(moved)
+        else:
+            count = len(ids)
+        COMPACTION_ARCHIVED.labels(reason, mode).inc(count)
+        stats[reason] += count
+    if scopes and on_archived is not None:
+        on_archived(scopes)
+
+    state = {**state, "after_id": rows[-1].id if len(rows) == COMPACTION_BATCH else None}
+    if state["after_id"] is None and enforce:
+        # Shadow passes leave the watermark alone, so enforcing later probes everything again
+        state["checked_until"] = state["pass_started_at"]
+    return state, stats
+
+
+def run_cycle(
+    memory,
+    max_seconds: float = COMPACTION_MAX_SECONDS,
+    enforce: bool = True,
+    agents: Optional[list[str]] = None,
+    persist: bool = True,
+    should_yield: Optional[Callable[[], bool]] = None,
+    on_archived: Optional[Callable[[set], None]] = None,
+    stop: Optional[threading.Event] = None,
+    run_page: Optional[Callable[..., tuple[dict, Counter]]] = None,
+) -> dict:
+    """
+    Compact agent_ids page by page until `max_seconds` have passed or each
+    agent_id was visited once: the unfinished one first, then the following
+    ones in order, wrapping around. `agents` restricts the cycle to those
+    (from the start of a pass); `persist=False` neither reads nor saves
+    progress. `run_page` runs compact_page: the background worker runs it on
+    the write pool, the CLI calls it directly (the default). Blocking.
+    """
+    from mem0.vector_stores.pgvector import PGVector
+
+    from pgvector_store import (
+        agent_ids_after,
+        compaction_position,
+        ensure_compaction_tables,
+        load_compaction_state,
+        save_compaction_state,
+    )
+
+    store = memory.vector_store
+    if not isinstance(store, PGVector):
+        return {"skipped": "compaction needs the pgvector store"}
+    ensure_compaction_tables(store)
+    stop = stop or threading.Event()
+    started = time.monotonic()
+    deadline = started + max_seconds
+    stats: Counter = Counter()
+
+    def next_agent(after: Optional[str]) -> Optional[str]:
+        if agents is not None:
+            return agents[len(visited)] if len(visited) < len(agents) else None
+        following = agent_ids_after(store, after, 1) or agent_ids_after(store, None, 1)
+        return following[0] if following else None
+
+    position = compaction_position(store) if persist and agents is None else None
+    agent = position["agent_id"] if position and position["after_id"] else None
+    last = position["agent_id"] if position else None
+    visited: set[str] = set()
+    while time.monotonic() < deadline and not stop.is_set():
+        agent = agent or next_agent(last)
+        if agent is None or agent in visited:
+            break
+        visited.add(agent)
+        state = (load_compaction_state(store, agent) if persist else None) or new_state(agent)
+        if state["after_id"] is None:
+            state["pass_started_at"] = datetime.now(timezone.utc)
+        while not stop.is_set():
+            if should_yield is not None and should_yield():
+                # Live traffic is queued: wait for it to drain
+                if time.monotonic() >= deadline:
+                    break
+                stop.wait(COMPACTION_PAUSE)
+                continue
+            state, page = (run_page or compact_page)(memory, state, enforce, on_archived)
+            stats.update(page)
+            if persist:
+                save_compaction_state(store, state)
+            if state["after_id"] is None:
+                stats["passes"] += 1
+                break
+            if time.monotonic() >= deadline:
+                break
+            stop.wait(COMPACTION_PAUSE)
+        last, agent = agent, None
+    return {**stats, "agents": len(visited), "seconds": round(time.monotonic() - started, 3)}
+
+
+class Compactor:
+    """Background thread running one compaction cycle per COMPACTION_INTERVAL and host."""
+
+    _thread: Optional[threading.Thread] = None
+    _stop = threading.Event()
+    _running = False
+    _last: Optional[dict] = None
+
+    @classmethod
+    def start(
+        cls,
+        get_memory: Callable[[], Any],
+        should_yield: Callable[[], bool],
+        on_archived: Callable[[set], None],
+        run_page: Callable[..., tuple[dict, Counter]],
+    ) -> None:
+        if COMPACTION_MODE == "off" or COMPACTION_INTERVAL <= 0 or cls._thread is not None:
+            return
+        cls._stop.clear()
+        cls._thread = threading.Thread(
+            target=cls._run,
+            args=(get_memory, should_yield, on_archived, run_page),
+            name="mem0-compaction",
+            daemon=True,
+        )
+        cls._thread.start()
+
+    @classmethod
+    def _run(cls, get_memory, should_yield, on_archived, run_page) -> None:
+        while not cls._stop.wait(min(POLL_SECONDS, COMPACTION_INTERVAL)):
+            try:
+                # The first worker on the host to look in this interval runs the cycle
+                if shared_state.hit("compaction", COMPACTION_INTERVAL) != 1:
+                    continue
+                cls._running = True
+                result = run_cycle(
+                    get_memory(),
+                    enforce=COMPACTION_MODE == "enforce",
+                    should_yield=should_yield,
+                    on_archived=on_archived,
+                    stop=cls._stop,
+                    run_page=run_page,
+                )
+                cls._last = {**result, "finished_at": datetime.now(timezone.utc).isoformat()}
+                print(f"[Memory Service] Compaction cycle: {result}")
+            except Exception as e:
+                cls._last = {"error": f"{type(e).__name__}: {e}", "finished_at": datetime.now(timezone.utc).isoformat()}
+                print(f"[Memory Service] Compaction cycle failed: {cls._last['error']}")
+            finally:
+                cls._running = False
+
+    @classmethod
+    def shutdown(cls) -> None:
+        """Stop the worker; a running cycle stops after its current page."""
+        cls._stop.set()
+        if cls._thread is not None:
+            cls._thread.join(timeout=5)
+        cls._thread = None
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {
+            "mode": COMPACTION_MODE if COMPACTION_INTERVAL > 0 else "off",
+            "interval": COMPACTION_INTERVAL,
+            "running": cls._running,
+            "last_cycle": cls._last,
+        }
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main() -> None:
+    import argparse
+
+    from main import MemoryService, invalidate_scope
+    from pgvector_store import restore_archived
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="run a compaction cycle now")
+    run.add_argument("--agent", action="append", help="only this agent_id (repeatable); a full pass from the start")
+    run.add_argument("--dry-run", action="store_true", help="count what would be archived; change nothing")
+    run.add_argument("--max-seconds", type=float, default=COMPACTION_MAX_SECONDS)
+    restore = commands.add_parser("restore", help="move archived memories of a scope back")
+    restore.add_argument("--agent", required=True)
+    restore.add_argument("--run", help="only this run_id")
+    restore.add_argument("--reason", choices=("duplicate", "expired"))
+    args = parser.parse_args()
+
+    MemoryService.initialize()
+    memory = MemoryService._instance
+
+    def invalidate(scopes: set) -> None:
+        for agent_id, run_id in scopes:
+            invalidate_scope(agent_id, run_id)
+
+    if args.command == "run":
+        result = run_cycle(
+            memory,
+            max_seconds=args.max_seconds,
+            enforce=not args.dry_run,
+            agents=args.agent,
+            persist=not args.dry_run,
+            on_archived=invalidate,
+        )
+        print(result)
+    else:
+        filters = {"agent_id": args.agent, **({"run_id": args.run} if args.run else {})}
+        restored = restore_archived(memory.vector_store, filters, args.reason)
+        invalidate({(args.agent, args.run)})
+        print(f"Restored {restored} memories")
+    MemoryService.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
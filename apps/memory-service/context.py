@@ -0,0 +1,96 @@
+"""
+Prompt-ready memory bundles for /memories/context.
+
+A chat turn usually needs several retrievals (the message itself, a
+rephrased question, an entity name) plus a few recent memories. Doing them in
+one request lets the service run the searches concurrently on the read pool,
+merge the rankings, drop duplicates, and cut the result to a token budget
+before anything is serialized. The bundle carries:
+
+- `context`: numbered lines ("1. <memory>"), ready for the system prompt
+- `memories`: the included memories in a lean view
+- `tokens` / `omitted`: estimated tokens used and memories left out
+
+Views (also accepted by /memories/search):
+
+- text: id, memory
+- compact: id, memory, score, created_at, sender_name, sent_at
+- full: the items as mem0 returns them (MemoryItem plus scope fields)
+"""
+import os
+
+from cache import normalize_query
+from hybrid import reciprocal_rank_fusion
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+CONTEXT_MAX_QUERIES = int(os.getenv("MEMORY_CONTEXT_MAX_QUERIES", "8"))
+CONTEXT_MAX_RECENT = int(os.getenv("MEMORY_CONTEXT_MAX_RECENT", "50"))
+# Default token budget of a bundle's context text
+CONTEXT_MAX_TOKENS = int(os.getenv("MEMORY_CONTEXT_MAX_TOKENS", "1000"))
+# Gemini tokenizes Vietnamese at roughly 3 characters per token
+CHARS_PER_TOKEN = 3
+
+VIEWS = ("text", "compact", "full")
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, -(-len(text) // CHARS_PER_TOKEN))
+
+
+def project(item: dict, view: str) -> dict:
+    """An item of a search/get_all result in the requested view."""
+    if view == "full":
+        return item
+    if view == "text":
+        return {"id": item["id"], "memory": item.get("memory", "")}
+    metadata = item.get("metadata") or {}
+    compact = {
+        "id": item["id"],
+        "memory": item.get("memory", ""),
+        "score": item.get("score"),
+        "created_at": item.get("created_at"),
+        "sender_name": metadata.get("sender_name"),
+        "sent_at": metadata.get("sent_at"),
+    }
+    return {key: value for key, value in compact.items() if value is not None}
+
+
+def build_bundle(rankings: list[list[dict]], recent: list[dict], max_tokens: int, view: str) -> dict:
+    """
+    Merge per-query rankings (Reciprocal Rank Fusion when there are several,
+    so memories several queries agree on come first), then recent memories;
+    drop repeats by id and by normalized text; keep what fits `max_tokens`.
+    """
+    if len(rankings) == 1:
+        ranked = rankings[0]
+    else:
+        ranked = reciprocal_rank_fusion(rankings, limit=sum(len(r) for r in rankings))
+
+    lines: list[str] = []
+    memories: list[dict] = []
+    seen_ids: set[str] = set()
+    seen_texts: set[str] = set()
+    used = 0
+    omitted = 0
+    for item in [*ranked, *recent]:
+        text = item.get("memory", "")
+        normalized = normalize_query(text)
+        if item["id"] in seen_ids or normalized in seen_texts:
+            continue
+        seen_ids.add(item["id"])
+        seen_texts.add(normalized)
+
+        line = f"{len(lines) + 1}. {text}"
+        cost = estimate_tokens(line) + 1  # newline
+        if used + cost > max_tokens:
+            omitted += 1
+            continue
+        used += cost
+        lines.append(line)
+        memories.append(project(item, view))
+
+    return {"context": "\n".join(lines), "memories": memories, "tokens": used, "omitted": omitted}
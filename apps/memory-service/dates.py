@@ -0,0 +1,129 @@
+"""
+Vietnamese relative date normalization.
+
+Rewrites relative dates ("ngày mai lúc 10h", "tuần sau", "tháng tới") into
+absolute dates before fact extraction. Runs on every ingested message, so all
+patterns are compiled once at import and merged into two combined regexes:
+
+1. forward pass: "<day> <time>"
+2. reverse pass: "<time> <day>" plus week/month expressions
+
+Each pass is a single scan; the matched named group selects the offset.
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+# =============================================================================
+# Patterns
+# =============================================================================
+
+# Time indicators that signal a real schedule (not idiom)
+# Must be followed by actual time info, not just "sáng nay trời đẹp"
+TIME_INDICATORS = r'(?:lúc\s*\d|giờ|sáng\s*(?:họp|bay|gặp|đi)|chiều\s*(?:họp|bay|gặp|đi)|tối\s*(?:họp|bay|gặp|đi)|trưa\s*(?:họp|ăn|gặp)|\d{1,2}h|\d{1,2}:\d{2})'
+
+# Idiom patterns that should NEVER be normalized (casual "sometime" expressions)
+IDIOM_PHRASES = [
+    'mai mốt',   # "sometime later" idiom
+    'mai này',   # "some day" idiom
+    'mai kia',   # "see you later" idiom
+    'bữa nào',   # "someday"
+    'hôm nào',   # "when/some day"
+    'lúc nào',   # "when/sometime"
+    'khi nào',   # "when"
+]
+
+IDIOM_RE = re.compile(r'\b(?:' + '|'.join(IDIOM_PHRASES) + r')\b', re.IGNORECASE)
+
+# Day keywords → (days offset, keyword). Order matters: "ngày mai" before "mai".
+# Keywords are matched case-sensitively (only lowercase forms are rewritten),
+# while the time indicator stays case-insensitive.
+DAY_BEFORE_TIME = {
+    'fwd_ngay_mai': (1, 'ngày mai'),
+    'fwd_mai': (1, 'mai'),
+    'fwd_hom_nay': (0, 'hôm nay'),
+    'fwd_hom_qua': (-1, 'hôm qua'),
+    'fwd_ngay_kia': (2, 'ngày kia'),
+    'fwd_ngay_mot': (2, 'ngày mốt'),
+}
+
+# Also handle patterns like "họp lúc 10h ngày mai"
+DAY_AFTER_TIME = {
+    'rev_ngay_mai': (1, 'ngày mai'),
+    'rev_hom_nay': (0, 'hôm nay'),
+    'rev_ngay_kia': (2, 'ngày kia'),
+}
+
+# Week/month patterns - these are usually specific enough
+WEEK_OFFSETS = {'week_next': 1, 'week_prev': -1}
+MONTH_OFFSETS = {'month_next': 1, 'month_prev': -1}
+
+
+def _keyword_group(name: str, keyword: str) -> str:
+    return f'(?P<{name}>(?-i:{re.escape(keyword)}))'
+
+
+_DAY_BEFORE_ALTS = '|'.join(_keyword_group(name, kw) for name, (_, kw) in DAY_BEFORE_TIME.items())
+_DAY_AFTER_ALTS = '|'.join(_keyword_group(name, kw) for name, (_, kw) in DAY_AFTER_TIME.items())
+_WEEK_MONTH_ALTS = (
+    r'(?P<week_next>\btuần (?:sau|tới)\b)|(?P<week_prev>\btuần trước\b)'
+    r'|(?P<month_next>\btháng (?:sau|tới)\b)|(?P<month_prev>\btháng trước\b)'
+)
+
+FORWARD_RE = re.compile(r'\b(?:' + _DAY_BEFORE_ALTS + r')\s+' + TIME_INDICATORS, re.IGNORECASE)
+# Week/month run after the day passes (as before) so their output never feeds a day match
+REVERSE_RE = re.compile(
+    TIME_INDICATORS + r'\s+(?:' + _DAY_AFTER_ALTS + r')\b|' + _WEEK_MONTH_ALTS,
+    re.IGNORECASE,
+)
+WEEK_MONTH_RE = re.compile(_WEEK_MONTH_ALTS, re.IGNORECASE)
+
+
+# =============================================================================
+# Normalization
+# =============================================================================
+
+def _week_range(reference_date: datetime, weeks_offset: int) -> str:
+    start_of_week = reference_date - timedelta(days=reference_date.weekday()) + timedelta(weeks=weeks_offset)
+    end_of_week = start_of_week + timedelta(days=6)
+    return f"tuần {start_of_week.strftime('%d/%m')}-{end_of_week.strftime('%d/%m/%Y')}"
+
+
+def _month(reference_date: datetime, months_offset: int) -> str:
+    target_year, target_month = divmod(reference_date.year * 12 + reference_date.month - 1 + months_offset, 12)
+    return f"tháng {target_month + 1}/{target_year}"
+
+
+def normalize_vietnamese_dates(text: str, reference_date: Optional[datetime] = None) -> str:
+    """
+    Normalize Vietnamese relative dates to absolute dates.
+
+    ONLY normalizes when there's a CLEAR TIME INDICATOR (giờ, lúc, sáng, chiều, tối).
+    This avoids false positives like "mai mốt đi ăn nghe" (idiom meaning "sometime").
+
+    Patterns handled (only with time indicators):
+    - Exact days: hôm nay, ngày mai, hôm qua, ngày kia
+    - Weeks: tuần sau, tuần tới, tuần này
+    - Months: tháng sau, tháng tới, tháng này
+    """
+    if not reference_date:
+        reference_date = datetime.now()
+
+    def replace(match: re.Match) -> str:
+        name = match.lastgroup
+        if name in DAY_BEFORE_TIME or name in DAY_AFTER_TIME:
+            offset, keyword = DAY_BEFORE_TIME.get(name) or DAY_AFTER_TIME[name]
+            target_date = reference_date + timedelta(days=offset)
+            # Keep the time part, replace only the day reference
+            return match.group(0).replace(keyword, f"ngày {target_date.strftime('%d/%m/%Y')}", 1)
+        if name in WEEK_OFFSETS:
+            return _week_range(reference_date, WEEK_OFFSETS[name])
+        return _month(reference_date, MONTH_OFFSETS[name])
+
+    # Check if message contains idioms - if so, skip day normalization entirely
+    if IDIOM_RE.search(text):
+        return WEEK_MONTH_RE.sub(replace, text)
+
+    result = FORWARD_RE.sub(replace, text)
+    return REVERSE_RE.sub(replace, result)
@@ -0,0 +1,288 @@
+"""
+Deduplication of repeated ingestion.
+
+Bots and webhooks deliver the same message more than once: Telegram retries a
+webhook that timed out, Lark re-sends, users forward one message to several
+groups. Two layers keep the copies from costing Gemini calls:
+
+- Idempotent adds: an add is keyed by its scope (agent_id, run_id, user_id),
+  the normalized message and the prompt date. A copy arriving within
+  MEMORY_DEDUP_TTL gets the earlier result (or, in async mode, the earlier
+  job id) without running mem0; a copy arriving while the first is still
+  being processed in this worker waits for it instead of running it again.
+- Extraction cache: fact-extraction LLM responses are cached by model and
+  prompt, and the prompt carries no scope. A message forwarded to another
+  group reuses the facts extracted the first time; only the scope-specific
+  update stage (similarity search, ADD/UPDATE/DELETE, writes) runs again.
+
+Both live in one SQLite file shared by the workers on a host, like the job
+queue and the embedding cache. Any delete, update or archive in a scope
+forgets its add results, so a message re-sent afterwards is ingested again.
+A batched add whose update stage failed is not remembered either.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from cache import normalize_query
+from metrics import DEDUP_LOOKUPS, EXTRACTION_CACHE_LOOKUPS
+from shared import run_io
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# How long a message counts as a duplicate (seconds); 0 disables deduplication
+DEDUP_TTL = float(os.getenv("MEMORY_DEDUP_TTL", "86400"))
+DEDUP_DB = os.getenv("MEMORY_DEDUP_DB", "memory_dedup.db")
+
+# Drop expired rows every N inserts rather than on every write
+PRUNE_EVERY = 1000
+
+
+def add_key(messages: list[dict], add_kwargs: dict, prompt_day) -> str:
+    """Idempotency key of an add: scope, sender, prompt date and normalized text."""
+    text = normalize_query(" ".join(m["content"] for m in messages))
+    parts = [
+        add_kwargs.get("agent_id") or "",
+        add_kwargs.get("run_id") or "",
+        add_kwargs.get("user_id") or "",
+        prompt_day.isoformat(),
+        text,
+    ]
+    return "add:" + hashlib.sha256("\x00".join(parts).encode()).hexdigest()
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class DedupStore:
+    """SQLite map of key -> JSON value with expiry, shared by all workers on a host."""
+
+    def __init__(self, path: str = DEDUP_DB, ttl: float = DEDUP_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._inserts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and bool(self.path)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, created (with the schema) on first use
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dedup ("
+                "key TEXT PRIMARY KEY, scope TEXT, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS dedup_scope_idx ON dedup (scope)")
+            conn.execute("CREATE INDEX IF NOT EXISTS dedup_expires_idx ON dedup (expires_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Live value of `key`, or None (also when the store is unavailable)."""
+        try:
+            row = self._conn().execute(
+                "SELECT value FROM dedup WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[Memory Service] Dedup store read failed: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, value: Any, scope: Optional[str] = None) -> None:
+        try:
+            self._conn().execute(
+                "INSERT OR REPLACE INTO dedup (key, scope, value, expires_at) VALUES (?, ?, ?, ?)",
+                (key, scope, json.dumps(value, ensure_ascii=False, default=str), time.time() + self.ttl),
+            )
+            self._inserts += 1
+            if self._inserts >= PRUNE_EVERY:
+                self._inserts = 0
+                self.prune()
+        except sqlite3.Error as e:
+            print(f"[Memory Service] Dedup store write failed: {e}")
+
+    def forget_scope(self, scope: str) -> None:
+        """Forget the add results of a scope (after its memories were deleted or changed)."""
+        if not self.enabled:
+            return
+        try:
+            self._conn().execute("DELETE FROM dedup WHERE scope = ?", (scope,))
+        except sqlite3.Error as e:
+            print(f"[Memory Service] Dedup store write failed: {e}")
+
+    def prune(self) -> int:
+        """Drop expired rows."""
+        cur = self._conn().execute("DELETE FROM dedup WHERE expires_at <= ?", (time.time(),))
+        return cur.rowcount
+
+
+dedup_store = DedupStore()
+
+
+# =============================================================================
+# Idempotent adds
+# =============================================================================
+
+class AddDeduplicator:
+    """
+    Runs each distinct add once per TTL window.
+
+    Completed results come from the shared store; concurrent copies in this
+    worker await the first copy's future. Failed adds are not remembered, so
+    a retry after an error runs again.
+    """
+
+    def __init__(self, store: DedupStore):
+        self.store = store
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.store.enabled
+
+    def lookup(self, key: str) -> Optional[Any]:
+        """Stored result of an earlier copy, or None."""
+        if not self.enabled:
+            return None
+        stored = self.store.get(key)
+        if stored is not None:
+            self.hits += 1
+            DEDUP_LOOKUPS.labels("hit").inc()
+        return stored
+
+    def lookup_many(self, keys: list[Optional[str]]) -> list[Optional[Any]]:
+        """`lookup` of each key (None for None keys), for one trip off the event loop."""
+        return [self.lookup(key) if key is not None else None for key in keys]
+
+    def remember(self, key: str, result: Any, scope: str) -> None:
+        if self.enabled:
+            self.store.put(key, result, scope)
+
+    def remember_many(self, entries: list[tuple[str, Any, str]]) -> None:
+        for key, result, scope in entries:
+            self.remember(key, result, scope)
+
+    async def run(self, key: str, scope: str, add: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of `add()`, or of an earlier or concurrent copy with the same key."""
+        if not self.enabled:
+            return await add()
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            DEDUP_LOOKUPS.labels("coalesced").inc()
+            return await asyncio.shield(pending)
+
+        # In flight from before the store lookup until the result is stored, so
+        # copies arriving while either runs off the event loop wait for this one
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await run_io(self.lookup, key)
+            if result is None:
+                self.misses += 1
+                DEDUP_LOOKUPS.labels("miss").inc()
+                result = await add()
+                await run_io(self.remember, key, result, scope)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved: no "never retrieved" warning without waiters
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ttl": self.store.ttl,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+        }
+
+
+add_dedup = AddDeduplicator(dedup_store)
+
+
+# =============================================================================
+# Extraction cache
+# =============================================================================
+
+class CachedExtractionLLM:
+    """
+    mem0 LLM wrapper caching fact-extraction responses.
+
+    Only extraction calls are cached: they open with a system prompt (mem0's
+    single-message call and batching's batch call). The update stage sends a
+    single user message holding the scope's existing memories and always
+    reaches the LLM.
+    """
+
+    def __init__(self, llm: Any, store: DedupStore):
+        self._llm = llm
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Delegate config, client, ... to the wrapped LLM
+        return getattr(self._llm, name)
+
+    def cache_key(self, messages: list[dict]) -> str:
+        model = getattr(getattr(self._llm, "config", None), "model", None) or ""
+        payload = json.dumps([model, messages], ensure_ascii=False, sort_keys=True)
+        return "llm:" + hashlib.sha256(payload.encode()).hexdigest()
+
+    def generate_response(self, messages, response_format=None, **kwargs):
+        if kwargs.get("tools") or not messages or messages[0].get("role") != "system":
+            return self._llm.generate_response(messages, response_format=response_format, **kwargs)
+
+        key = self.cache_key(messages)
+        cached = self.store.get(key)
+        if cached is not None:
+            self.hits += 1
+            EXTRACTION_CACHE_LOOKUPS.labels("hit").inc()
+            return cached
+        self.misses += 1
+        EXTRACTION_CACHE_LOOKUPS.labels("miss").inc()
+        response = self._llm.generate_response(messages, response_format=response_format, **kwargs)
+        # Keep only well-formed answers; a truncated or refused response is retried next time
+        if isinstance(response, str) and '"facts"' in response:
+            self.store.put(key, response)
+        return response
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def wrap_llm(llm: Any) -> Any:
+    """Wrap a mem0 LLM with the extraction cache (no-op when deduplication is disabled)."""
+    if not dedup_store.enabled:
+        return llm
+    return CachedExtractionLLM(llm, dedup_store)
@@ -0,0 +1,228 @@
+"""
+Persistent embedding cache.
+
+Wraps the mem0 embedder so identical strings (repeated queries, re-sent
+messages, facts re-extracted after updates) are embedded once. Entries are
+keyed by a hash of model, output dimensionality and text, and live in two tiers:
+
+1. memory: bounded LRU/TTL map (TTLCache) for the hot set
+2. disk: SQLite table that survives restarts and is shared by the worker
+   processes on a host; pruned to a maximum row count
+
+`embed_batch` resolves all texts against both tiers first and sends only the
+misses to the embedding API.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Optional
+
+from cache import TTLCache
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+EMBED_CACHE_SIZE = int(os.getenv("MEMORY_EMBED_CACHE_SIZE", "8192"))
+EMBED_CACHE_TTL = float(os.getenv("MEMORY_EMBED_CACHE_TTL", "86400"))
+# SQLite file for the persistent tier; empty disables it
+EMBED_CACHE_DB = os.getenv("MEMORY_EMBED_CACHE_DB", "memory_embeddings.db")
+EMBED_CACHE_MAX_ROWS = int(os.getenv("MEMORY_EMBED_CACHE_MAX_ROWS", "200000"))
+
+# Prune the disk tier every N inserts rather than on every write
+PRUNE_EVERY = 1000
+
+
+# =============================================================================
+# Disk tier
+# =============================================================================
+
+class EmbeddingStore:
+    """SQLite-backed embedding store. Vectors are stored as packed float32."""
+
+    def __init__(self, path: str = EMBED_CACHE_DB, max_rows: int = EMBED_CACHE_MAX_ROWS):
+        self.path = path
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._inserts = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used_idx ON embeddings (last_used)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; executor threads are long-lived
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        if not keys:
+            return {}
+        conn = self._conn()
+        placeholders = ",".join("?" * len(keys))
+        rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys).fetchall()
+        if rows:
+            conn.execute(
+                f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                [time.time(), *[row[0] for row in rows]],
+            )
+        return {key: array("f", blob).tolist() for key, blob in rows}
+
+    def put_many(self, items: dict[str, list[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+            [(key, array("f", vector).tobytes(), now) for key, vector in items.items()],
+        )
+        self._inserts += len(items)
+        if self._inserts >= PRUNE_EVERY:
+            self._inserts = 0
+            self.prune()
+
+    def prune(self) -> None:
+        """Drop least recently used rows beyond `max_rows`."""
+        conn = self._conn()
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_rows
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+
+# =============================================================================
+# Embedder wrapper
+# =============================================================================
+
+class CachedEmbedder:
+    """mem0 embedder wrapper with a memory tier and an optional disk tier."""
+
+    def __init__(self, embedder: Any, memory_tier: TTLCache, store: Optional[EmbeddingStore] = None):
+        self._embedder = embedder
+        self.memory_tier = memory_tier
+        self.store = store
+        self._lock = threading.Lock()
+        self.disk_hits = 0
+        self.api_calls = 0
+        self.api_texts = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Delegate config, client, ... to the wrapped embedder
+        return getattr(self._embedder, name)
+
+    def cache_key(self, text: str) -> str:
+        config = self._embedder.config
+        dims = getattr(config, "embedding_dims", None) or getattr(config, "output_dimensionality", None)
+        raw = f"{config.model}|{dims}|{text}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        for key in keys:
+            vector = self.memory_tier.get(key)
+            if vector is not None:
+                found[key] = vector
+        missing = [key for key in keys if key not in found]
+        if missing and self.store is not None:
+            try:
+                from_disk = self.store.get_many(missing)
+            except sqlite3.Error as e:
+                print(f"[Memory Service] Embedding cache read failed: {e}")
+                from_disk = {}
+            with self._lock:
+                self.disk_hits += len(from_disk)
+            for key, vector in from_disk.items():
+                self.memory_tier.set(key, vector)
+            found.update(from_disk)
+        return found
+
+    def _remember(self, computed: dict[str, list[float]]) -> None:
+        for key, vector in computed.items():
+            self.memory_tier.set(key, vector)
+        if self.store is not None:
+            try:
+                self.store.put_many(computed)
+            except sqlite3.Error as e:
+                print(f"[Memory Service] Embedding cache write failed: {e}")
+
+    def embed(self, text, memory_action=None):
+        if not isinstance(text, str):
+            return self._embedder.embed(text, memory_action)
+        key = self.cache_key(text)
+        found = self._lookup([key])
+        if key in found:
+            return found[key]
+        with self._lock:
+            self.api_calls += 1
+            self.api_texts += 1
+        vector = list(self._embedder.embed(text, memory_action))
+        self._remember({key: vector})
+        return vector
+
+    def embed_batch(self, texts, memory_action="add"):
+        """Embed many texts; only cache misses reach the embedding API."""
+        keys = [self.cache_key(text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        # Unique texts still missing, in first-seen order
+        pending: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+
+        if pending:
+            missing_texts = list(pending.values())
+            inner_batch = getattr(self._embedder, "embed_batch", None)
+            if inner_batch is not None:
+                vectors = list(inner_batch(missing_texts, memory_action))
+                calls = 1
+            else:
+                vectors = [self._embedder.embed(text, memory_action) for text in missing_texts]
+                calls = len(missing_texts)
+            computed = {key: list(vector) for key, vector in zip(pending, vectors)}
+            with self._lock:
+                self.api_calls += calls
+                self.api_texts += len(missing_texts)
+            self._remember(computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def stats(self) -> dict:
+        return {
+            **self.memory_tier.stats(),
+            "disk_enabled": self.store is not None,
+            "disk_hits": self.disk_hits,
+            "api_calls": self.api_calls,
+            "api_texts": self.api_texts,
+        }
+
+
+embedding_cache = TTLCache("embedding", EMBED_CACHE_SIZE, EMBED_CACHE_TTL)
+
+
+def wrap_embedder(embedder: Any) -> Any:
+    """Wrap a mem0 embedder with the configured cache tiers (no-op when disabled)."""
+    if not embedding_cache.enabled and not EMBED_CACHE_DB:
+        return embedder
+    store = EmbeddingStore() if EMBED_CACHE_DB else None
+    return CachedEmbedder(embedder, embedding_cache, store)
@@ -0,0 +1,272 @@
+"""
+Bounded executors for blocking mem0 calls.
+
+mem0's Memory API is synchronous (LLM extraction, embedding, pgvector I/O),
+so calling it directly from an async handler blocks the event loop. Calls are
+dispatched to separate thread pools for slow writes and latency-sensitive
+reads, each with a bounded queue so saturation is reported to the caller
+instead of piling up requests without limit.
+
+Queued calls wait in the pool's per-tenant fair queue (scheduler.py), not in
+the thread pool's FIFO: a call is handed to a thread only when one is free,
+and the fair queue decides whose call that is. Background work (queued jobs,
+compaction) goes through the same pools with `MemoryExecutors.call`, so it is
+scheduled and rate limited like requests.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from metrics import EXECUTOR_IN_FLIGHT, EXECUTOR_QUEUE_DEPTH, EXECUTOR_REJECTED, TENANT_REJECTED
+from scheduler import TENANT_QUEUE_SHARE, FairQueue, current_call, tenant_label
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+READ_WORKERS = int(os.getenv("MEMORY_READ_WORKERS", "8"))
+READ_QUEUE_SIZE = int(os.getenv("MEMORY_READ_QUEUE_SIZE", "64"))
+WRITE_WORKERS = int(os.getenv("MEMORY_WRITE_WORKERS", "4"))
+WRITE_QUEUE_SIZE = int(os.getenv("MEMORY_WRITE_QUEUE_SIZE", "32"))
+# Writes started at a time while reads are waiting for a worker
+WRITE_WORKERS_UNDER_READ_LOAD = int(
+    os.getenv("MEMORY_WRITE_WORKERS_UNDER_READ_LOAD", str(max(1, WRITE_WORKERS // 2)))
+)
+# How often a background call waiting for room in a saturated pool tries again
+SATURATED_RETRY_SECONDS = 0.1
+
+
+class PoolSaturatedError(Exception):
+    """Raised when a pool has no free worker and its queue is full."""
+
+    def __init__(self, pool: str, queue_depth: int, max_queue: int):
+        self.pool = pool
+        self.queue_depth = queue_depth
+        self.max_queue = max_queue
+        super().__init__(f"{pool} pool saturated ({queue_depth}/{max_queue} queued)")
+
+
+class TenantQueueFullError(PoolSaturatedError):
+    """Raised when one tenant already holds its share of a pool's queue."""
+
+    def __init__(self, pool: str, tenant: str, queue_depth: int, max_queue: int):
+        super().__init__(pool, queue_depth, max_queue)
+        self.tenant = tenant
+
+    def __str__(self) -> str:
+        tenant = self.tenant or "unscoped"
+        return f"{self.pool} pool: too many queued calls for {tenant} ({self.queue_depth}/{self.max_queue})"
+
+
+# =============================================================================
+# Executors
+# =============================================================================
+
+class BoundedExecutor:
+    """
+    Thread pool that rejects work once `max_workers + max_queue` calls are in
+    flight, and starts queued calls in per-tenant fair order.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_queue: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.max_tenant_queue = max(1, int(max_queue * TENANT_QUEUE_SHARE))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"mem0-{name}")
+        self._lock = threading.Lock()
+        self._queue = FairQueue(name)
+        self._in_flight = 0
+        self._running = 0
+        self._rejected = 0
+        self._retry_timer: Optional[threading.Timer] = None
+        # Lower worker limit while `yield_to` has calls waiting (writes yield to reads)
+        self.yield_to: Optional["BoundedExecutor"] = None
+        self.yield_workers = max_workers
+        # Called after each call finishes (the read pool wakes the write pool)
+        self.on_release: Optional[Callable[[], None]] = None
+        self._in_flight_gauge = EXECUTOR_IN_FLIGHT.labels(name)
+        self._queue_gauge = EXECUTOR_QUEUE_DEPTH.labels(name)
+        self._rejected_counter = EXECUTOR_REJECTED.labels(name)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls waiting for a worker."""
+        return len(self._queue)
+
+    def _publish(self) -> None:
+        """Mirror the counters into the Prometheus gauges (call with the lock held)."""
+        self._in_flight_gauge.set(self._in_flight)
+        self._queue_gauge.set(self.queue_depth)
+
+    def _worker_limit(self) -> int:
+        if self.yield_to is not None and self.yield_to.queue_depth:
+            return self.yield_workers
+        return self.max_workers
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Queue a call, raising PoolSaturatedError when the queue (or the tenant's share) is full."""
+        call = current_call()
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                self._rejected_counter.inc()
+                raise PoolSaturatedError(self.name, self.queue_depth, self.max_queue)
+            tenant_depth = self._queue.depth(call.tenant)
+            if tenant_depth >= self.max_tenant_queue:
+                self._rejected += 1
+                TENANT_REJECTED.labels(self.name, tenant_label(call.tenant)).inc()
+                raise TenantQueueFullError(self.name, call.tenant, tenant_depth, self.max_tenant_queue)
+            future: Future = Future()
+            # Copy context so contextvars set by the request are visible in the worker
+            self._queue.push(call, (future, contextvars.copy_context(), fn, args, kwargs))
+            self._in_flight += 1
+            self._publish()
+        self.dispatch()
+        return future
+
+    def dispatch(self) -> None:
+        """Hand queued calls to free workers in fair order."""
+        with self._lock:
+            retry_in = 0.0
+            while self._running < self._worker_limit():
+                item, retry_in = self._queue.pop()
+                if item is None:
+                    break
+                self._running += 1
+                self._publish()
+                try:
+                    self._executor.submit(self._execute, *item)
+                except RuntimeError as e:  # shut down
+                    self._running -= 1
+                    self._in_flight -= 1
+                    item[0].set_exception(e)
+            # Every queued tenant is rate limited: look again when the first may run
+            if 0 < retry_in < float("inf") and self._retry_timer is None:
+                self._retry_timer = threading.Timer(retry_in, self._retry)
+                self._retry_timer.daemon = True
+                self._retry_timer.start()
+
+    def _retry(self) -> None:
+        with self._lock:
+            self._retry_timer = None
+        self.dispatch()
+
+    def _execute(
+        self, future: Future, ctx: contextvars.Context, fn: Callable[..., Any], args: tuple, kwargs: dict
+    ) -> None:
+        # Release when the thread finishes, not when the awaiting coroutine
+        # does, so a disconnected client does not free a slot that is still busy.
+        # A call whose caller went away while it was queued is skipped.
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = ctx.run(fn, *args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._in_flight -= 1
+                self._publish()
+            self.dispatch()
+            if self.on_release is not None:
+                self.on_release()
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run `fn` in the pool and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def call(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run `fn` in the pool from a background thread and wait for its result.
+        While the pool (or the tenant's share of it) is full the call waits for
+        room instead of failing: background work yields to requests.
+        """
+        while True:
+            try:
+                future = self.submit(fn, *args, **kwargs)
+            except PoolSaturatedError:
+                time.sleep(SATURATED_RETRY_SECONDS)
+                continue
+            return future.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            queue = self._queue.stats()
+        return {
+            "workers": self.max_workers,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "max_tenant_queue": self.max_tenant_queue,
+            "rejected": self._rejected,
+            "tenants_queued": queue["tenants"],
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._retry_timer is not None:
+                self._retry_timer.cancel()
+                self._retry_timer = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class MemoryExecutors:
+    """Registry of the read/write pools used by the endpoints."""
+
+    _pools: dict[str, BoundedExecutor] = {}
+
+    @classmethod
+    def initialize(cls) -> None:
+        """Create the pools. Called once at startup."""
+        if not cls._pools:
+            read = BoundedExecutor("read", READ_WORKERS, READ_QUEUE_SIZE)
+            write = BoundedExecutor("write", WRITE_WORKERS, WRITE_QUEUE_SIZE)
+            # Reads first: fewer writes start while reads wait, more once they drain
+            write.yield_to = read
+            write.yield_workers = min(WRITE_WORKERS, WRITE_WORKERS_UNDER_READ_LOAD)
+            read.on_release = write.dispatch
+            cls._pools = {"read": read, "write": write}
+
+    @classmethod
+    def shutdown(cls) -> None:
+        for pool in cls._pools.values():
+            pool.shutdown()
+        cls._pools = {}
+
+    @classmethod
+    def get(cls, kind: str) -> BoundedExecutor:
+        if kind not in cls._pools:
+            raise RuntimeError(f"Executor pool '{kind}' not initialized")
+        return cls._pools[kind]
+
+    @classmethod
+    async def run(cls, kind: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking call on the `read` or `write` pool."""
+        return await cls.get(kind).run(fn, *args, **kwargs)
+
+    @classmethod
+    def call(cls, kind: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Blocking counterpart of `run` for background threads (see BoundedExecutor.call)."""
+        return cls.get(kind).call(fn, *args, **kwargs)
+
+    @classmethod
+    def busy(cls) -> bool:
+        """Whether any call is waiting for a worker (background work should hold off)."""
+        return any(pool.queue_depth for pool in cls._pools.values())
+
+    @classmethod
+    def stats(cls) -> dict:
+        return {name: pool.stats() for name, pool in cls._pools.items()}
@@ -0,0 +1,91 @@
+"""
+Hybrid (lexical + vector) search.
+
+Embeddings are good at paraphrase but weak on exact tokens: a person's name,
+a licence plate, an order code or "25/12" often rank below loosely related
+memories, which matters when the caller only asks for the top 3-5. Hybrid mode
+runs two retrievals over the same scope and fuses them:
+
+- vector: mem0's search, widened to limit * HYBRID_CANDIDATE_FACTOR
+- lexical: Postgres full-text search over the memory text and the original
+  chat message (GIN index, see pgvector_store.lexical_search)
+
+The two rankings are merged with Reciprocal Rank Fusion, which needs no score
+calibration between cosine distances and ts_rank values. A memory found by
+both legs rises to the top; one found by either still makes the list.
+"""
+import os
+from typing import Any
+
+from mem0.vector_stores.pgvector import PGVector
+
+from dates import normalize_vietnamese_dates
+from metrics import stage_timer
+from pgvector_store import format_memory, lexical_search
+from prefilter import FILLER_WORDS
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+SEARCH_MODES = ("vector", "hybrid")
+SEARCH_MODE = os.getenv("MEMORY_SEARCH_MODE", "vector").lower()
+if SEARCH_MODE not in SEARCH_MODES:
+    raise ValueError(f"MEMORY_SEARCH_MODE must be one of {SEARCH_MODES}, got {SEARCH_MODE!r}")
+
+# Each leg retrieves limit * factor candidates before fusion
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("MEMORY_HYBRID_CANDIDATES", "4"))
+# RRF damping constant: larger values flatten the gap between top ranks
+RRF_K = int(os.getenv("MEMORY_HYBRID_RRF_K", "60"))
+
+# Words too common to count as a lexical match (the 'simple' text search
+# config has no Vietnamese stop words): chat filler plus function words
+STOPWORDS = sorted(FILLER_WORDS | {
+    "của", "là", "và", "có", "không", "ko", "k", "cho", "với", "ở", "tại", "thì", "mà", "này", "đó",
+    "các", "những", "một", "ngày", "tháng", "năm", "lúc", "giờ", "về", "bị", "đã", "sẽ", "đang",
+    "gì", "nào", "khi", "ai", "đâu", "sao", "mấy", "bao", "nhiêu", "hãy", "nhớ", "giúp",
+    "the", "a", "an", "is", "are", "of", "to", "in", "on", "at", "for", "and", "or", "what", "when",
+})
+
+
+def reciprocal_rank_fusion(rankings: list[list[dict]], limit: int, k: int = RRF_K) -> list[dict]:
+    """
+    Merge ranked result lists by summing 1 / (k + rank) per memory id.
+
+    Each returned item is the first copy seen of that memory, with `score`
+    replaced by its fused score (higher is better).
+    """
+    fused: dict[str, float] = {}
+    items: dict[str, dict] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item["id"]] = fused.get(item["id"], 0.0) + 1.0 / (k + rank)
+            items.setdefault(item["id"], item)
+    ordered = sorted(fused, key=fused.get, reverse=True)[:limit]
+    return [{**items[memory_id], "score": round(fused[memory_id], 6)} for memory_id in ordered]
+
+
+def hybrid_search(memory, query: str, search_kwargs: dict) -> dict[str, Any]:
+    """
+    mem0-style search result ({"results": [...]}) fusing vector and lexical
+    retrieval. Blocking; run on the read pool.
+    """
+    limit = search_kwargs["limit"]
+    candidates = limit * HYBRID_CANDIDATE_FACTOR
+    vector = memory.search(query, **{**search_kwargs, "limit": candidates})
+    vector_results = vector.get("results", []) if isinstance(vector, dict) else vector
+
+    store = memory.vector_store
+    if not isinstance(store, PGVector):
+        return {"results": vector_results[:limit]}
+
+    filters = {key: search_kwargs[key] for key in ("agent_id", "run_id") if search_kwargs.get(key)}
+    # Stored memories carry absolute dates ("mai 10h" -> "ngày 18/10/2026 10h"); match them
+    lexical_query = normalize_vietnamese_dates(query)
+    with stage_timer("vector_store", "lexical_search"):
+        rows = lexical_search(store, filters, lexical_query, candidates, STOPWORDS)
+    lexical_results = []
+    for row in rows:
+        lexical_results.append({**format_memory(row), "score": row.score})
+    return {"results": reciprocal_rank_fusion([vector_results, lexical_results], limit)}
@@ -0,0 +1,296 @@
+"""
+Durable ingestion queue for asynchronous /memories/add.
+
+Messages are validated and date-normalized in the request, then persisted to a
+local SQLite queue and acknowledged with a job id. Background worker threads
+drain the queue through `Memory.add`, retrying transient Gemini/Postgres
+failures with exponential backoff and dead-lettering jobs that keep failing.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+JOBS_DB_PATH = os.getenv("MEMORY_JOBS_DB", "memory_jobs.db")
+JOB_WORKERS = int(os.getenv("MEMORY_JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("MEMORY_JOB_MAX_ATTEMPTS", "5"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("MEMORY_JOB_RETRY_BASE_SECONDS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("MEMORY_JOB_POLL_SECONDS", "0.5"))
+# Jobs `running` longer than this are assumed orphaned by a crashed process
+JOB_LEASE_SECONDS = float(os.getenv("MEMORY_JOB_LEASE_SECONDS", "600"))
+# `done` and `dead` jobs (payload and result) are deleted this long after they
+# finished; 0 keeps them forever
+JOB_RETENTION_SECONDS = float(os.getenv("MEMORY_JOB_RETENTION_SECONDS", "604800"))
+# Delete expired jobs every N claims rather than after every job
+PRUNE_EVERY = 1000
+
+# HTTP status codes from Gemini (google-genai APIError.code) worth retrying
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+# Exception class names for transient network/DB failures (avoids hard imports)
+TRANSIENT_ERROR_NAMES = {
+    "ServerError",
+    "OperationalError",
+    "InterfaceError",
+    "ConnectTimeout",
+    "ReadTimeout",
+    "RemoteProtocolError",
+}
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Whether a failed job is worth retrying."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    if isinstance(code, int) and code in TRANSIENT_STATUS_CODES:
+        return True
+    return type(exc).__name__ in TRANSIENT_ERROR_NAMES
+
+
+# =============================================================================
+# Queue
+# =============================================================================
+
+class JobQueue:
+    """
+    SQLite-backed job queue.
+
+    Status flow: queued → running → done | queued (retry) | dead, and finished
+    jobs are deleted after JOB_RETENTION_SECONDS (`prune`). A connection is opened per operation so the queue is safe to share between
+    threads and between worker processes on the same host.
+    """
+
+    def __init__(self, path: str = JOBS_DB_PATH, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_run_at REAL NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready_idx ON jobs (status, next_run_at)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, kind: str, payload: dict) -> str:
+        """Persist a job and return its id."""
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, next_run_at, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), now, now, now),
+            )
+        return job_id
+
+    def claim(self) -> Optional[dict]:
+        """Atomically take the oldest ready job, marking it running."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                """
+                UPDATE jobs SET status = 'running', attempts = attempts + 1, updated_at = ?
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE status = 'queued' AND next_run_at <= ?
+                    ORDER BY next_run_at, created_at
+                    LIMIT 1
+                )
+                RETURNING id, kind, payload, attempts
+                """,
+                (now, now),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "payload": json.loads(row["payload"]),
+            "attempts": row["attempts"],
+        }
+
+    def complete(self, job_id: str, result: Any) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated_at = ? WHERE id = ?",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id),
+            )
+
+    def fail(self, job_id: str, attempts: int, error: str, transient: bool) -> str:
+        """Record a failure; requeue with backoff or dead-letter. Returns the new status."""
+        now = time.time()
+        if transient and attempts < self.max_attempts:
+            status = "queued"
+            next_run_at = now + JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        else:
+            status = "dead"
+            next_run_at = now
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, next_run_at = ?, updated_at = ? WHERE id = ?",
+                (status, error, next_run_at, now, job_id),
+            )
+        return status
+
+    def requeue_stale(self, lease_seconds: float = JOB_LEASE_SECONDS) -> int:
+        """Return jobs left `running` by a crashed process to the queue."""
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', next_run_at = ?, updated_at = ? "
+                "WHERE status = 'running' AND updated_at < ?",
+                (now, now, now - lease_seconds),
+            )
+            return cur.rowcount
+
+    def prune(self, retention_seconds: float = JOB_RETENTION_SECONDS) -> int:
+        """Delete `done` and `dead` jobs that finished more than `retention_seconds` ago."""
+        if retention_seconds <= 0:
+            return 0
+        with self._connect() as conn:
+            cur = conn.execute(
+                "DELETE FROM jobs WHERE status IN ('done', 'dead') AND updated_at < ?",
+                (time.time() - retention_seconds,),
+            )
+            return cur.rowcount
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, result, error, attempts, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def counts(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+
+# =============================================================================
+# Workers
+# =============================================================================
+
+class JobWorkers:
+    """Background threads draining the job queue."""
+
+    _queue: Optional[JobQueue] = None
+    _threads: list[threading.Thread] = []
+    _stop = threading.Event()
+    _handlers: dict[str, Callable[[dict], Any]] = {}
+    _claims = 0
+    _claims_lock = threading.Lock()
+
+    @classmethod
+    def initialize(cls, handlers: dict[str, Callable[[dict], Any]]) -> None:
+        """Open the queue, recover crashed jobs and start the workers."""
+        if cls._queue is not None:
+            return
+        cls._queue = JobQueue()
+        cls._handlers = handlers
+        cls._stop.clear()
+        recovered = cls._queue.requeue_stale()
+        if recovered:
+            print(f"[Memory Service] Requeued {recovered} interrupted jobs")
+        cls._prune()
+        cls._threads = [
+            threading.Thread(target=cls._work, name=f"mem0-job-{i}", daemon=True)
+            for i in range(JOB_WORKERS)
+        ]
+        for thread in cls._threads:
+            thread.start()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        cls._stop.set()
+        for thread in cls._threads:
+            thread.join(timeout=5)
+        cls._threads = []
+        cls._queue = None
+
+    @classmethod
+    def get_queue(cls) -> JobQueue:
+        if cls._queue is None:
+            raise RuntimeError("JobWorkers not initialized")
+        return cls._queue
+
+    @classmethod
+    def _prune(cls) -> None:
+        try:
+            pruned = cls._queue.prune()
+        except sqlite3.Error as e:
+            print(f"[Memory Service] Job queue prune failed: {e}")
+            return
+        if pruned:
+            print(f"[Memory Service] Deleted {pruned} finished jobs past retention")
+
+    @classmethod
+    def _work(cls) -> None:
+        queue = cls._queue
+        while not cls._stop.is_set():
+            try:
+                job = queue.claim()
+            except sqlite3.Error as e:
+                print(f"[Memory Service] Job queue error: {e}")
+                cls._stop.wait(JOB_POLL_SECONDS)
+                continue
+            if job is None:
+                cls._stop.wait(JOB_POLL_SECONDS)
+                continue
+            with cls._claims_lock:
+                cls._claims += 1
+                prune = cls._claims % PRUNE_EVERY == 0
+            if prune:
+                cls._prune()
+
+            try:
+                result = cls._handlers[job["kind"]](job["payload"])
+                queue.complete(job["id"], result)
+            except Exception as e:
+                # Jobs cut short by shutdown (pools closing under them) are retried
+                transient = is_transient_error(e) or cls._stop.is_set()
+                status = queue.fail(job["id"], job["attempts"], str(e), transient)
+                print(f"[Memory Service] Job {job['id']} failed (attempt {job['attempts']}, {status}): {e}")
@@ -0,0 +1,762 @@
+"""
+Embedded vector store: mem0's vector store interface on a memory-mapped NumPy
+matrix, so the service, tests and benchmarks run without Postgres
+(MEMORY_VECTOR_STORE=local). Meant for development and single-host edge
+deployments; pgvector stays the production store.
+
+Files under MEMORY_LOCAL_STORE_PATH, per collection:
+
+- <collection>.<generation>.f32: unit-normalized float32 vectors, one row per
+  slot, memory-mapped (the OS pages in what searches touch); grown by doubling
+- <collection>.db: SQLite table of slot, id and payload, plus metadata
+- <collection>.hnsw.npz: HNSW graphs, written on shutdown
+- <collection>.lock: held by the process that has the store open
+
+Semantics follow mem0's PGVector: filters are equality on payload fields
+compared as text (`payload->>'key' = value`), scores are cosine distances
+(lower is closer), ids are the caller's UUIDs.
+
+Rows are indexed by agent_id and by (agent_id, run_id), so a scoped search
+reads only its scope's vectors, like the workspace-partitioned pgvector
+layout. With MEMORY_LOCAL_ANN_INDEX=hnsw, an agent_id with at least
+MEMORY_LOCAL_HNSW_MIN_ROWS memories gets its own HNSW graph: built in a
+background thread after its first search (which, like the ones until the
+graph is ready, scans exactly), then kept up to date on writes. Smaller
+scopes, and run_id scopes under that size, are always scanned exactly, which
+is as fast at that size. Graph searches that return too few rows of the
+filtered scope widen ef_search, like pgvector's iterative scans.
+
+One process only: the lock file keeps a second worker from opening the store
+(run with WEB_CONCURRENCY=1). Deleted rows leave their slot unused until the
+store is next opened, when the matrix is compacted if a quarter of it is free.
+"""
+from __future__ import annotations
+
+import fcntl
+import heapq
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional
+
+import numpy as np
+from mem0 import Memory
+from mem0.configs.base import MemoryConfig
+from mem0.utils.factory import VectorStoreFactory
+from mem0.vector_stores.base import VectorStoreBase
+from mem0.vector_stores.configs import VectorStoreConfig
+from mem0.vector_stores.pgvector import OutputData
+from pydantic import BaseModel
+
+from pgvector_store import search_tuning
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# flat: exact scans only | hnsw: per-agent_id HNSW graphs for large scopes
+LOCAL_ANN_INDEX = os.getenv("MEMORY_LOCAL_ANN_INDEX", "flat").lower()
+LOCAL_HNSW_M = int(os.getenv("MEMORY_LOCAL_HNSW_M", "16"))
+LOCAL_HNSW_EF_CONSTRUCTION = int(os.getenv("MEMORY_LOCAL_HNSW_EF_CONSTRUCTION", "64"))
+LOCAL_HNSW_EF_SEARCH = int(os.getenv("MEMORY_LOCAL_HNSW_EF_SEARCH", "40"))
+# Smallest scope searched through a graph; exact scans are as fast below it
+LOCAL_HNSW_MIN_ROWS = int(os.getenv("MEMORY_LOCAL_HNSW_MIN_ROWS", "10000"))
+
+INITIAL_CAPACITY = 1024
+# Free share of the matrix above which it is compacted on open
+VACUUM_RATIO = 0.25
+# Rows per gathered block in exact scans over scattered slots (small blocks stay in cache)
+SCAN_BLOCK = 512
+
+
+class LocalStoreConfig(BaseModel):
+    collection_name: str = "memories"
+    embedding_model_dims: int = 1536
+    path: str = "memory_vectors"
+    ann_index: Optional[str] = None
+
+
+def memory_from_config(config: dict) -> Memory:
+    """
+    `Memory.from_config` for a config whose vector_store section is this
+    store's. mem0 validates providers against a fixed list, so the rest of the
+    config is validated as usual, the section is set afterwards and the class
+    is registered with mem0's vector store factory.
+    """
+    VectorStoreFactory.provider_to_class["local"] = f"{__name__}.LocalVectorStore"
+    memory_config = MemoryConfig(**{key: value for key, value in config.items() if key != "vector_store"})
+    memory_config.vector_store = VectorStoreConfig.model_construct(
+        provider="local", config=LocalStoreConfig(**config["vector_store"]["config"])
+    )
+    return Memory(memory_config)
+
+
+def _as_text(value: Any) -> Optional[str]:
+    """A payload value as Postgres' ->> renders it (None for JSON null)."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _nearest(distances: np.ndarray, limit: int) -> np.ndarray:
+    """Positions of the `limit` smallest distances, closest first."""
+    if len(distances) > limit:
+        positions = np.argpartition(distances, limit - 1)[:limit]
+        return positions[np.argsort(distances[positions])]
+    return np.argsort(distances)
+
+
+def _scan(matrix: np.ndarray, slots: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Cosine distances of the rows at `slots` (ascending): one product over the
+    rows they span when they are at least half of them, else gathered in
+    blocks (copying scattered rows costs more than the product).
+    """
+    low, high = int(slots[0]), int(slots[-1]) + 1
+    if len(slots) * 2 >= high - low:
+        return 1.0 - np.asarray(matrix[low:high] @ query)[slots - low]
+    distances = np.empty(len(slots), np.float32)
+    for start in range(0, len(slots), SCAN_BLOCK):
+        block = slots[start:start + SCAN_BLOCK]
+        distances[start:start + len(block)] = 1.0 - matrix[block] @ query
+    return distances
+
+
+# =============================================================================
+# HNSW
+# =============================================================================
+
+class HnswGraph:
+    """
+    HNSW graph (cosine distance on unit vectors) over the rows of one scope.
+
+    Nodes are numbered in insertion order and point at store slots. Links are
+    padded int32 matrices (-1 = free), one per layer, so a node's neighbours
+    are one row and their distances one matrix product. A deleted or
+    re-embedded row's node stays in the graph for navigation but is no longer
+    returned; the store rebuilds the graph once half of it is such nodes.
+    """
+
+    def __init__(self, m: int = LOCAL_HNSW_M, ef_construction: int = LOCAL_HNSW_EF_CONSTRUCTION):
+        self.m = m
+        self.ef_construction = ef_construction
+        self.level_mult = 1 / math.log(max(m, 2))
+        self.count = 0
+        self.dead = 0
+        self.entry = -1
+        self.max_level = -1
+        self.slots = np.empty(0, np.int64)
+        self.levels = np.empty(0, np.int8)
+        self.alive = np.empty(0, bool)
+        self.links: list[np.ndarray] = []
+        self.node_of: dict[int, int] = {}
+        self._rng = random.Random(0)
+
+    def __len__(self) -> int:
+        return self.count - self.dead
+
+    def _width(self, layer: int) -> int:
+        return self.m * 2 if layer == 0 else self.m
+
+    def _grow(self, capacity: int) -> None:
+        def grown(array: np.ndarray, fill) -> np.ndarray:
+            out = np.full((capacity, *array.shape[1:]), fill, array.dtype)
+            out[: len(array)] = array
+            return out
+
+        self.slots = grown(self.slots, -1)
+        self.levels = grown(self.levels, 0)
+        self.alive = grown(self.alive, False)
+        self.links = [grown(links, -1) for links in self.links]
+
+    def _distances(self, vectors: np.ndarray, nodes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return 1.0 - vectors[self.slots[nodes]] @ query
+
+    def _search_layer(
+        self, vectors: np.ndarray, query: np.ndarray, entry: list[tuple[float, int]], ef: int, layer: int
+    ) -> list[tuple[float, int]]:
+        """The `ef` nodes closest to `query` reachable from `entry` on one layer, closest first."""
+        visited = {node for _, node in entry}
+        candidates = list(entry)
+        heapq.heapify(candidates)
+        found = [(-distance, node) for distance, node in entry]
+        heapq.heapify(found)
+        links = self.links[layer]
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if distance > -found[0][0] and len(found) >= ef:
+                break
+            fresh = [n for n in links[node].tolist() if n >= 0 and n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            bound = -found[0][0]
+            for d, n in zip(self._distances(vectors, np.array(fresh), query).tolist(), fresh):
+                if len(found) < ef or d < bound:
+                    heapq.heappush(candidates, (d, n))
+                    heapq.heappush(found, (-d, n))
+                    if len(found) > ef:
+                        heapq.heappop(found)
+                    bound = -found[0][0]
+        return sorted((-d, n) for d, n in found)
+
+    def _select(self, vectors: np.ndarray, candidates: list[tuple[float, int]], limit: int) -> list[int]:
+        """
+        Neighbour selection heuristic: keep a candidate only if it is closer to
+        the base than to every neighbour already kept (spreads links across
+        directions), then top up with the closest of the rest.
+        """
+        if len(candidates) <= limit:
+            return [node for _, node in candidates]
+        nodes = np.array([node for _, node in candidates])
+        matrix = vectors[self.slots[nodes]]
+        pairwise = 1.0 - matrix @ matrix.T
+        kept: list[int] = []
+        for i, (distance, _) in enumerate(candidates):
+            if not kept or (pairwise[i, kept] > distance).all():
+                kept.append(i)
+                if len(kept) == limit:
+                    break
+        if len(kept) < limit:
+            chosen = set(kept)
+            kept += [i for i in range(len(candidates)) if i not in chosen][: limit - len(kept)]
+        return [int(nodes[i]) for i in kept]
+
+    def _connect(self, vectors: np.ndarray, node: int, new: int, layer: int) -> None:
+        row = self.links[layer][node]
+        free = np.flatnonzero(row < 0)
+        if len(free):
+            row[free[0]] = new
+            return
+        # Full: drop the farthest link (the heuristic here would cost more than the rest of the insert)
+        others = np.append(row, new)
+        distances = self._distances(vectors, others, vectors[self.slots[node]])
+        row[:] = others[np.argsort(distances)[: len(row)]]
+
+    def insert(self, vectors: np.ndarray, slot: int) -> None:
+        """Add the row at `slot` (replacing its previous node, if any)."""
+        self.remove(slot)
+        if self.count == len(self.slots):
+            self._grow(max(64, self.count * 2))
+        level = min(int(-math.log(1.0 - self._rng.random()) * self.level_mult), 15)
+        while len(self.links) <= level:
+            self.links.append(np.full((len(self.slots), self._width(len(self.links))), -1, np.int32))
+        node = self.count
+        self.count += 1
+        self.slots[node] = slot
+        self.levels[node] = level
+        self.alive[node] = True
+        self.node_of[slot] = node
+        if self.entry < 0:
+            self.entry, self.max_level = node, level
+            return
+
+        query = vectors[slot]
+        entry = [(float(self._distances(vectors, np.array([self.entry]), query)[0]), self.entry)]
+        for layer in range(self.max_level, level, -1):
+            entry = self._search_layer(vectors, query, entry, 1, layer)[:1]
+        for layer in range(min(level, self.max_level), -1, -1):
+            found = self._search_layer(vectors, query, entry, self.ef_construction, layer)
+            neighbors = self._select(vectors, found, self.m)
+            self.links[layer][node, : len(neighbors)] = neighbors
+            for other in neighbors:
+                self._connect(vectors, other, node, layer)
+            entry = found
+        if level > self.max_level:
+            self.entry, self.max_level = node, level
+
+    def remove(self, slot: int) -> None:
+        node = self.node_of.pop(slot, None)
+        if node is not None:
+            self.alive[node] = False
+            self.dead += 1
+
+    def search(
+        self, vectors: np.ndarray, query: np.ndarray, limit: int, ef: int, accept: Callable[[int], bool]
+    ) -> list[tuple[float, int]]:
+        """
+        Up to `limit` (distance, slot) pairs of accepted rows, closest first.
+        ef_search doubles while filtered-out nodes leave the result short.
+        """
+        if len(self) == 0:
+            return []
+        ef = max(ef, limit)
+        while True:
+            entry = [(float(self._distances(vectors, np.array([self.entry]), query)[0]), self.entry)]
+            for layer in range(self.max_level, 0, -1):
+                entry = self._search_layer(vectors, query, entry, 1, layer)[:1]
+            found = [
+                (distance, int(self.slots[node]))
+                for distance, node in self._search_layer(vectors, query, entry, ef, 0)
+                if self.alive[node] and accept(int(self.slots[node]))
+            ]
+            if len(found) >= limit or ef >= self.count:
+                return found[:limit]
+            ef *= 2
+
+    def arrays(self, prefix: str) -> dict[str, np.ndarray]:
+        meta = [self.count, self.dead, self.entry, self.max_level, self.m, self.ef_construction]
+        out = {
+            f"{prefix}meta": np.array(meta),
+            f"{prefix}slots": self.slots[: self.count],
+            f"{prefix}levels": self.levels[: self.count],
+            f"{prefix}alive": self.alive[: self.count],
+        }
+        out.update({f"{prefix}links{layer}": links[: self.count] for layer, links in enumerate(self.links)})
+        return out
+
+    @classmethod
+    def from_arrays(cls, arrays: Any, prefix: str) -> "HnswGraph":
+        count, dead, entry, max_level, m, ef_construction = (int(x) for x in arrays[f"{prefix}meta"])
+        graph = cls(m, ef_construction)
+        graph.count, graph.dead, graph.entry, graph.max_level = count, dead, entry, max_level
+        graph.slots = arrays[f"{prefix}slots"].copy()
+        graph.levels = arrays[f"{prefix}levels"].copy()
+        graph.alive = arrays[f"{prefix}alive"].copy()
+        graph.links = [arrays[f"{prefix}links{layer}"].copy() for layer in range(max_level + 1)]
+        graph.node_of = {int(graph.slots[node]): node for node in np.flatnonzero(graph.alive)}
+        return graph
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class LocalVectorStore(VectorStoreBase):
+    """mem0 vector store on a memory-mapped matrix and SQLite (see module docstring)."""
+
+    def __init__(
+        self,
+        collection_name: str = "memories",
+        embedding_model_dims: int = 1536,
+        path: str = "memory_vectors",
+        ann_index: Optional[str] = None,
+    ):
+        self.collection_name = collection_name
+        self.embedding_model_dims = embedding_model_dims
+        self.path = path
+        self.ann_index = (ann_index or LOCAL_ANN_INDEX).lower()
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+
+        self._lock_file = open(self._file("lock"), "w")
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise RuntimeError(
+                f"Local vector store {self._file('db')} is open in another process; "
+                "run a single worker (WEB_CONCURRENCY=1) or use pgvector"
+            ) from None
+
+        try:
+            self._open()
+        except Exception:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            raise
+
+    def _open(self) -> None:
+        self._db = sqlite3.connect(self._file("db"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS rows "
+                "(slot INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, payload TEXT NOT NULL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._load()
+
+    def _file(self, suffix: str) -> str:
+        return os.path.join(self.path, f"{self.collection_name}.{suffix}")
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        self._db.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, str(value)),
+        )
+
+    def _bump_version(self) -> None:
+        """Count a write (call inside the write's transaction); saved graphs must match it."""
+        self._version += 1
+        self._set_meta("version", self._version)
+
+    # -------------------------------------------------------------------------
+    # Loading and layout
+    # -------------------------------------------------------------------------
+
+    def _load(self) -> None:
+        dims = self._meta("dims")
+        if dims is not None and int(dims) != self.embedding_model_dims:
+            raise RuntimeError(
+                f"Local vector store {self._file('db')} holds {dims}-dimension vectors, "
+                f"MEMORY_EMBEDDING_DIMS is {self.embedding_model_dims}"
+            )
+        with self._db:
+            self._set_meta("dims", self.embedding_model_dims)
+        self._generation = int(self._meta("generation") or 0)
+        self._version = int(self._meta("version") or 0)
+        rows = self._db.execute("SELECT slot, id, payload FROM rows ORDER BY slot").fetchall()
+        used = rows[-1][0] + 1 if rows else 0
+        if used > INITIAL_CAPACITY and (used - len(rows)) / used > VACUUM_RATIO:
+            rows = self._vacuum(rows)
+
+        capacity = max(INITIAL_CAPACITY, rows[-1][0] + 1 if rows else 0)
+        if os.path.exists(self._vectors_file()):
+            capacity = max(capacity, os.path.getsize(self._vectors_file()) // (4 * self.embedding_model_dims))
+        self._vectors = self._open_vectors(capacity)
+        self._alive = np.zeros(capacity, bool)
+        self._ids: dict[int, str] = {}
+        self._slot_of: dict[str, int] = {}
+        self._payloads: dict[int, dict] = {}
+        self._by_agent: dict[Optional[str], set[int]] = {}
+        self._by_scope: dict[tuple[Optional[str], Optional[str]], set[int]] = {}
+        for slot, vector_id, payload in rows:
+            self._add(slot, vector_id, json.loads(payload))
+        self._size = rows[-1][0] + 1 if rows else 0
+        self._graphs: dict[Optional[str], HnswGraph] = self._load_graphs() if self.ann_index == "hnsw" else {}
+        self._building: set[Optional[str]] = set()
+
+    def _vectors_file(self, generation: Optional[int] = None) -> str:
+        return self._file(f"{self._generation if generation is None else generation}.f32")
+
+    def _open_vectors(self, capacity: int, generation: Optional[int] = None) -> np.memmap:
+        path = self._vectors_file(generation)
+        size = capacity * self.embedding_model_dims * 4
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, np.float32, "r+", shape=(capacity, self.embedding_model_dims))
+
+    def _ensure_capacity(self, needed: int) -> None:
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        self._vectors.flush()
+        # Searches holding the old mapping keep reading valid rows
+        self._vectors = self._open_vectors(capacity)
+        alive = np.zeros(capacity, bool)
+        alive[: len(self._alive)] = self._alive
+        self._alive = alive
+
+    def _vacuum(self, rows: list[tuple]) -> list[tuple]:
+        """
+        Copy live rows into a new, dense vectors file and renumber their slots.
+        The new generation is committed with the slots, so a crash leaves one
+        consistent pair; the old file is removed afterwards.
+        """
+        old = np.memmap(self._vectors_file(), np.float32, "r", shape=(rows[-1][0] + 1, self.embedding_model_dims))
+        generation = self._generation + 1
+        new = self._open_vectors(max(INITIAL_CAPACITY, len(rows)), generation)
+        slots = np.array([row[0] for row in rows])
+        for start in range(0, len(slots), SCAN_BLOCK):
+            block = slots[start:start + SCAN_BLOCK]
+            new[start:start + len(block)] = old[block]
+        new.flush()
+        del old, new
+        rows = [(slot, vector_id, payload) for slot, (_, vector_id, payload) in enumerate(rows)]
+        with self._db:
+            self._db.execute("DELETE FROM rows")
+            self._db.executemany("INSERT INTO rows (slot, id, payload) VALUES (?, ?, ?)", rows)
+            self._set_meta("generation", generation)
+            self._bump_version()
+        os.remove(self._vectors_file())
+        self._generation = generation
+        print(f"[Memory Service] Compacted local vector store {self.collection_name} to {len(rows)} rows")
+        return rows
+
+    def _load_graphs(self) -> dict[Optional[str], HnswGraph]:
+        """Graphs saved on the last shutdown, if no write happened since (else they are rebuilt on demand)."""
+        path = self._file("hnsw.npz")
+        if not os.path.exists(path):
+            return {}
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(str(arrays["meta"]))
+            if meta["version"] != self._version or meta["generation"] != self._generation:
+                return {}
+            return {agent: HnswGraph.from_arrays(arrays, f"g{i}_") for i, agent in enumerate(meta["agents"])}
+
+    def _save_graphs(self) -> None:
+        path = self._file("hnsw.npz")
+        if not self._graphs:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        agents = list(self._graphs)
+        arrays = {"meta": np.array(json.dumps({
+            "version": self._version, "generation": self._generation, "agents": agents,
+        }))}
+        for i, agent in enumerate(agents):
+            arrays.update(self._graphs[agent].arrays(f"g{i}_"))
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    # -------------------------------------------------------------------------
+    # Indexes
+    # -------------------------------------------------------------------------
+
+    def _add(self, slot: int, vector_id: str, payload: dict) -> None:
+        self._ids[slot] = vector_id
+        self._slot_of[vector_id] = slot
+        self._payloads[slot] = payload
+        self._alive[slot] = True
+        agent_id, run_id = _as_text(payload.get("agent_id")), _as_text(payload.get("run_id"))
+        self._by_agent.setdefault(agent_id, set()).add(slot)
+        self._by_scope.setdefault((agent_id, run_id), set()).add(slot)
+
+    def _drop(self, slot: int, unlink: bool = True) -> dict:
+        payload = self._payloads.pop(slot)
+        del self._slot_of[self._ids.pop(slot)]
+        self._alive[slot] = False
+        agent_id, run_id = _as_text(payload.get("agent_id")), _as_text(payload.get("run_id"))
+        self._by_agent[agent_id].discard(slot)
+        self._by_scope[(agent_id, run_id)].discard(slot)
+        graph = self._graphs.get(agent_id)
+        if graph is not None and unlink:
+            graph.remove(slot)
+        return payload
+
+    def _matches(self, slot: int, filters: dict[str, str]) -> bool:
+        payload = self._payloads.get(slot)
+        return payload is not None and all(_as_text(payload.get(key)) == value for key, value in filters.items())
+
+    def _candidates(self, filters: Optional[dict]) -> tuple[Optional[str], np.ndarray]:
+        """The filtered scope's agent_id (None without one) and its live slots, ascending."""
+        remaining = {key: str(value) for key, value in (filters or {}).items()}
+        agent_id = remaining.pop("agent_id", None)
+        if agent_id is not None and "run_id" in remaining:
+            slots = self._by_scope.get((agent_id, remaining.pop("run_id")), ())
+        elif agent_id is not None:
+            slots = self._by_agent.get(agent_id, ())
+        else:
+            slots = np.flatnonzero(self._alive[: self._size]).tolist()
+        if remaining:
+            slots = [slot for slot in slots if self._matches(slot, remaining)]
+        return agent_id, np.sort(np.fromiter(slots, np.int64, len(slots)))
+
+    def _graph(self, agent_id: Optional[str]) -> Optional[HnswGraph]:
+        """
+        The agent_id's graph, if built. Starts building one in the background
+        when a large enough scope has none, or one made mostly of deleted or
+        re-embedded nodes (which keeps serving until the new one is ready).
+        """
+        if self.ann_index != "hnsw" or agent_id is None:
+            return None
+        graph = self._graphs.get(agent_id)
+        stale = graph is None or graph.dead > len(graph)
+        if stale and agent_id not in self._building and len(self._by_agent.get(agent_id, ())) >= LOCAL_HNSW_MIN_ROWS:
+            self._building.add(agent_id)
+            threading.Thread(target=self._build_graph, args=(agent_id,), name="local-hnsw", daemon=True).start()
+        return graph
+
+    def _build_graph(self, agent_id: Optional[str]) -> None:
+        """
+        Insert the scope's rows into a new graph outside the lock, catching up
+        with rows written meanwhile, then publish it. Runs in its own thread.
+        """
+        started = time.monotonic()
+        graph = HnswGraph()
+        try:
+            while True:
+                with self._lock:
+                    if self._db is None:
+                        return
+                    slots = self._by_agent.get(agent_id, set())
+                    pending = sorted(slots.difference(graph.node_of))
+                    if not pending:
+                        for slot in set(graph.node_of).difference(slots):
+                            graph.remove(slot)
+                        self._graphs[agent_id] = graph
+                        break
+                    vectors = self._vectors
+                for slot in pending:
+                    graph.insert(vectors, slot)
+            print(
+                f"[Memory Service] Built local HNSW graph for {agent_id} "
+                f"({len(graph)} rows, {time.monotonic() - started:.1f}s)"
+            )
+        except Exception as e:
+            print(f"[Memory Service] Building local HNSW graph for {agent_id} failed: {type(e).__name__}: {e}")
+        finally:
+            with self._lock:
+                self._building.discard(agent_id)
+
+    def _output(self, slot: int, score: Optional[float]) -> OutputData:
+        return OutputData(id=self._ids[slot], score=score, payload=self._payloads[slot])
+
+    # -------------------------------------------------------------------------
+    # mem0 interface
+    # -------------------------------------------------------------------------
+
+    def create_col(self, name=None, vector_size=None, distance=None):
+        """Files are created on open."""
+
+    def insert(self, vectors, payloads=None, ids=None):
+        ids = [str(vector_id) for vector_id in (ids or [uuid.uuid4() for _ in vectors])]
+        payloads = payloads or [{} for _ in vectors]
+        matrix = _normalize(np.asarray(vectors, np.float32).reshape(len(ids), self.embedding_model_dims))
+        with self._lock:
+            slots = []
+            for vector_id in ids:
+                slot = self._slot_of.get(vector_id)
+                if slot is None:
+                    slot = self._size
+                    self._size += 1
+                slots.append(slot)
+            self._ensure_capacity(self._size)
+            self._vectors[slots] = matrix
+            self._vectors.flush()
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO rows (slot, id, payload) VALUES (?, ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET payload = excluded.payload",
+                    [(slot, vector_id, json.dumps(payload)) for slot, vector_id, payload in zip(slots, ids, payloads)],
+                )
+                self._bump_version()
+            for slot, vector_id, payload in zip(slots, ids, payloads):
+                if slot in self._ids:
+                    self._drop(slot)
+                self._add(slot, vector_id, dict(payload))
+                graph = self._graphs.get(_as_text(payload.get("agent_id")))
+                if graph is not None:
+                    graph.insert(self._vectors, slot)
+
+    def search(self, query, vectors, limit=5, filters=None):
+        query_vector = _normalize(np.asarray(vectors, np.float32).reshape(-1))
+        with self._lock:
+            agent_id, slots = self._candidates(filters)
+            if not len(slots):
+                return []
+            graph = self._graph(agent_id) if len(slots) >= LOCAL_HNSW_MIN_ROWS else None
+            if graph is not None:
+                tuning = search_tuning.get() or {}
+                ef = tuning.get("ef_search") or LOCAL_HNSW_EF_SEARCH
+                scope = None if len(slots) == len(graph) else set(slots.tolist())
+                found = graph.search(
+                    self._vectors, query_vector, limit, ef, lambda slot: scope is None or slot in scope
+                )
+                return [self._output(slot, distance) for distance, slot in found]
+            matrix = self._vectors
+
+        # Exact scan outside the lock: writes append or rewrite rows in place
+        distances = _scan(matrix, slots, query_vector)
+        nearest = _nearest(distances, limit + 8)
+        with self._lock:
+            return [
+                self._output(int(slots[i]), float(distances[i])) for i in nearest if self._alive[slots[i]]
+            ][:limit]
+
+    def delete(self, vector_id):
+        with self._lock:
+            slot = self._slot_of.get(str(vector_id))
+            if slot is None:
+                return
+            with self._db:
+                self._db.execute("DELETE FROM rows WHERE id = ?", (str(vector_id),))
+                self._bump_version()
+            self._drop(slot)
+
+    def update(self, vector_id, vector=None, payload=None):
+        with self._lock:
+            slot = self._slot_of.get(str(vector_id))
+            if slot is None:
+                return
+            payload = dict(payload) if payload is not None else self._payloads[slot]
+            # Payload-only updates within the same agent_id keep their graph node
+            moved = vector is not None or _as_text(payload.get("agent_id")) != _as_text(
+                self._payloads[slot].get("agent_id")
+            )
+            if vector is not None:
+                self._vectors[slot] = _normalize(np.asarray(vector, np.float32).reshape(-1))
+                self._vectors.flush()
+            with self._db:
+                self._db.execute("UPDATE rows SET payload = ? WHERE slot = ?", (json.dumps(payload), slot))
+                self._bump_version()
+            self._drop(slot, unlink=moved)
+            self._add(slot, str(vector_id), payload)
+            graph = self._graphs.get(_as_text(payload.get("agent_id")))
+            if graph is not None and moved:
+                graph.insert(self._vectors, slot)
+
+    def get(self, vector_id):
+        with self._lock:
+            slot = self._slot_of.get(str(vector_id))
+            return self._output(slot, None) if slot is not None else None
+
+    def list_cols(self):
+        return [self.collection_name]
+
+    def delete_col(self):
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM rows")
+                self._bump_version()
+            self._graphs = {}
+            self._load()
+
+    def col_info(self):
+        with self._lock:
+            return {
+                "name": self.collection_name,
+                "count": len(self._ids),
+                "capacity": len(self._vectors),
+                "ann_index": self.ann_index,
+                "graphs": {agent_id: len(graph) for agent_id, graph in self._graphs.items()},
+            }
+
+    def list(self, filters=None, limit=None):
+        with self._lock:
+            _, slots = self._candidates(filters)
+            return [[self._output(int(slot), None) for slot in slots[:limit]]]
+
+    def reset(self):
+        self.delete_col()
+
+    # -------------------------------------------------------------------------
+    # Service extensions (pgvector_store.list_page / recent_page counterparts)
+    # -------------------------------------------------------------------------
+
+    def list_page(self, filters: dict, after: Optional[str], limit: int) -> list[OutputData]:
+        """One keyset page of a scope: rows with id > `after`, ordered by id."""
+        with self._lock:
+            _, slots = self._candidates(filters)
+            ids = sorted((self._ids[slot], slot) for slot in slots.tolist())
+            return [self._output(slot, None) for vector_id, slot in ids if not after or vector_id > after][:limit]
+
+    def recent_page(self, filters: dict, limit: int) -> list[OutputData]:
+        """The newest rows of a scope by created_at."""
+        with self._lock:
+            _, slots = self._candidates(filters)
+            slots = sorted(slots.tolist(), key=lambda slot: self._payloads[slot].get("created_at") or "", reverse=True)
+            return [self._output(slot, None) for slot in slots[:limit]]
+
+    def close(self) -> None:
+        """Flush vectors, save HNSW graphs and release the store's files."""
+        with self._lock:
+            if self._db is None:
+                return
+            self._vectors.flush()
+            if self.ann_index == "hnsw":
+                self._save_graphs()
+            self._db.close()
+            self._db = None
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
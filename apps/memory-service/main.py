@@ -1,149 +1,112 @@
 """
 Memory Service - FastAPI wrapper for mem0 Python SDK
-Provides REST API for memory operations with pgvector storage
+Provides REST API for memory operations with pgvector storage (or the embedded
+local store, see local_store.py)
 
 Production-grade with dependency injection pattern.
+
+mem0 (and the Gemini/pgvector stack under it) is imported and initialized in a
+background thread after the port opens; requests get 503 until the service is
+warm. Modules built on mem0 (pgvector_store, local_store, bulk, hybrid) are
+imported where they are used, never at module level.
 """
+from __future__ import annotations
+
+import asyncio
+import copy
 import os
-import re
-from typing import Optional, Any
-from datetime import datetime, timedelta
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, Callable, Optional, Any
+from datetime import date, datetime, timedelta
 from contextlib import asynccontextmanager
 from functools import lru_cache
 
-from fastapi import FastAPI, HTTPException, Depends
-from pydantic import BaseModel
-from mem0 import Memory
+from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ConfigDict
+
+from batching import BATCH_MAX_MESSAGES, MicroBatcher, process_batch, scope_key
+from cache import normalize_query, scope_tag, search_cache
+from compaction import Compactor, compact_page
+from dates import normalize_vietnamese_dates
+from dedup import add_dedup, add_key, dedup_store, wrap_llm
+from embedding_cache import wrap_embedder
+from executor import MemoryExecutors, PoolSaturatedError, TenantQueueFullError
+from jobs import JobWorkers
+from metrics import (
+    METRICS_ENABLED,
+    MetricsMiddleware,
+    instrument_memory,
+    mark_process_dead,
+    record_error,
+    render,
+    set_startup_metrics,
+    stage_timer,
+)
+from prefilter import prefilter
+from scheduler import schedule_as
+from serialization import EncodedRoute, EncodingMiddleware, MemoryJSONResponse, dumps_line
+from shared import bump_scope_generation, run_io, scope_generation
+
+if TYPE_CHECKING:
+    from mem0 import Memory
+
+    from local_store import LocalVectorStore
+    from pgvector_store import IndexBuilder, PgPool
 
 
 # =============================================================================
-# Utilities
+# Configuration
 # =============================================================================
 
-def normalize_vietnamese_dates(text: str, reference_date: Optional[datetime] = None) -> str:
-    """
-    Normalize Vietnamese relative dates to absolute dates.
-
-    ONLY normalizes when there's a CLEAR TIME INDICATOR (giờ, lúc, sáng, chiều, tối).
-    This avoids false positives like "mai mốt đi ăn nghe" (idiom meaning "sometime").
-
-    Patterns handled (only with time indicators):
-    - Exact days: hôm nay, ngày mai, hôm qua, ngày kia
-    - Weeks: tuần sau, tuần tới, tuần này
-    - Months: tháng sau, tháng tới, tháng này
-    """
-    if not reference_date:
-        reference_date = datetime.now()
-
-    # Time indicators that signal a real schedule (not idiom)
-    # Must be followed by actual time info, not just "sáng nay trời đẹp"
-    time_indicators = r'(?:lúc\s*\d|giờ|sáng\s*(?:họp|bay|gặp|đi)|chiều\s*(?:họp|bay|gặp|đi)|tối\s*(?:họp|bay|gặp|đi)|trưa\s*(?:họp|ăn|gặp)|\d{1,2}h|\d{1,2}:\d{2})'
-
-    # Idiom patterns that should NEVER be normalized (casual "sometime" expressions)
-    idiom_patterns = [
-        r'\bmai mốt\b',      # "sometime later" idiom
-        r'\bmai này\b',      # "some day" idiom
-        r'\bmai kia\b',      # "see you later" idiom
-        r'\bbữa nào\b',      # "someday"
-        r'\bhôm nào\b',      # "when/some day"
-        r'\blúc nào\b',      # "when/sometime"
-        r'\bkhi nào\b',      # "when"
-    ]
-
-    # Check if message contains idioms - if so, skip day normalization entirely
-    has_idiom = any(re.search(p, text, re.IGNORECASE) for p in idiom_patterns)
-
-    result = text
-
-    # Day patterns - only process if NOT an idiom and has time indicator
-    if not has_idiom:
-        # Pattern: "ngày mai lúc 10h" or "mai 10h họp"
-        day_patterns_with_time = [
-            (r'\bngày mai\s+' + time_indicators, 1, 'ngày mai'),
-            (r'\bmai\s+' + time_indicators, 1, 'mai'),
-            (r'\bhôm nay\s+' + time_indicators, 0, 'hôm nay'),
-            (r'\bhôm qua\s+' + time_indicators, -1, 'hôm qua'),
-            (r'\bngày kia\s+' + time_indicators, 2, 'ngày kia'),
-            (r'\bngày mốt\s+' + time_indicators, 2, 'ngày mốt'),
-        ]
-
-        for pattern, days_offset, original in day_patterns_with_time:
-            def replace_day(match, offset=days_offset, orig=original):
-                target_date = reference_date + timedelta(days=offset)
-                date_str = f"ngày {target_date.strftime('%d/%m/%Y')}"
-                # Keep the time part, replace only the day reference
-                return match.group(0).replace(orig, date_str, 1)
+# Reference point for the startup times reported by /health and /metrics
+STARTED_AT = time.monotonic()
 
-            result = re.sub(pattern, replace_day, result, flags=re.IGNORECASE)
+# Warm-up before reporting ready: one embedding call (bypassing the cache) and
+# one vector search, so credentials, the DB pool and indexes are checked
+WARMUP_ENABLED = os.getenv("MEMORY_WARMUP_ENABLED", "true").lower() == "true"
+# Seconds between initialization attempts while mem0/Postgres/Gemini are unreachable
+INIT_RETRY_SECONDS = float(os.getenv("MEMORY_INIT_RETRY_SECONDS", "5"))
 
-        # Also handle patterns like "họp lúc 10h ngày mai"
-        reverse_patterns = [
-            (time_indicators + r'\s+ngày mai\b', 1, 'ngày mai'),
-            (time_indicators + r'\s+hôm nay\b', 0, 'hôm nay'),
-            (time_indicators + r'\s+ngày kia\b', 2, 'ngày kia'),
-        ]
+# Number of distinct dates (today, plus older sent_at dates) whose prompt is kept
+PROMPT_CACHE_DAYS = int(os.getenv("MEMORY_PROMPT_CACHE_DAYS", "32"))
 
-        for pattern, days_offset, original in reverse_patterns:
-            def replace_reverse(match, offset=days_offset, orig=original):
-                target_date = reference_date + timedelta(days=offset)
-                date_str = f"ngày {target_date.strftime('%d/%m/%Y')}"
-                return match.group(0).replace(orig, date_str, 1)
-
-            result = re.sub(pattern, replace_reverse, result, flags=re.IGNORECASE)
-
-    # Week patterns - these are usually specific enough
-    week_patterns = [
-        (r'\btuần sau\b', 1),
-        (r'\btuần tới\b', 1),
-        (r'\btuần trước\b', -1),
-    ]
-
-    for pattern, weeks_offset in week_patterns:
-        current_weekday = reference_date.weekday()
-        start_of_week = reference_date - timedelta(days=current_weekday) + timedelta(weeks=weeks_offset)
-        end_of_week = start_of_week + timedelta(days=6)
-        date_range = f"tuần {start_of_week.strftime('%d/%m')}-{end_of_week.strftime('%d/%m/%Y')}"
-        result = re.sub(pattern, date_range, result, flags=re.IGNORECASE)
-
-    # Month patterns - these are usually specific enough
-    month_patterns = [
-        (r'\btháng sau\b', 1),
-        (r'\btháng tới\b', 1),
-        (r'\btháng trước\b', -1),
-    ]
-
-    for pattern, months_offset in month_patterns:
-        target_month = reference_date.month + months_offset
-        target_year = reference_date.year
-        while target_month > 12:
-            target_month -= 12
-            target_year += 1
-        while target_month < 1:
-            target_month += 12
-            target_year -= 1
-        month_str = f"tháng {target_month}/{target_year}"
-        result = re.sub(pattern, month_str, result, flags=re.IGNORECASE)
+# Stored embedding size: gemini-embedding-001 output_dimensionality (3072, 1536,
+# 768, 256, ...). Changing it on an existing collection needs
+# `python pgvector_admin.py resize --dims N`; the service refuses to start on a mismatch.
+EMBEDDING_DIMS = int(os.getenv("MEMORY_EMBEDDING_DIMS", "1536"))
 
-    return result
+# pgvector | local: the embedded NumPy store (local_store.py), for development
+# and single-host deployments without Postgres; one worker only
+VECTOR_STORE = os.getenv("MEMORY_VECTOR_STORE", "pgvector").lower()
+LOCAL_STORE_PATH = os.getenv("MEMORY_LOCAL_STORE_PATH", "memory_vectors")
 
+# Largest /memories/all page, and rows per vector store round trip when streaming
+PAGE_MAX = int(os.getenv("MEMORY_PAGE_MAX", "1000"))
+STREAM_PAGE_SIZE = int(os.getenv("MEMORY_STREAM_PAGE_SIZE", "500"))
 
-# =============================================================================
-# Configuration
-# =============================================================================
 
-def get_fact_extraction_prompt() -> str:
+def get_fact_extraction_prompt(reference_date: Optional[date] = None) -> str:
     """
     Generate custom fact extraction prompt for Executive Assistant.
     Focuses on extracting actionable information for work management.
-    Called fresh each time to ensure date is always current.
+    Dates in the prompt are anchored to `reference_date` (default: today).
     """
-    current_date = datetime.now().strftime("%d/%m/%Y")
-    current_weekday = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"][datetime.now().weekday()]
-    tomorrow = (datetime.now() + timedelta(days=1)).strftime("%d/%m/%Y")
-    day_after = (datetime.now() + timedelta(days=2)).strftime("%d/%m/%Y")
+    return _build_fact_extraction_prompt(reference_date or date.today())
+
+
+@lru_cache(maxsize=PROMPT_CACHE_DAYS)
+def _build_fact_extraction_prompt(reference_date: date) -> str:
+    """Render the extraction prompt for one calendar day. Cached per date."""
+    now = datetime.combine(reference_date, datetime.min.time())
+    current_date = now.strftime("%d/%m/%Y")
+    current_weekday = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"][now.weekday()]
+    tomorrow = (now + timedelta(days=1)).strftime("%d/%m/%Y")
+    day_after = (now + timedelta(days=2)).strftime("%d/%m/%Y")
 
     # Calculate next week range
-    now = datetime.now()
     next_week_start = now - timedelta(days=now.weekday()) + timedelta(weeks=1)
     next_week_end = next_week_start + timedelta(days=6)
 
@@ -282,7 +245,7 @@ Trả về JSON với key "facts". CHIA THÀNH NHIỀU FACTS nếu có nhiều t
 @lru_cache()
 def get_base_config() -> dict:
     """Get base configuration (without date-sensitive prompts). Cached for performance."""
-    return {
+    config = {
         "llm": {
             "provider": "gemini",
             "config": {
@@ -295,6 +258,8 @@ def get_base_config() -> dict:
             "provider": "gemini",
             "config": {
                 "model": "gemini-embedding-001",
+                # Requested from Gemini; must match the vector column
+                "embedding_dims": EMBEDDING_DIMS,
             },
         },
         "vector_store": {
@@ -306,11 +271,25 @@ def get_base_config() -> dict:
                 "password": os.getenv("DB_PASSWORD"),
                 "dbname": os.getenv("DB_NAME", "jarvis"),
                 "collection_name": "memories",
-                "embedding_model_dims": 1536,
+                "embedding_model_dims": EMBEDDING_DIMS,
+                # ANN index is created by the service with tunable parameters
+                # (pgvector_store.ensure_indexes), not with mem0's defaults
+                "hnsw": False,
             },
         },
         "version": "v1.1",
     }
+    if VECTOR_STORE == "local":
+        # Not a mem0 provider: built by local_store.memory_from_config
+        config["vector_store"] = {
+            "provider": "local",
+            "config": {
+                "collection_name": "memories",
+                "embedding_model_dims": EMBEDDING_DIMS,
+                "path": LOCAL_STORE_PATH,
+            },
+        }
+    return config
 
 
 def get_config() -> dict:
@@ -325,52 +304,276 @@ def get_config() -> dict:
 # =============================================================================
 
 class MemoryService:
-    """Singleton wrapper for mem0 Memory instance."""
+    """
+    Singleton wrapper for mem0 Memory instance.
+
+    `start()` builds it in a background thread so the port opens (and
+    /health/live answers) in well under a second; `get_instance()` raises
+    until initialization and warm-up have finished.
+    """
 
     _instance: Optional[Memory] = None
+    _pg_pool: Optional[PgPool] = None
+    # Builds missing pgvector indexes once ready (pgvector store only)
+    _index_builder: Optional[IndexBuilder] = None
+    # Local stores of the Memory (mem0 opens a second one for telemetry)
+    _local_stores: list[LocalVectorStore] = []
+    # Per-date views of _instance that differ only in the extraction prompt
+    _dated: dict[date, Memory] = {}
+    _dated_lock = threading.Lock()
+
+    # Readiness: "starting" -> "ready", or "retrying" while attempts fail
+    _state = "starting"
+    _error: Optional[str] = None
+    _attempts = 0
+    _startup: dict[str, float] = {}
+    _stopping = threading.Event()
+    _thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def start(cls, on_ready: Callable[[], None]) -> None:
+        """Initialize in a background thread, retrying until it succeeds, then call `on_ready`."""
+        cls._stopping.clear()
+        cls._state = "starting"
+        cls._thread = threading.Thread(target=cls._run, args=(on_ready,), name="mem0-init", daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    def _run(cls, on_ready: Callable[[], None]) -> None:
+        while not cls._stopping.is_set():
+            cls._attempts += 1
+            try:
+                cls.initialize()
+                break
+            except Exception as e:
+                cls._error = f"{type(e).__name__}: {str(e).strip()}"
+                cls._state = "retrying"
+                print(f"[Memory Service] Initialization failed (attempt {cls._attempts}): {cls._error}")
+                cls.shutdown()
+                cls._stopping.wait(INIT_RETRY_SECONDS)
+        if cls._stopping.is_set():
+            cls.shutdown()
+            return
+        on_ready()
+        cls._state = "ready"
+        cls._error = None
+        cls._startup["ready"] = round(time.monotonic() - STARTED_AT, 3)
+        set_startup_metrics(cls._startup, ready=True)
+        phases = ", ".join(f"{phase} {seconds}s" for phase, seconds in cls._startup.items() if phase != "ready")
+        print(f"[Memory Service] Ready in {cls._startup['ready']}s ({phases})")
 
     @classmethod
     def initialize(cls) -> None:
-        """Initialize the Memory instance. Called once at startup."""
-        if cls._instance is None:
-            print("[Memory Service] Initializing mem0 with pgvector...")
-            cls._instance = Memory.from_config(get_config())
-            print("[Memory Service] Ready!")
+        """Import mem0, build the Memory instance and warm it up. Blocking."""
+        if cls._instance is not None:
+            return
+        print(f"[Memory Service] Initializing mem0 with {VECTOR_STORE}...")
+        started = time.monotonic()
+        from mem0 import Memory
+
+        # Modules built on mem0, imported here so handlers find them loaded
+        import bulk  # noqa: F401
+        import context  # noqa: F401
+        import hybrid  # noqa: F401
+        from local_store import LocalVectorStore, memory_from_config
+        from pgvector_store import attach_pool, service_store
+
+        # Only the first attempt pays for the imports
+        cls._startup.setdefault("imports", round(time.monotonic() - started, 3))
+
+        started = time.monotonic()
+        config = get_config()
+        if VECTOR_STORE == "local":
+            memory = memory_from_config(config)
+        else:
+            # Copy the (cached) vector store section before injecting the pool
+            vector_store_config = dict(config["vector_store"]["config"])
+            config["vector_store"] = {**config["vector_store"], "config": vector_store_config}
+            cls._pg_pool = attach_pool(vector_store_config)
+            memory = Memory.from_config(config)
+        # Closed by shutdown(), also after a failed attempt, releasing their locks
+        cls._local_stores = [
+            store
+            for store in (memory.vector_store, getattr(memory, "_telemetry_vector_store", None))
+            if isinstance(store, LocalVectorStore)
+        ]
+        memory.embedding_model = wrap_embedder(memory.embedding_model)
+        memory.vector_store = service_store(memory.vector_store)
+        instrument_memory(memory)
+        # Wrapped after instrumentation so llm stage timings count only real calls
+        memory.llm = wrap_llm(memory.llm)
+        cls._startup["mem0"] = round(time.monotonic() - started, 3)
+
+        if WARMUP_ENABLED:
+            started = time.monotonic()
+            cls.warm_up(memory)
+            cls._startup["warmup"] = round(time.monotonic() - started, 3)
+        # Published last: get_instance() succeeds only once the instance is warm
+        cls._instance = memory
+
+    @staticmethod
+    def warm_up(memory: Memory) -> None:
+        """
+        One real embedding and one vector search, so the first request does not
+        pay for TLS handshakes, pool connections or cold index pages, and a bad
+        API key or database surfaces here instead of in a user's request.
+        """
+        # Bypass the embedding cache, which would answer without calling Gemini
+        embedder = getattr(memory.embedding_model, "_embedder", memory.embedding_model)
+        vector = embedder.embed("warm-up", "search")
+        if len(vector) != EMBEDDING_DIMS:
+            raise RuntimeError(
+                f"Embedder returned {len(vector)} dimensions, MEMORY_EMBEDDING_DIMS is {EMBEDDING_DIMS}"
+            )
+        memory.vector_store.search(query="warm-up", vectors=vector, limit=1, filters={"agent_id": "__warmup__"})
+
+    @classmethod
+    def build_indexes(cls) -> None:
+        """Create missing pgvector indexes in the background (called once ready)."""
+        from mem0.vector_stores.pgvector import PGVector
+        from pgvector_store import IndexBuilder
+
+        if cls._index_builder is not None or not isinstance(cls._instance.vector_store, PGVector):
+            return
+        cls._index_builder = IndexBuilder(cls._instance.vector_store)
+        cls._index_builder.start()
+
+    @classmethod
+    def stop(cls) -> None:
+        """Stop a pending initialization (it finishes its current attempt in the background)."""
+        cls._stopping.set()
 
     @classmethod
     def shutdown(cls) -> None:
         """Cleanup on shutdown."""
-        print("[Memory Service] Shutting down...")
+        if cls._instance is not None:
+            print("[Memory Service] Shutting down...")
         cls._instance = None
+        cls._dated = {}
+        # Before the pool closes: cancels a build still holding a connection
+        if cls._index_builder is not None:
+            cls._index_builder.shutdown()
+            cls._index_builder = None
+        if cls._pg_pool is not None:
+            cls._pg_pool.close()
+            cls._pg_pool = None
+        for store in cls._local_stores:
+            store.close()
+        cls._local_stores = []
+
+    @classmethod
+    def is_ready(cls) -> bool:
+        return cls._instance is not None and cls._state == "ready"
+
+    @classmethod
+    def status(cls) -> dict[str, Any]:
+        """Readiness state, failed attempts and startup phase timings (seconds)."""
+        return {
+            "state": cls._state,
+            "attempts": cls._attempts,
+            "error": cls._error,
+            "uptime_seconds": round(time.monotonic() - STARTED_AT, 3),
+            "startup_seconds": dict(cls._startup),
+        }
 
     @classmethod
     def get_instance(cls) -> Memory:
         """Get the Memory instance. Raises if not initialized."""
-        if cls._instance is None:
+        if not cls.is_ready():
             raise RuntimeError("MemoryService not initialized")
         return cls._instance
 
+    @classmethod
+    def for_date(cls, reference_date: date) -> Memory:
+        """
+        Memory whose fact-extraction prompt is anchored to `reference_date`.
+
+        The view is a shallow copy of the instance with its own config, so it
+        shares the LLM, embedder, vector store and history DB; switching dates
+        never rebuilds clients or connections, and concurrent adds for
+        different dates do not race on one mutable prompt.
+        """
+        base = cls.get_instance()
+        with cls._dated_lock:
+            view = cls._dated.get(reference_date)
+            if view is None:
+                prompt = get_fact_extraction_prompt(reference_date)
+                view = copy.copy(base)
+                view.config = base.config.model_copy(update={"custom_fact_extraction_prompt": prompt})
+                view.custom_fact_extraction_prompt = prompt
+                cls._dated[reference_date] = view
+                while len(cls._dated) > PROMPT_CACHE_DAYS:
+                    cls._dated.pop(next(iter(cls._dated)))
+            return view
+
 
 def get_memory() -> Memory:
     """
     FastAPI dependency for Memory instance.
-    Raises HTTP 503 if service not ready.
+    Raises HTTP 503 (with Retry-After) until the service is warm.
     """
     try:
         return MemoryService.get_instance()
     except RuntimeError:
         raise HTTPException(
             status_code=503,
-            detail="Memory service not initialized"
+            detail=f"Memory service {MemoryService.status()['state']}",
+            headers={"Retry-After": str(max(1, round(INIT_RETRY_SECONDS)))},
         )
 
 
+def invalidate_scope(agent_id: Optional[str], run_id: Optional[str], forget_adds: bool = True) -> None:
+    """
+    Drop cached search results of a scope after a write, in every worker.
+
+    Unless `forget_adds` is False (adds), also forget the remembered add
+    results of the scope: after a delete, update or archive they may name
+    memories that are gone, and a retried message must be ingested again.
+    Blocking (shared state); handlers call it through `run_io`.
+    """
+    tag = scope_tag(agent_id, run_id)
+    search_cache.invalidate_tag(tag)
+    bump_scope_generation(tag)
+    if forget_adds:
+        dedup_store.forget_scope(tag)
+
+
+def invalidate_memory_scope(item: Optional[dict]) -> None:
+    """Invalidate the scope of an existing memory (as returned by `memory.get`)."""
+    if item:
+        invalidate_scope(item.get("agent_id"), item.get("run_id"))
+
+
+def run_compaction_page(memory: Memory, state: dict, enforce: bool, on_archived) -> Any:
+    """Compact one page on the write pool, scheduled as its agent_id's call."""
+    schedule_as(state["agent_id"])
+    return MemoryExecutors.call("write", compact_page, memory, state, enforce, on_archived)
+
+
+def start_background_workers() -> None:
+    """Start the workers that need mem0 (called once it is ready)."""
+    MemoryService.build_indexes()
+    JobWorkers.initialize({"add": run_add_job})
+    Compactor.start(
+        MemoryService.get_instance,
+        should_yield=MemoryExecutors.busy,
+        on_archived=lambda scopes: [invalidate_scope(agent_id, run_id) for agent_id, run_id in scopes],
+        run_page=run_compaction_page,
+    )
+
+
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     """Application lifespan: initialize on startup, cleanup on shutdown."""
-    MemoryService.initialize()
+    MemoryExecutors.initialize()
+    MemoryService.start(on_ready=start_background_workers)
     yield
+    MemoryService.stop()
+    Compactor.shutdown()
+    JobWorkers.shutdown()
     MemoryService.shutdown()
+    MemoryExecutors.shutdown()
+    mark_process_dead()
 
 
 app = FastAPI(
@@ -378,7 +581,34 @@ app = FastAPI(
     description="Memory layer powered by mem0 with pgvector",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=MemoryJSONResponse,
 )
+# Handler results skip response_model serialization (see serialization.py)
+app.router.route_class = EncodedRoute
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+app.add_middleware(EncodingMiddleware)
+
+
+@app.exception_handler(PoolSaturatedError)
+async def pool_saturated_handler(_request: Request, exc: PoolSaturatedError):
+    """
+    Backpressure: tell callers to retry instead of queueing without limit.
+    503 when the pool is full, 429 when the caller's tenant holds its share.
+    """
+    record_error(exc)
+    content = {
+        "success": False,
+        "error": str(exc),
+        "pool": exc.pool,
+        "queue_depth": exc.queue_depth,
+        "max_queue": exc.max_queue,
+    }
+    if isinstance(exc, TenantQueueFullError):
+        return MemoryJSONResponse(
+            status_code=429, headers={"Retry-After": "1"}, content={**content, "tenant": exc.tenant}
+        )
+    return MemoryJSONResponse(status_code=503, headers={"Retry-After": "1"}, content=content)
 
 
 # Request/Response models
@@ -396,6 +626,11 @@ class AddMemoryRequest(BaseModel):
     group_name: Optional[str] = None
     platform: Optional[str] = None  # telegram, lark, web - for AI context
     sent_at: Optional[str] = None  # ISO format
+    async_mode: bool = False  # Enqueue and return a job id instead of waiting for extraction
+
+
+class AddMemoryBatchRequest(BaseModel):
+    messages: list[AddMemoryRequest]  # async_mode is ignored per item
 
 
 class SearchMemoryRequest(BaseModel):
@@ -404,13 +639,39 @@ class SearchMemoryRequest(BaseModel):
     workspace_id: Optional[str] = None  # For multi-tenant isolation
     query: str
     limit: int = 5
+    ef_search: Optional[int] = None  # HNSW recall/latency knob (1-1000), when the index is hnsw
+    probes: Optional[int] = None  # IVFFlat lists to scan (1-1000), when the index is ivfflat
+    mode: Optional[str] = None  # "vector" | "hybrid" (default MEMORY_SEARCH_MODE)
+    view: Optional[str] = None  # "text" | "compact" | "full" (default: mem0's result as is)
+
+
+class ContextRequest(BaseModel):
+    user_id: str
+    group_id: str
+    workspace_id: Optional[str] = None  # For multi-tenant isolation
+    queries: list[str] = []  # Searched concurrently, up to MEMORY_CONTEXT_MAX_QUERIES
+    limit: int = 5  # Hits per query
+    recent: int = 0  # Newest memories to append after the hits
+    max_tokens: Optional[int] = None  # Budget of the context text (default MEMORY_CONTEXT_MAX_TOKENS)
+    view: str = "compact"  # "text" | "compact" | "full"
+    ef_search: Optional[int] = None
+    probes: Optional[int] = None
+    mode: Optional[str] = None
 
 
 class GetAllMemoriesRequest(BaseModel):
     user_id: str
     group_id: str
     workspace_id: Optional[str] = None  # For multi-tenant isolation
-    limit: int = 10
+    limit: int = 10  # Page size, up to MEMORY_PAGE_MAX
+    after: Optional[str] = None  # Cursor: next_cursor of the previous page
+
+
+class StreamMemoriesRequest(BaseModel):
+    user_id: str
+    group_id: str
+    workspace_id: Optional[str] = None  # For multi-tenant isolation
+    after: Optional[str] = None  # Resume after this memory id
 
 
 class UpdateMemoryRequest(BaseModel):
@@ -428,7 +689,22 @@ class DeleteAllMemoriesRequest(BaseModel):
     workspace_id: Optional[str] = None  # For multi-tenant isolation
 
 
+class BulkOperation(BaseModel):
+    op: str  # update | delete | delete_all
+    memory_id: Optional[str] = None  # update, delete
+    data: Optional[str] = None  # update
+    user_id: Optional[str] = None  # delete_all scope, as in /memories/delete-all
+    group_id: Optional[str] = None
+    workspace_id: Optional[str] = None
+
+
+class BulkRequest(BaseModel):
+    operations: list[BulkOperation]
+
+
 class MemoryItem(BaseModel):
+    model_config = ConfigDict(extra="allow")  # mem0 adds hash, scope ids; views add sender_name, sent_at
+
     id: str
     memory: str
     metadata: Optional[dict] = None
@@ -437,79 +713,438 @@ class MemoryItem(BaseModel):
     updated_at: Optional[str] = None
 
 
+class MemoryResults(BaseModel):
+    results: list[MemoryItem]
+
+
+class MemoryPage(BaseModel):
+    results: list[MemoryItem]
+    next_cursor: Optional[str] = None
+
+
+class MemoryContext(BaseModel):
+    context: str  # Numbered lines for the prompt
+    memories: list[MemoryItem]
+    tokens: int
+    omitted: int
+
+
+class DeleteAllResult(BaseModel):
+    deleted: int
+
+
 class MemoryResponse(BaseModel):
     success: bool
     data: Optional[Any] = None
     error: Optional[str] = None
 
 
+# Typed variants for the OpenAPI schema; responses are encoded without
+# validation (EncodedRoute), so handlers keep building MemoryResponse
+class SearchResponse(MemoryResponse):
+    data: Optional[MemoryResults] = None
+
+
+class PageResponse(MemoryResponse):
+    data: Optional[MemoryPage] = None
+
+
+class ContextResponse(MemoryResponse):
+    data: Optional[MemoryContext] = None
+
+
+class DeleteAllResponse(MemoryResponse):
+    data: Optional[DeleteAllResult] = None
+
+
 # =============================================================================
 # Endpoints
 # =============================================================================
 
 @app.get("/health")
 async def health():
-    """Health check endpoint."""
-    is_ready = MemoryService._instance is not None
-    return {"status": "ok", "service": "memory-service", "mem0": is_ready}
+    """Health check endpoint (always 200; see /health/ready for gating)."""
+    is_ready = MemoryService.is_ready()
+    embedding = MemoryService._instance.embedding_model if is_ready else None
+    llm = MemoryService._instance.llm if is_ready else None
+    return {
+        "status": "ok",
+        "service": "memory-service",
+        "pid": os.getpid(),
+        "mem0": is_ready,
+        "startup": MemoryService.status(),
+        "executors": MemoryExecutors.stats(),
+        "jobs": await run_io(JobWorkers.get_queue().counts) if JobWorkers._queue else None,
+        "compaction": Compactor.stats(),
+        "pg_pool": MemoryService._pg_pool.stats() if MemoryService._pg_pool else None,
+        "indexes": MemoryService._index_builder.stats() if MemoryService._index_builder else None,
+        "local_store": MemoryService._local_stores[0].col_info() if MemoryService._local_stores else None,
+        "prefilter": prefilter.stats(),
+        "dedup": {**add_dedup.stats(), "extraction": llm.stats() if hasattr(llm, "stats") else None},
+        "caches": {
+            "search": search_cache.stats(),
+            "embedding": embedding.stats() if hasattr(embedding, "stats") else None,
+        },
+    }
 
 
-@app.post("/memories/add", response_model=MemoryResponse)
-async def add_memory(req: AddMemoryRequest, memory: Memory = Depends(get_memory)):
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and serving, whether or not mem0 is ready."""
+    return {"status": "ok", "pid": os.getpid()}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: 200 once mem0 is initialized and warm, 503 before."""
+    status = MemoryService.status()
+    if not MemoryService.is_ready():
+        return MemoryJSONResponse(status_code=503, content=status)
+    return status
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request latency, mem0 stage timings, errors, executor load."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    payload, content_type = render()
+    return Response(content=payload, media_type=content_type)
+
+
+def prepare_add(req: AddMemoryRequest) -> tuple[list[dict], dict]:
     """
-    Add a new memory entry.
+    Build the `memory.add` arguments for a request.
 
     Multi-tenant memory scoping:
     - agent_id = workspace_id (isolates between workspaces)
     - run_id = group_id (context within workspace)
     - user_id = chat user (individual user memory)
     """
+    # Parse reference date from sent_at or use now
+    reference_date = datetime.now()
+    if req.sent_at:
+        try:
+            reference_date = datetime.fromisoformat(req.sent_at.replace('Z', '+00:00'))
+        except ValueError:
+            pass  # Use current time if parsing fails
+
+    # Normalize Vietnamese relative dates to absolute dates
+    with stage_timer("dates", "normalize_vietnamese_dates"):
+        normalized_message = normalize_vietnamese_dates(req.message, reference_date)
+
+    messages = [{"role": "user", "content": normalized_message}]
+    metadata = {
+        "sender_name": req.sender_name,  # Human-readable name for attribution
+        "group_name": req.group_name,
+        "platform": req.platform,  # telegram, lark, web - for AI context
+        "sent_at": req.sent_at or reference_date.isoformat(),
+        "original_message": req.message,
+        "workspace_id": req.workspace_id,
+        "group_id": req.group_id,
+    }
+
+    # Multi-tenant scoping:
+    # - agent_id: workspace isolation (primary tenant boundary)
+    # - run_id: group context within workspace
+    # - user_id: individual user within group
+    agent_id = f"workspace_{req.workspace_id}" if req.workspace_id else f"group_{req.group_id}"
+    run_id = f"group_{req.group_id}" if req.workspace_id else None
+
+    add_kwargs = {
+        "user_id": req.user_id,
+        "agent_id": agent_id,
+        "metadata": metadata,
+    }
+    if run_id:
+        add_kwargs["run_id"] = run_id
+
+    return messages, add_kwargs
+
+
+def prompt_date(add_kwargs: dict) -> date:
+    """Day the extraction prompt is anchored to: the message's sent_at, else today."""
+    sent_at = add_kwargs["metadata"].get("sent_at")
+    if sent_at:
+        try:
+            return datetime.fromisoformat(sent_at.replace('Z', '+00:00')).date()
+        except ValueError:
+            pass
+    return date.today()
+
+
+def batch_key(add_kwargs: dict) -> str:
+    """Messages share an extraction call only within one scope and prompt date."""
+    return f"{scope_key(add_kwargs)}|{prompt_date(add_kwargs).isoformat()}"
+
+
+def run_add_job(payload: dict) -> Any:
+    """
+    Job handler: run a queued `memory.add` from a background worker, through
+    the write pool like a synchronous add (fair queue, rate limits, bounded
+    workers), so async_mode is no way around a tenant's limits.
+    """
+    add_kwargs = payload["add_kwargs"]
+    memory = MemoryService.for_date(prompt_date(add_kwargs))
+    schedule_as(add_kwargs["agent_id"], llm=2, embed=1)
+    result = MemoryExecutors.call("write", memory.add, payload["messages"], **add_kwargs)
+    invalidate_scope(add_kwargs["agent_id"], add_kwargs.get("run_id"), forget_adds=False)
+    prefilter.observe(payload.get("prefilter"), result)
+    result = result if result else []
+    if payload.get("dedup_key"):
+        add_dedup.remember(payload["dedup_key"], result, scope_tag(add_kwargs["agent_id"], add_kwargs.get("run_id")))
+    return result
+
+
+async def process_add_batch(items: list[dict]) -> list[Any]:
+    """Run a batch of adds sharing scope and prompt date on the write pool."""
+    memory = MemoryService.for_date(prompt_date(items[0]["add_kwargs"]))
+    # One extraction call for the batch plus one update call per message (mem0: two calls)
+    llm_calls = 2 if len(items) == 1 else 1 + len(items)
+    schedule_as(items[0]["add_kwargs"]["agent_id"], llm=llm_calls, embed=len(items))
+    return await MemoryExecutors.run("write", process_batch, memory, items)
+
+
+def enqueue_add_job(payload: dict, dedup_key: str, scope: str) -> str:
+    """Persist an async add and remember its job id for copies of the message. Blocking."""
+    job_id = JobWorkers.get_queue().enqueue("add", payload)
+    add_dedup.remember(dedup_key, job_id, scope)
+    return job_id
+
+
+# Coalesces concurrent /memories/add calls per scope (MEMORY_BATCH_WINDOW_MS > 0)
+add_batcher = MicroBatcher(process_add_batch)
+
+
+@app.post("/memories/add", response_model=MemoryResponse)
+async def add_memory(req: AddMemoryRequest, memory: Memory = Depends(get_memory)):
+    """
+    Add a new memory entry.
+
+    With `async_mode`, the message is normalized and persisted to the job
+    queue, and the response carries a job id to poll at /memories/jobs/{id}.
+
+    Repeats of a message (same scope, sender, prompt date and normalized
+    text) within MEMORY_DEDUP_TTL return the earlier result or job id; see
+    dedup.py.
+    """
     try:
-        # Parse reference date from sent_at or use now
-        reference_date = datetime.now()
-        if req.sent_at:
-            try:
-                reference_date = datetime.fromisoformat(req.sent_at.replace('Z', '+00:00'))
-            except ValueError:
-                pass  # Use current time if parsing fails
+        if req.async_mode and not req.message.strip():
+            return MemoryResponse(success=False, error="Message is empty")
+
+        # Greetings, chatter and idioms never yield facts; skip the LLM round trip
+        skip_reason = prefilter.check(req.message)
+        if skip_reason and prefilter.enforcing:
+            if req.async_mode:
+                return MemoryResponse(success=True, data={"job_id": None, "status": "skipped", "reason": skip_reason})
+            return MemoryResponse(success=True, data=[])
+
+        messages, add_kwargs = prepare_add(req)
+        schedule_as(add_kwargs["agent_id"], llm=2, embed=1)
+        dedup_key = add_key(messages, add_kwargs, prompt_date(add_kwargs))
+        scope = scope_tag(add_kwargs["agent_id"], add_kwargs.get("run_id"))
+
+        if req.async_mode:
+            earlier, earlier_job = await run_io(add_dedup.lookup_many, [dedup_key, f"job:{dedup_key}"])
+            if earlier is not None:
+                return MemoryResponse(success=True, data={"job_id": None, "status": "duplicate", "result": earlier})
+            if earlier_job is not None:
+                return MemoryResponse(success=True, data={"job_id": earlier_job, "status": "duplicate"})
+            payload = {"messages": messages, "add_kwargs": add_kwargs, "prefilter": skip_reason, "dedup_key": dedup_key}
+            job_id = await run_io(enqueue_add_job, payload, f"job:{dedup_key}", scope)
+            return MemoryResponse(success=True, data={"job_id": job_id, "status": "queued"})
+
+        async def add() -> Any:
+            if add_batcher.enabled:
+                item = {"messages": messages, "add_kwargs": add_kwargs}
+                result = await add_batcher.submit(batch_key(add_kwargs), item)
+            else:
+                dated_memory = MemoryService.for_date(prompt_date(add_kwargs))
+                result = await MemoryExecutors.run("write", dated_memory.add, messages, **add_kwargs)
+            await run_io(invalidate_scope, add_kwargs["agent_id"], add_kwargs.get("run_id"), forget_adds=False)
+            prefilter.observe(skip_reason, result)
+            return result if result else []
+
+        result = await add_dedup.run(dedup_key, scope, add)
+        return MemoryResponse(success=True, data=result)
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        record_error(e)
+        return MemoryResponse(success=False, error=str(e))
 
-        # Normalize Vietnamese relative dates to absolute dates
-        normalized_message = normalize_vietnamese_dates(req.message, reference_date)
 
-        messages = [{"role": "user", "content": normalized_message}]
-        metadata = {
-            "sender_name": req.sender_name,  # Human-readable name for attribution
-            "group_name": req.group_name,
-            "platform": req.platform,  # telegram, lark, web - for AI context
-            "sent_at": req.sent_at or reference_date.isoformat(),
-            "original_message": req.message,
-            "workspace_id": req.workspace_id,
-            "group_id": req.group_id,
-        }
+@app.post("/memories/add-batch", response_model=MemoryResponse)
+async def add_memory_batch(req: AddMemoryBatchRequest, memory: Memory = Depends(get_memory)):
+    """
+    Add many chat messages at once.
+
+    Messages are grouped by agent_id/run_id scope and each group of up to
+    MEMORY_BATCH_MAX_MESSAGES shares one fact-extraction LLM call. Facts keep
+    the metadata (sender_name, sent_at, original_message) of their own message.
+    Messages already ingested within MEMORY_DEDUP_TTL, and repeats within the
+    request, are not processed again and are flagged `duplicate`.
+    Returns one result per input message, in order.
+    """
+    try:
+        items = []
+        skip_reasons = []
+        keys = []
+        for message_req in req.messages:
+            messages, add_kwargs = prepare_add(message_req)
+            items.append({"messages": messages, "add_kwargs": add_kwargs})
+            skip_reasons.append(prefilter.check(message_req.message))
+            keys.append(add_key(messages, add_kwargs, prompt_date(add_kwargs)))
+
+        per_message: list[Optional[dict]] = [None] * len(items)
+        skipped = [bool(reason) and prefilter.enforcing for reason in skip_reasons]
+        earlier_results = (
+            await run_io(add_dedup.lookup_many, [None if skip else key for skip, key in zip(skipped, keys)])
+            if add_dedup.enabled
+            else []
+        )
 
-        # Multi-tenant scoping:
-        # - agent_id: workspace isolation (primary tenant boundary)
-        # - run_id: group context within workspace
-        # - user_id: individual user within group
-        agent_id = f"workspace_{req.workspace_id}" if req.workspace_id else f"group_{req.group_id}"
-        run_id = f"group_{req.group_id}" if req.workspace_id else None
+        # Group input positions by scope and date, then split into chunks of at most N
+        groups: dict[str, list[int]] = {}
+        first_copy: dict[str, int] = {}
+        copies: dict[int, int] = {}
+        for index, item in enumerate(items):
+            if skipped[index]:
+                per_message[index] = {"index": index, "success": True, "data": {"results": []}, "skipped": skip_reasons[index]}
+                continue
+            if add_dedup.enabled:
+                earlier = earlier_results[index]
+                if earlier is not None:
+                    per_message[index] = {"index": index, "success": True, "data": earlier, "duplicate": True}
+                    continue
+                if keys[index] in first_copy:
+                    copies[index] = first_copy[keys[index]]
+                    continue
+                first_copy[keys[index]] = index
+            groups.setdefault(batch_key(item["add_kwargs"]), []).append(index)
+        chunks = [
+            positions[start:start + BATCH_MAX_MESSAGES]
+            for positions in groups.values()
+            for start in range(0, len(positions), BATCH_MAX_MESSAGES)
+        ]
 
-        add_kwargs = {
-            "user_id": req.user_id,
-            "agent_id": agent_id,
-            "metadata": metadata,
+        outcomes = await asyncio.gather(
+            *[process_add_batch([items[i] for i in chunk]) for chunk in chunks],
+            return_exceptions=True,
+        )
+
+        written = {
+            (items[index]["add_kwargs"]["agent_id"], items[index]["add_kwargs"].get("run_id"))
+            for chunk in chunks
+            for index in chunk
         }
-        if run_id:
-            add_kwargs["run_id"] = run_id
+        await run_io(lambda: [invalidate_scope(agent_id, run_id, forget_adds=False) for agent_id, run_id in written])
+
+        remembered = []
+        for chunk, outcome in zip(chunks, outcomes):
+            for position, index in enumerate(chunk):
+                if isinstance(outcome, Exception):
+                    per_message[index] = {"index": index, "success": False, "error": str(outcome)}
+                elif isinstance(outcome[position], Exception):
+                    # Failed update stage: reported, and not remembered so a retry ingests it
+                    per_message[index] = {"index": index, "success": False, "error": str(outcome[position])}
+                else:
+                    per_message[index] = {"index": index, "success": True, "data": outcome[position]}
+                    prefilter.observe(skip_reasons[index], outcome[position])
+                    add_kwargs = items[index]["add_kwargs"]
+                    scope = scope_tag(add_kwargs["agent_id"], add_kwargs.get("run_id"))
+                    remembered.append((keys[index], outcome[position], scope))
+        await run_io(add_dedup.remember_many, remembered)
+        for index, original in copies.items():
+            per_message[index] = {**per_message[original], "index": index, "duplicate": True}
+
+        return MemoryResponse(success=True, data=per_message)
+    except Exception as e:
+        record_error(e)
+        return MemoryResponse(success=False, error=str(e))
 
-        result = memory.add(messages, **add_kwargs)
 
-        return MemoryResponse(success=True, data=result if result else [])
+@app.get("/memories/jobs/{job_id}", response_model=MemoryResponse)
+async def get_job(job_id: str):
+    """
+    Get status and result of an async ingestion job. 404 for unknown jobs and
+    for finished ones deleted after MEMORY_JOB_RETENTION_SECONDS.
+    """
+    try:
+        job = await run_io(JobWorkers.get_queue().get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return MemoryResponse(success=True, data=job)
+    except HTTPException:
+        raise
     except Exception as e:
+        record_error(e)
         return MemoryResponse(success=False, error=str(e))
 
 
-@app.post("/memories/search", response_model=MemoryResponse)
+def validate_search(ef_search: Optional[int], probes: Optional[int], mode: Optional[str]) -> Optional[str]:
+    """Error message for invalid search knobs, or None."""
+    from hybrid import SEARCH_MODES
+
+    for knob in (ef_search, probes):
+        if knob is not None and not 1 <= knob <= 1000:
+            return "ef_search/probes must be between 1 and 1000"
+    if mode is not None and mode not in SEARCH_MODES:
+        return f"mode must be one of {', '.join(SEARCH_MODES)}"
+    return None
+
+
+async def cached_search(
+    memory: Memory,
+    agent_id: str,
+    run_id: Optional[str],
+    query: str,
+    limit: int,
+    mode: str,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Any:
+    """Vector or hybrid search of a scope on the read pool, through the search cache."""
+    from hybrid import hybrid_search
+    from pgvector_store import search_tuning
+
+    search_kwargs = {
+        "agent_id": agent_id,
+        "limit": limit,
+    }
+    if run_id:
+        search_kwargs["run_id"] = run_id
+    if ef_search or probes:
+        search_tuning.set({"ef_search": ef_search, "probes": probes})
+
+    # Serve repeated questions from cache. The key carries the scope's shared
+    # generation, so a write handled by another worker retires this entry;
+    # the local generation guards against storing a result computed before
+    # a concurrent write in this process.
+    tag = scope_tag(agent_id, run_id)
+    shared_generation = await run_io(scope_generation, tag)
+    cache_key = (agent_id, run_id, normalize_query(query), limit, ef_search, probes, mode, shared_generation)
+    cached = search_cache.get(cache_key) if shared_generation is not None else None
+    if cached is not None:
+        return cached
+    generation = search_cache.generation(tag)
+
+    if mode == "hybrid":
+        results = await MemoryExecutors.run("read", hybrid_search, memory, query, search_kwargs)
+    else:
+        results = await MemoryExecutors.run("read", memory.search, query, **search_kwargs)
+    results = results if results else []
+    if shared_generation is not None:
+        search_cache.set(cache_key, results, tag=tag, generation=generation)
+    return results
+
+
+def result_items(results: Any) -> list[dict]:
+    """Items of a mem0 search/get_all result ({"results": [...]} or a bare list)."""
+    return results.get("results", []) if isinstance(results, dict) else list(results)
+
+
+@app.post("/memories/search", response_model=SearchResponse)
 async def search_memories(req: SearchMemoryRequest, memory: Memory = Depends(get_memory)):
     """
     Search memories by query with multi-tenant scoping.
@@ -518,28 +1153,149 @@ async def search_memories(req: SearchMemoryRequest, memory: Memory = Depends(get
     This allows group members to access shared information (e.g., meeting times announced by others).
     user_id is only used when ADDING memories to track who said what.
     """
+    from context import VIEWS, project
+    from hybrid import SEARCH_MODE
+
     try:
         # Multi-tenant scoping - NO user_id filter (shared memory within group)
         agent_id = f"workspace_{req.workspace_id}" if req.workspace_id else f"group_{req.group_id}"
         run_id = f"group_{req.group_id}" if req.workspace_id else None
 
-        search_kwargs = {
-            "agent_id": agent_id,
-            "limit": req.limit,
-        }
-        if run_id:
-            search_kwargs["run_id"] = run_id
+        error = validate_search(req.ef_search, req.probes, req.mode)
+        if error:
+            return MemoryResponse(success=False, error=error)
+        if req.view is not None and req.view not in VIEWS:
+            return MemoryResponse(success=False, error=f"view must be one of {', '.join(VIEWS)}")
+        schedule_as(agent_id, embed=1)
 
-        results = memory.search(req.query, **search_kwargs)
-        return MemoryResponse(success=True, data=results if results else [])
+        results = await cached_search(
+            memory, agent_id, run_id, req.query, req.limit, req.mode or SEARCH_MODE, req.ef_search, req.probes
+        )
+        if req.view is not None:
+            results = {"results": [project(item, req.view) for item in result_items(results)]}
+        return MemoryResponse(success=True, data=results)
+    except PoolSaturatedError:
+        raise
     except Exception as e:
+        record_error(e)
         return MemoryResponse(success=False, error=str(e))
 
 
-@app.post("/memories/all", response_model=MemoryResponse)
+@app.post("/memories/context", response_model=ContextResponse)
+async def memory_context(req: ContextRequest, memory: Memory = Depends(get_memory)):
+    """
+    Prompt-ready memories for a chat turn: runs every query concurrently,
+    fuses and de-duplicates the hits, appends the `recent` newest memories
+    and cuts the bundle to `max_tokens` (see context.py).
+
+    Scoped like /memories/search: all memories of the group/workspace.
+    """
+    from context import CONTEXT_MAX_QUERIES, CONTEXT_MAX_RECENT, CONTEXT_MAX_TOKENS, VIEWS, build_bundle
+    from hybrid import SEARCH_MODE
+
+    try:
+        agent_id = f"workspace_{req.workspace_id}" if req.workspace_id else f"group_{req.group_id}"
+        run_id = f"group_{req.group_id}" if req.workspace_id else None
+
+        # Repeated queries (ignoring case and spacing) are searched once
+        queries = list({normalize_query(q): q for q in req.queries if q.strip()}.values())
+        if not queries and not req.recent:
+            return MemoryResponse(success=False, error="queries or recent is required")
+        if len(queries) > CONTEXT_MAX_QUERIES:
+            return MemoryResponse(success=False, error=f"At most {CONTEXT_MAX_QUERIES} queries per request")
+        if not 0 <= req.recent <= CONTEXT_MAX_RECENT:
+            return MemoryResponse(success=False, error=f"recent must be between 0 and {CONTEXT_MAX_RECENT}")
+        error = validate_search(req.ef_search, req.probes, req.mode)
+        if error:
+            return MemoryResponse(success=False, error=error)
+        if req.view not in VIEWS:
+            return MemoryResponse(success=False, error=f"view must be one of {', '.join(VIEWS)}")
+        max_tokens = req.max_tokens or CONTEXT_MAX_TOKENS
+        if max_tokens < 1:
+            return MemoryResponse(success=False, error="max_tokens must be positive")
+
+        schedule_as(agent_id, embed=1)
+        mode = req.mode or SEARCH_MODE
+        searches = [
+            cached_search(memory, agent_id, run_id, query, req.limit, mode, req.ef_search, req.probes)
+            for query in queries
+        ]
+        results = await asyncio.gather(*searches)
+        recent = []
+        if req.recent:
+            filters = {"agent_id": agent_id}
+            if run_id:
+                filters["run_id"] = run_id
+            schedule_as(agent_id)
+            recent = await MemoryExecutors.run("read", fetch_recent, memory, filters, req.recent)
+
+        bundle = build_bundle([result_items(r) for r in results], recent, max_tokens, req.view)
+        return MemoryResponse(success=True, data=bundle)
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        record_error(e)
+        return MemoryResponse(success=False, error=str(e))
+
+
+# Non-pgvector stores have no keyset access; cursors page over this many rows
+FALLBACK_LIST_LIMIT = 10000
+
+
+def fetch_page(memory: Memory, filters: dict, after: Optional[str], limit: int) -> tuple[list[dict], Optional[str]]:
+    """
+    One page of a scope in id order, plus the cursor of the next page (None
+    after the last one). Blocking; run on the read pool.
+    """
+    from mem0.vector_stores.pgvector import PGVector
+
+    from local_store import LocalVectorStore
+    from pgvector_store import format_memory, list_page
+
+    store = memory.vector_store
+    if isinstance(store, PGVector):
+        items = [format_memory(row) for row in list_page(store, filters, after, limit)]
+    elif isinstance(store, LocalVectorStore):
+        items = [format_memory(row) for row in store.list_page(filters, after, limit)]
+    else:
+        listed = memory.get_all(**filters, limit=FALLBACK_LIST_LIMIT)
+        rows = sorted(listed.get("results", []) if isinstance(listed, dict) else listed, key=lambda m: m["id"])
+        items = [m for m in rows if not after or m["id"] > after][:limit]
+    next_cursor = items[-1]["id"] if len(items) == limit else None
+    return items, next_cursor
+
+
+def fetch_recent(memory: Memory, filters: dict, limit: int) -> list[dict]:
+    """Newest memories of a scope by created_at. Blocking; run on the read pool."""
+    from mem0.vector_stores.pgvector import PGVector
+
+    from local_store import LocalVectorStore
+    from pgvector_store import format_memory, recent_page
+
+    store = memory.vector_store
+    if isinstance(store, PGVector):
+        return [format_memory(row) for row in recent_page(store, filters, limit)]
+    if isinstance(store, LocalVectorStore):
+        return [format_memory(row) for row in store.recent_page(filters, limit)]
+    listed = result_items(memory.get_all(**filters, limit=FALLBACK_LIST_LIMIT))
+    return sorted(listed, key=lambda m: m.get("created_at") or "", reverse=True)[:limit]
+
+
+def is_memory_id(value: Optional[str]) -> bool:
+    try:
+        uuid.UUID(value or "")
+    except ValueError:
+        return False
+    return True
+
+
+@app.post("/memories/all", response_model=PageResponse)
 async def get_all_memories(req: GetAllMemoriesRequest, memory: Memory = Depends(get_memory)):
     """
-    Get all memories for a group/workspace.
+    Get one page of the memories of a group/workspace.
+
+    Pages are ordered by id; pass `next_cursor` from the response as `after`
+    to get the next page (it is null on the last one).
 
     NOTE: user_id is NOT used for filtering - returns ALL memories in the group/workspace.
     This enables shared memory access within teams.
@@ -549,26 +1305,101 @@ async def get_all_memories(req: GetAllMemoriesRequest, memory: Memory = Depends(
         agent_id = f"workspace_{req.workspace_id}" if req.workspace_id else f"group_{req.group_id}"
         run_id = f"group_{req.group_id}" if req.workspace_id else None
 
-        get_kwargs = {
-            "agent_id": agent_id,
-            "limit": req.limit,
-        }
+        filters = {"agent_id": agent_id}
         if run_id:
-            get_kwargs["run_id"] = run_id
+            filters["run_id"] = run_id
+
+        if not 1 <= req.limit <= PAGE_MAX:
+            return MemoryResponse(success=False, error=f"limit must be between 1 and {PAGE_MAX}")
+        if req.after and not is_memory_id(req.after):
+            return MemoryResponse(success=False, error="Invalid cursor")
+
+        schedule_as(agent_id)
+        items, next_cursor = await MemoryExecutors.run("read", fetch_page, memory, filters, req.after, req.limit)
+        return MemoryResponse(success=True, data={"results": items, "next_cursor": next_cursor})
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        record_error(e)
+        return MemoryResponse(success=False, error=str(e))
 
-        memories = memory.get_all(**get_kwargs)
-        return MemoryResponse(success=True, data=memories if memories else [])
+
+@app.post("/memories/all/stream")
+async def stream_all_memories(req: StreamMemoriesRequest, memory: Memory = Depends(get_memory)):
+    """
+    Export every memory of a group/workspace as NDJSON (one item per line).
+
+    Pages of MEMORY_STREAM_PAGE_SIZE rows are read from the vector store and
+    written out one at a time, so memory use does not grow with the scope.
+    A failure mid-stream ends it with an `{"error": ...}` line; resume with
+    `after` set to the last id received.
+    """
+    agent_id = f"workspace_{req.workspace_id}" if req.workspace_id else f"group_{req.group_id}"
+    run_id = f"group_{req.group_id}" if req.workspace_id else None
+    filters = {"agent_id": agent_id}
+    if run_id:
+        filters["run_id"] = run_id
+    if req.after and not is_memory_id(req.after):
+        return MemoryResponse(success=False, error="Invalid cursor")
+    schedule_as(agent_id)
+
+    # First page up front: saturation and errors still get a normal response
+    try:
+        first = await MemoryExecutors.run("read", fetch_page, memory, filters, req.after, STREAM_PAGE_SIZE)
+    except PoolSaturatedError:
+        raise
     except Exception as e:
+        record_error(e)
         return MemoryResponse(success=False, error=str(e))
 
+    async def lines():
+        items, next_cursor = first
+        while True:
+            if items:
+                yield b"".join(dumps_line(item) for item in items)
+            if next_cursor is None:
+                return
+            try:
+                items, next_cursor = await MemoryExecutors.run(
+                    "read", fetch_page, memory, filters, next_cursor, STREAM_PAGE_SIZE
+                )
+            except PoolSaturatedError:
+                # Already streaming: wait for room on the read pool instead of failing
+                items = []
+                await asyncio.sleep(0.05)
+            except Exception as e:
+                record_error(e)
+                yield dumps_line({"error": str(e)})
+                return
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def update_and_invalidate(memory: Memory, memory_id: str, data: str) -> None:
+    """Update a memory, then invalidate its scope. Blocking; run on the write pool."""
+    existing = memory.get(memory_id)
+    memory.update(memory_id, data)
+    invalidate_memory_scope(existing)
+
+
+def delete_and_invalidate(memory: Memory, memory_id: str) -> None:
+    """Delete a memory, then invalidate its scope. Blocking; run on the write pool."""
+    existing = memory.get(memory_id)
+    memory.delete(memory_id)
+    invalidate_memory_scope(existing)
+
 
 @app.post("/memories/update", response_model=MemoryResponse)
 async def update_memory(req: UpdateMemoryRequest, memory: Memory = Depends(get_memory)):
     """Update a specific memory."""
     try:
-        memory.update(req.memory_id, req.data)
+        schedule_as(None, embed=1)
+        await MemoryExecutors.run("write", update_and_invalidate, memory, req.memory_id, req.data)
         return MemoryResponse(success=True)
+    except PoolSaturatedError:
+        raise
     except Exception as e:
+        record_error(e)
         return MemoryResponse(success=False, error=str(e))
 
 
@@ -576,15 +1407,20 @@ async def update_memory(req: UpdateMemoryRequest, memory: Memory = Depends(get_m
 async def delete_memory(req: DeleteMemoryRequest, memory: Memory = Depends(get_memory)):
     """Delete a specific memory."""
     try:
-        memory.delete(req.memory_id)
+        await MemoryExecutors.run("write", delete_and_invalidate, memory, req.memory_id)
         return MemoryResponse(success=True)
+    except PoolSaturatedError:
+        raise
     except Exception as e:
+        record_error(e)
         return MemoryResponse(success=False, error=str(e))
 
 
-@app.post("/memories/delete-all", response_model=MemoryResponse)
+@app.post("/memories/delete-all", response_model=DeleteAllResponse)
 async def delete_all_memories(req: DeleteAllMemoriesRequest, memory: Memory = Depends(get_memory)):
     """Delete all memories for a user/group with multi-tenant scoping."""
+    from bulk import bulk_delete_scope
+
     try:
         # Multi-tenant scoping
         agent_id = f"workspace_{req.workspace_id}" if req.workspace_id else f"group_{req.group_id}"
@@ -597,9 +1433,109 @@ async def delete_all_memories(req: DeleteAllMemoriesRequest, memory: Memory = De
         if run_id:
             delete_kwargs["run_id"] = run_id
 
-        memory.delete_all(**delete_kwargs)
-        return MemoryResponse(success=True)
+        schedule_as(agent_id)
+        deleted = await MemoryExecutors.run("write", bulk_delete_scope, memory, delete_kwargs)
+        await run_io(invalidate_scope, agent_id, run_id)
+        return MemoryResponse(success=True, data={"deleted": deleted})
+    except PoolSaturatedError:
+        raise
+    except Exception as e:
+        record_error(e)
+        return MemoryResponse(success=False, error=str(e))
+
+
+def run_bulk(memory: Memory, updates: dict[str, str], deletes: list[str], scopes: list[dict]) -> dict:
+    """Apply a validated bulk request, then invalidate what it touched. Blocking; run on the write pool."""
+    from bulk import bulk_delete, bulk_delete_scope, bulk_update
+
+    update_errors, updated_scopes = bulk_update(memory, updates) if updates else ({}, set())
+    delete_errors, deleted_scopes = bulk_delete(memory, deletes) if deletes else ({}, set())
+    for agent_id, run_id in updated_scopes | deleted_scopes:
+        invalidate_scope(agent_id, run_id)
+
+    scope_results = []
+    for filters in scopes:
+        try:
+            scope_results.append({"success": True, "deleted": bulk_delete_scope(memory, filters)})
+        except Exception as e:
+            record_error(e)
+            scope_results.append({"success": False, "error": str(e)})
+        invalidate_scope(filters["agent_id"], filters.get("run_id"))
+    return {"update": update_errors, "delete": delete_errors, "delete_all": scope_results}
+
+
+@app.post("/memories/bulk", response_model=MemoryResponse)
+async def bulk_memories(req: BulkRequest, memory: Memory = Depends(get_memory)):
+    """
+    Apply many update/delete/delete_all operations at once.
+
+    Updates run first, then deletes, then scope deletes, each as batched
+    set-based statements (see bulk.py). Each memory_id may appear once per
+    request. Returns one result per operation, in order.
+    """
+    from bulk import BULK_MAX_OPERATIONS
+
+    try:
+        if len(req.operations) > BULK_MAX_OPERATIONS:
+            return MemoryResponse(success=False, error=f"At most {BULK_MAX_OPERATIONS} operations per request")
+
+        results: list[Optional[dict]] = [None] * len(req.operations)
+        updates: dict[str, str] = {}
+        deletes: list[str] = []
+        scopes: list[dict] = []
+        positions: dict[str, int] = {}
+        scope_positions: list[int] = []
+        for index, op in enumerate(req.operations):
+            error = None
+            if op.op in ("update", "delete"):
+                if not is_memory_id(op.memory_id):
+                    error = "Invalid memory_id"
+                elif op.memory_id in positions:
+                    error = "Duplicate memory_id in request"
+                elif op.op == "update" and not op.data:
+                    error = "update requires data"
+            elif op.op == "delete_all":
+                if not op.user_id or not op.group_id:
+                    error = "delete_all requires user_id and group_id"
+            else:
+                error = f"Unknown op: {op.op}"
+            if error:
+                results[index] = {"index": index, "op": op.op, "success": False, "error": error}
+                continue
+
+            if op.op == "update":
+                updates[op.memory_id] = op.data
+                positions[op.memory_id] = index
+            elif op.op == "delete":
+                deletes.append(op.memory_id)
+                positions[op.memory_id] = index
+            else:
+                # Multi-tenant scoping, as in /memories/delete-all
+                filters = {
+                    "user_id": op.user_id,
+                    "agent_id": f"workspace_{op.workspace_id}" if op.workspace_id else f"group_{op.group_id}",
+                }
+                if op.workspace_id:
+                    filters["run_id"] = f"group_{op.group_id}"
+                scopes.append(filters)
+                scope_positions.append(index)
+
+        schedule_as(None, embed=len(updates))
+        outcome = await MemoryExecutors.run("write", run_bulk, memory, updates, deletes, scopes)
+
+        for kind in ("update", "delete"):
+            for memory_id, error in outcome[kind].items():
+                index = positions[memory_id]
+                results[index] = {"index": index, "op": kind, "memory_id": memory_id, "success": error is None}
+                if error:
+                    results[index]["error"] = error
+        for index, scope_result in zip(scope_positions, outcome["delete_all"]):
+            results[index] = {"index": index, "op": "delete_all", **scope_result}
+        return MemoryResponse(success=True, data=results)
+    except PoolSaturatedError:
+        raise
     except Exception as e:
+        record_error(e)
         return MemoryResponse(success=False, error=str(e))
 
 
@@ -607,9 +1543,12 @@ async def delete_all_memories(req: DeleteAllMemoriesRequest, memory: Memory = De
 async def get_memory_history(memory_id: str, memory: Memory = Depends(get_memory)):
     """Get history of a specific memory."""
     try:
-        history = memory.history(memory_id)
+        history = await MemoryExecutors.run("read", memory.history, memory_id)
         return MemoryResponse(success=True, data=history if history else [])
+    except PoolSaturatedError:
+        raise
     except Exception as e:
+        record_error(e)
         return MemoryResponse(success=False, error=str(e))
 
 
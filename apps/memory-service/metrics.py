@@ -0,0 +1,290 @@
+"""
+Prometheus metrics, served at /metrics.
+
+- requests: count, latency histogram and in-flight gauge per endpoint (route
+  template, so ids in paths do not multiply series)
+- stages: latency of each call into mem0's components (LLM, embedder, vector
+  store, history DB) and of date normalization, labelled by stage and method.
+  mem0 runs add/search internals on its own threads, so stage timings are
+  aggregated per method rather than attributed to the calling request.
+- errors: failed requests by endpoint and exception type (including errors a
+  handler turns into success=false), and failed stage calls by type
+- executors: in-flight calls, queue depth and rejections per pool
+- tenants: queue depth, queueing delay, rate-limit holds and rejections per
+  pool and tenant (workspace; groups without one share the label "groups")
+- startup: duration of each startup phase, and whether the worker is ready
+- compaction: memories examined, and archived as duplicates or expired
+- Postgres pool: time each checkout waited for a connection, and timeouts
+- pre-LLM filter: messages skipped (LLM calls saved) and, in shadow mode,
+  filtered messages observed and missed (they did produce memories)
+- dedup: add lookups (hit / coalesced / miss) and extraction cache lookups
+
+Recording is a few lock-protected float additions per observation, cheap
+enough to leave on. With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR
+to an empty directory (wiped before the workers start) so /metrics aggregates
+every worker, not just the one that answers the scrape.
+"""
+import functools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.routing import Match
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+METRICS_ENABLED = os.getenv("MEMORY_METRICS_ENABLED", "true").lower() == "true"
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Requests span cache hits (ms) to LLM extraction (tens of seconds)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Queueing delay in front of the pools
+WAIT_BUCKETS = (0.001, 0.005, 0.025, 0.1, 0.5, 1, 2.5, 10, 30)
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# mem0 components timed as stages: stage -> (Memory attribute, methods)
+STAGE_METHODS = {
+    "llm": ("llm", ("generate_response",)),
+    "embedder": ("embedding_model", ("embed", "embed_batch")),
+    "vector_store": ("vector_store", ("insert", "search", "update", "delete", "get", "list")),
+    "history": ("db", ("add_history", "batch_add_history")),
+}
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+
+REQUESTS = Counter(
+    "memory_requests_total", "HTTP requests handled", ["endpoint", "method", "status"]
+)
+REQUEST_SECONDS = Histogram(
+    "memory_request_duration_seconds", "HTTP request latency", ["endpoint", "method"], buckets=REQUEST_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "memory_requests_in_flight", "HTTP requests being handled", ["endpoint"], multiprocess_mode="livesum"
+)
+ERRORS = Counter(
+    "memory_errors_total", "Failed requests by exception type", ["endpoint", "type"]
+)
+STAGE_SECONDS = Histogram(
+    "memory_stage_duration_seconds", "Latency of calls into mem0 components", ["stage", "method"],
+    buckets=STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "memory_stage_errors_total", "Failed calls into mem0 components", ["stage", "type"]
+)
+EXECUTOR_IN_FLIGHT = Gauge(
+    "memory_executor_in_flight", "Calls running or queued per pool", ["pool"], multiprocess_mode="livesum"
+)
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "memory_executor_queue_depth", "Calls waiting for a worker per pool", ["pool"], multiprocess_mode="livesum"
+)
+EXECUTOR_REJECTED = Counter(
+    "memory_executor_rejected_total", "Calls rejected because the pool was saturated", ["pool"]
+)
+TENANT_QUEUE_DEPTH = Gauge(
+    "memory_tenant_queue_depth", "Calls waiting for a worker per pool and tenant", ["pool", "tenant"],
+    multiprocess_mode="livesum",
+)
+TENANT_WAIT_SECONDS = Histogram(
+    "memory_tenant_wait_seconds", "Time calls waited for a worker per pool and tenant", ["pool", "tenant"],
+    buckets=WAIT_BUCKETS,
+)
+TENANT_THROTTLED = Counter(
+    "memory_tenant_throttled_total", "Calls held back by a rate limit", ["pool", "tenant", "resource"]
+)
+TENANT_REJECTED = Counter(
+    "memory_tenant_rejected_total", "Calls rejected because the tenant's queue share was full", ["pool", "tenant"]
+)
+STARTUP_SECONDS = Gauge(
+    "memory_startup_seconds", "Startup phase durations (imports, mem0, warmup; ready = since process start)",
+    ["phase"], multiprocess_mode="max",
+)
+READY = Gauge(
+    "memory_ready", "1 once mem0 is initialized and warm", multiprocess_mode="livemin"
+)
+COMPACTION_SCANNED = Counter(
+    "memory_compaction_scanned_total", "Memories examined by compaction"
+)
+COMPACTION_ARCHIVED = Counter(
+    "memory_compaction_archived_total", "Memories archived by compaction (would be, in shadow mode)",
+    ["reason", "mode"],
+)
+PG_POOL_WAIT_SECONDS = Histogram(
+    "memory_pg_pool_wait_seconds", "Time a checkout waited for a Postgres connection", buckets=WAIT_BUCKETS
+)
+PG_POOL_TIMEOUTS = Counter(
+    "memory_pg_pool_timeouts_total", "Checkouts that found no free Postgres connection in time"
+)
+PREFILTER_SKIPPED = Counter(
+    "memory_prefilter_skipped_total", "Messages that skipped the LLM (enforce mode)", ["reason"]
+)
+PREFILTER_SHADOW_OBSERVED = Counter(
+    "memory_prefilter_shadow_observed_total", "Filtered messages ingested anyway in shadow mode", ["reason"]
+)
+PREFILTER_SHADOW_MISSED = Counter(
+    "memory_prefilter_shadow_missed_total", "Shadow-filtered messages that produced memories", ["reason"]
+)
+DEDUP_LOOKUPS = Counter(
+    "memory_dedup_lookups_total", "Add idempotency lookups", ["outcome"]
+)
+EXTRACTION_CACHE_LOOKUPS = Counter(
+    "memory_extraction_cache_lookups_total", "Fact-extraction LLM cache lookups", ["outcome"]
+)
+
+# Errors a handler caught during the current request (reported by the middleware)
+_request_errors: ContextVar[Optional[list[str]]] = ContextVar("memory_request_errors", default=None)
+
+
+def record_error(exc: BaseException) -> None:
+    """Count an exception a handler turned into an error response."""
+    errors = _request_errors.get()
+    if errors is not None:
+        errors.append(type(exc).__name__)
+
+
+def render() -> tuple[bytes, str]:
+    """Exposition payload and content type for /metrics."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the shared directory on shutdown."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def set_startup_metrics(phases: dict[str, float], ready: bool) -> None:
+    for phase, seconds in phases.items():
+        STARTUP_SECONDS.labels(phase).set(seconds)
+    READY.set(1 if ready else 0)
+
+
+# =============================================================================
+# Stage timing
+# =============================================================================
+
+@contextmanager
+def stage_timer(stage: str, method: str):
+    """Time a block as one call of `stage`."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        STAGE_ERRORS.labels(stage, type(e).__name__).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage, method).observe(time.perf_counter() - started)
+
+
+def timed(stage: str, method: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    histogram = STAGE_SECONDS.labels(stage, method)
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            STAGE_ERRORS.labels(stage, type(e).__name__).inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    return wrapper
+
+
+def instrument_memory(memory: Any) -> None:
+    """
+    Time the LLM, embedder, vector store and history calls of a Memory.
+
+    Methods are wrapped on the component instances, so isinstance checks and
+    the shallow-copied per-date views see the same timed objects.
+    """
+    if not METRICS_ENABLED:
+        return
+    for stage, (attribute, methods) in STAGE_METHODS.items():
+        component = getattr(memory, attribute, None)
+        if component is None:
+            continue
+        for method in methods:
+            fn = getattr(component, method, None)
+            if callable(fn):
+                setattr(component, method, timed(stage, method, fn))
+
+
+# =============================================================================
+# Middleware
+# =============================================================================
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count, latency and in-flight gauges.
+
+    Plain ASGI rather than BaseHTTPMiddleware: no extra task per request, and
+    streamed responses are timed until their last chunk.
+    """
+
+    def __init__(self, app, routes: list):
+        self.app = app
+        self.routes = routes
+
+    def endpoint(self, scope: dict) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = self.endpoint(scope)
+        method = scope["method"]
+        status = 500
+        errors: list[str] = []
+        token = _request_errors.set(errors)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(endpoint)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            errors.append(type(e).__name__)
+            raise
+        finally:
+            REQUEST_SECONDS.labels(endpoint, method).observe(time.perf_counter() - started)
+            REQUESTS.labels(endpoint, method, str(status)).inc()
+            in_flight.dec()
+            for error in errors:
+                ERRORS.labels(endpoint, error).inc()
+            _request_errors.reset(token)
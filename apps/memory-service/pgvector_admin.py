@@ -0,0 +1,397 @@
+"""
+Maintenance CLI for the pgvector memories collection.
+
+    python pgvector_admin.py status
+    python pgvector_admin.py indexes
+    python pgvector_admin.py reindex [--index hnsw|ivfflat] [--quantization none|halfvec|binary] [--lists N]
+    python pgvector_admin.py resize --dims 768 [--reembed]
+    python pgvector_admin.py partition [--min-rows 10000] [--dry-run]
+    python pgvector_admin.py add-partition workspace_<id>
+
+Layouts:
+
+- shared (default): one `memories` table (id, vector, payload); searches
+  filter on payload->>'agent_id'/'run_id' through a btree expression index.
+- partitioned: `memories` is LIST-partitioned on an `agent_id` column (the
+  `workspace_{id}` / `group_{id}` scope from main.py). Large workspaces get
+  their own partition with its own ANN index; everyone else shares the
+  default partition. The service detects the layout at startup.
+
+Embedding size (MEMORY_EMBEDDING_DIMS): `resize` shrinks the vector column
+in place by keeping each vector's leading dimensions (gemini-embedding-001 is
+Matryoshka-trained, so a prefix is the smaller embedding up to scale), or with
+`--reembed` recomputes every vector at the new size from the memory text into
+a side column first (resumable; needed to grow). Either way the ANN index is
+rebuilt; deploy the service with the new MEMORY_EMBEDDING_DIMS afterwards.
+
+`partition` copies the table into the partitioned layout and swaps names in
+one transaction; writes to the collection block while it runs, and the old
+table is kept as `<collection>_unpartitioned` until you drop it.
+Connection settings come from the same DB_* variables as the service.
+"""
+import argparse
+import hashlib
+import re
+import sys
+import time
+
+import psycopg2
+
+from mem0.utils.factory import EmbedderFactory
+
+from embedding_cache import wrap_embedder
+from main import get_base_config
+from pgvector_store import (
+    MAX_INDEX_DIMS,
+    PG_ANN_INDEX,
+    PG_QUANTIZATION,
+    ann_index_name,
+    ann_index_names,
+    ann_index_sql,
+    build_indexes,
+    ivfflat_lists,
+    missing_indexes,
+)
+
+
+def connect():
+    config = get_base_config()["vector_store"]["config"]
+    conn = psycopg2.connect(
+        host=config["host"],
+        port=config["port"],
+        user=config["user"],
+        password=config["password"],
+        dbname=config["dbname"],
+    )
+    return conn, config["collection_name"]
+
+
+def partition_name(collection: str, agent_id: str) -> str:
+    """Stable, identifier-safe partition table name for a scope."""
+    slug = re.sub(r'[^a-z0-9_]', '_', agent_id.lower())[:32]
+    digest = hashlib.sha1(agent_id.encode("utf-8")).hexdigest()[:8]
+    return f"{collection}_p_{slug}_{digest}"
+
+
+def default_partition(cur, collection: str) -> str:
+    cur.execute(
+        "SELECT d.relname FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid JOIN pg_class d ON d.oid = pt.partdefid "
+        "WHERE c.relname = %s",
+        (collection,),
+    )
+    row = cur.fetchone()
+    if row is None:
+        sys.exit(f"{collection} is not partitioned; run `partition` first")
+    return row[0]
+
+
+def is_partitioned_table(cur, collection: str) -> bool:
+    cur.execute(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+        (collection,),
+    )
+    return cur.fetchone() is not None
+
+
+def vector_dims(cur, table: str) -> int:
+    cur.execute(
+        "SELECT atttypmod FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'vector'",
+        (table,),
+    )
+    return cur.fetchone()[0]
+
+
+# =============================================================================
+# Commands
+# =============================================================================
+
+def cmd_status(args) -> None:
+    conn, collection = connect()
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT c.relname, c.reltuples::bigint, pg_size_pretty(pg_total_relation_size(c.oid)) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.reltuples DESC",
+            (collection,),
+        )
+        partitions = cur.fetchall()
+        cur.execute(f"SELECT COUNT(*) FROM {collection}")
+        total = cur.fetchone()[0]
+        cur.execute(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s ORDER BY indexname",
+            (collection,),
+        )
+        indexes = cur.fetchall()
+        cur.execute(
+            f"SELECT COALESCE(payload->>'agent_id', ''), COUNT(*) FROM {collection} "
+            "GROUP BY 1 ORDER BY 2 DESC LIMIT 10"
+        )
+        top_scopes = cur.fetchall()
+        dims = vector_dims(cur, collection)
+
+    layout = "partitioned" if partitions else "shared"
+    print(f"collection: {collection} ({layout}), {total} rows, {dims} dimensions")
+    for name, rows, size in partitions:
+        print(f"  partition {name}: ~{rows} rows, {size}")
+    print("indexes:")
+    for name, definition in indexes:
+        print(f"  {name}: {definition}")
+    print("largest scopes:")
+    for agent_id, rows in top_scopes:
+        print(f"  {agent_id or '(none)'}: {rows}")
+
+
+def cmd_indexes(args) -> None:
+    """Build the indexes the service expects but the collection lacks."""
+    conn, collection = connect()
+    with conn, conn.cursor() as cur:
+        partitioned = is_partitioned_table(cur, collection)
+        dims = vector_dims(cur, collection)
+    # The service builds these itself on the shared layout (concurrently); on
+    # partitioned parents CONCURRENTLY is not supported and writes block while
+    # each index builds, so it leaves them to this command
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        missing = missing_indexes(cur, collection, partitioned, dims, concurrently=not partitioned)
+        if not missing:
+            print("all indexes present")
+            return
+        build_indexes(cur, missing, concurrently=not partitioned)
+
+
+def cmd_reindex(args) -> None:
+    """Rebuild the ANN index with the current (or given) parameters and swap it in."""
+    conn, collection = connect()
+    index = args.index or PG_ANN_INDEX
+    quantization = args.quantization or PG_QUANTIZATION
+    with conn, conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {collection}")
+        rows = cur.fetchone()[0]
+        partitioned = is_partitioned_table(cur, collection)
+        dims = vector_dims(cur, collection)
+    if dims > MAX_INDEX_DIMS[quantization]:
+        sys.exit(f"{dims} dimensions exceed the {MAX_INDEX_DIMS[quantization]} limit for {quantization}")
+    lists = args.lists or (ivfflat_lists(rows) if index == "ivfflat" else None)
+    name = ann_index_name(collection, index, quantization)
+
+    # Build the new index next to the old one, then swap, so searches never
+    # lose their index. CONCURRENTLY keeps the table writable but cannot run
+    # in a transaction block and is not supported on partitioned parents.
+    concurrently = "" if partitioned else "CONCURRENTLY "
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        sql = ann_index_sql(
+            collection, dims, index=index, quantization=quantization, lists=lists,
+            concurrently=not partitioned, suffix="_new",
+        )
+        if sql is None:
+            sys.exit("MEMORY_PG_ANN_INDEX=none; nothing to build")
+        cur.execute(f"DROP INDEX {concurrently}IF EXISTS {name}_new")
+        started = time.monotonic()
+        print(sql)
+        cur.execute(sql)
+        print(f"built in {time.monotonic() - started:.1f}s over {rows} rows")
+        cur.execute(f"DROP INDEX {concurrently}IF EXISTS {name}")
+        # Another index type or quantization is a different index; --keep-old
+        # leaves it for the service until MEMORY_PG_* point at the new one
+        if not args.keep_old:
+            for old in ann_index_names(collection):
+                if old != name:
+                    cur.execute(f"DROP INDEX {concurrently}IF EXISTS {old}")
+        cur.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+    if quantization != PG_QUANTIZATION:
+        print(f"set MEMORY_PG_QUANTIZATION={quantization} on the service to search with this index")
+
+
+def embedder_for(dims: int):
+    """The service's (cached) embedder, asking Gemini for `dims` dimensions."""
+    config = get_base_config()["embedder"]
+    embedder = EmbedderFactory.create(config["provider"], {**config["config"], "embedding_dims": dims}, None)
+    return wrap_embedder(embedder)
+
+
+def reembed_rows(cur, collection: str, embedder, rows: list[tuple]) -> None:
+    """Embed (id, text) rows into vector_new; the embedding calls run before the UPDATE."""
+    vectors = embedder.embed_batch([text or "" for _, text in rows], "update")
+    cur.execute(
+        f"UPDATE {collection} AS m SET vector_new = v.vector::vector "
+        "FROM unnest(%s::uuid[], %s::text[]) AS v(id, vector) WHERE m.id = v.id",
+        ([row[0] for row in rows], ["[" + ",".join(map(str, v)) + "]" for v in vectors]),
+    )
+
+
+def cmd_resize(args) -> None:
+    """Change the stored embedding size by truncating vectors or re-embedding memories."""
+    conn, collection = connect()
+    with conn, conn.cursor() as cur:
+        current = vector_dims(cur, collection)
+    if args.dims == current:
+        sys.exit(f"{collection}.vector already has {current} dimensions")
+    if args.dims > current and not args.reembed:
+        sys.exit("Growing the vectors needs --reembed")
+
+    embedder = embedder_for(args.dims) if args.reembed else None
+    if args.reembed:
+        # Fill a side column in id order while the service keeps running; rerun to resume
+        with conn, conn.cursor() as cur:
+            cur.execute(f"ALTER TABLE {collection} ADD COLUMN IF NOT EXISTS vector_new vector({args.dims})")
+        after, done = "00000000-0000-0000-0000-000000000000", 0
+        while True:
+            with conn, conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT id, payload->>'data' FROM {collection} "
+                    "WHERE id > %s AND vector_new IS NULL ORDER BY id LIMIT %s",
+                    (after, args.batch),
+                )
+                rows = cur.fetchall()
+            if not rows:
+                break
+            with conn, conn.cursor() as cur:
+                reembed_rows(cur, collection, embedder, rows)
+            after, done = rows[-1][0], done + len(rows)
+            print(f"\r  re-embedded {done} memories", end="", flush=True)
+        print()
+
+    started = time.monotonic()
+    with conn, conn.cursor() as cur:
+        # Writes wait from here; searches too once the column is rewritten
+        cur.execute(f"LOCK TABLE {collection} IN EXCLUSIVE MODE")
+        for name in ann_index_names(collection):
+            cur.execute(f"DROP INDEX IF EXISTS {name}")
+        if args.reembed:
+            # Rows written since the pass above
+            cur.execute(f"SELECT id, payload->>'data' FROM {collection} WHERE vector_new IS NULL")
+            missing = cur.fetchall()
+            for start in range(0, len(missing), args.batch):
+                reembed_rows(cur, collection, embedder, missing[start:start + args.batch])
+            cur.execute(f"ALTER TABLE {collection} DROP COLUMN vector")
+            cur.execute(f"ALTER TABLE {collection} RENAME COLUMN vector_new TO vector")
+        else:
+            cur.execute(
+                f"ALTER TABLE {collection} ALTER COLUMN vector TYPE vector({args.dims}) "
+                f"USING subvector(vector, 1, {args.dims})::vector({args.dims})"
+            )
+        cur.execute(f"SELECT COUNT(*) FROM {collection}")
+        rows = cur.fetchone()[0]
+        if args.dims <= MAX_INDEX_DIMS[PG_QUANTIZATION]:
+            sql = ann_index_sql(collection, args.dims, lists=ivfflat_lists(rows))
+            if sql:
+                cur.execute(sql)
+    print(f"{collection}.vector: {current} -> {args.dims} dimensions ({rows} rows, {time.monotonic() - started:.1f}s locked)")
+    print(f"deploy the service with MEMORY_EMBEDDING_DIMS={args.dims}")
+
+
+def cmd_partition(args) -> None:
+    """Convert the shared table into the workspace-partitioned layout."""
+    conn, collection = connect()
+    new = f"{collection}_partitioned"
+    with conn, conn.cursor() as cur:
+        if is_partitioned_table(cur, collection):
+            sys.exit(f"{collection} is already partitioned")
+        cur.execute(f"LOCK TABLE {collection} IN EXCLUSIVE MODE")
+        cur.execute(
+            f"SELECT payload->>'agent_id', COUNT(*) FROM {collection} "
+            "WHERE payload->>'agent_id' IS NOT NULL GROUP BY 1 HAVING COUNT(*) >= %s ORDER BY 2 DESC",
+            (args.min_rows,),
+        )
+        large = cur.fetchall()
+        print(f"{len(large)} scopes with >= {args.min_rows} rows get their own partition")
+        for agent_id, rows in large:
+            print(f"  {agent_id}: {rows}")
+        if args.dry_run:
+            conn.rollback()
+            return
+
+        dims = vector_dims(cur, collection)
+        cur.execute(
+            f"CREATE TABLE {new} (id UUID NOT NULL, agent_id TEXT NOT NULL, vector vector({dims}), payload JSONB, "
+            "PRIMARY KEY (agent_id, id)) PARTITION BY LIST (agent_id)"
+        )
+        cur.execute(f"CREATE TABLE {collection}_p_default PARTITION OF {new} DEFAULT")
+        for agent_id, _ in large:
+            cur.execute(
+                f"CREATE TABLE {partition_name(collection, agent_id)} PARTITION OF {new} FOR VALUES IN (%s)",
+                (agent_id,),
+            )
+        cur.execute(
+            f"INSERT INTO {new} (id, agent_id, vector, payload) "
+            f"SELECT id, COALESCE(payload->>'agent_id', ''), vector, payload FROM {collection}"
+        )
+        print(f"copied {cur.rowcount} rows")
+
+        # Keep the old table (and free its index names) under a new name
+        cur.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (collection,))
+        for (index_name,) in cur.fetchall():
+            cur.execute(f"ALTER INDEX {index_name} RENAME TO {index_name.replace(collection, collection + '_unpartitioned', 1)}")
+        cur.execute(f"ALTER TABLE {collection} RENAME TO {collection}_unpartitioned")
+        cur.execute(f"ALTER TABLE {new} RENAME TO {collection}")
+
+        # Indexes on the parent cascade to every partition
+        cur.execute(f"CREATE INDEX {collection}_id_idx ON {collection} (id)")
+        cur.execute(f"CREATE INDEX {collection}_run_idx ON {collection} ((payload->>'run_id'))")
+        cur.execute(f"SELECT COUNT(*) FROM {collection}")
+        sql = ann_index_sql(collection, dims, lists=ivfflat_lists(cur.fetchone()[0]))
+        if sql:
+            cur.execute(sql)
+    print(f"{collection} is now partitioned; old data kept in {collection}_unpartitioned")
+
+
+def cmd_add_partition(args) -> None:
+    """Move one scope out of the default partition into its own."""
+    conn, collection = connect()
+    table = partition_name(collection, args.agent_id)
+    with conn, conn.cursor() as cur:
+        default = default_partition(cur, collection)
+        cur.execute(f"LOCK TABLE {default} IN EXCLUSIVE MODE")
+        cur.execute(f"CREATE TABLE {table} (LIKE {collection} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cur.execute(
+            f"WITH moved AS (DELETE FROM {default} WHERE agent_id = %s RETURNING id, agent_id, vector, payload) "
+            f"INSERT INTO {table} (id, agent_id, vector, payload) SELECT id, agent_id, vector, payload FROM moved",
+            (args.agent_id,),
+        )
+        moved = cur.rowcount
+        # Attaching builds the partition's copies of the parent's indexes
+        cur.execute(f"ALTER TABLE {collection} ATTACH PARTITION {table} FOR VALUES IN (%s)", (args.agent_id,))
+    print(f"{args.agent_id}: {moved} rows moved to {table}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="layout, partitions, indexes and largest scopes")
+
+    commands.add_parser("indexes", help="build missing scope, full-text and ANN indexes")
+
+    reindex = commands.add_parser("reindex", help="rebuild the ANN index")
+    reindex.add_argument("--index", choices=["hnsw", "ivfflat"])
+    reindex.add_argument("--quantization", choices=list(MAX_INDEX_DIMS))
+    reindex.add_argument("--lists", type=int, help="ivfflat lists (default: derived from row count)")
+    reindex.add_argument("--keep-old", action="store_true", help="keep indexes of other quantizations")
+
+    resize = commands.add_parser("resize", help="change the stored embedding dimensions")
+    resize.add_argument("--dims", type=int, required=True)
+    resize.add_argument("--reembed", action="store_true", help="recompute vectors instead of truncating")
+    resize.add_argument("--batch", type=int, default=100, help="memories per embedding batch")
+
+    partition = commands.add_parser("partition", help="convert to the workspace-partitioned layout")
+    partition.add_argument("--min-rows", type=int, default=10000, help="rows for a scope to get its own partition")
+    partition.add_argument("--dry-run", action="store_true")
+
+    add_partition = commands.add_parser("add-partition", help="give one scope its own partition")
+    add_partition.add_argument("agent_id", help="scope, e.g. workspace_<id>")
+
+    args = parser.parse_args()
+    {
+        "status": cmd_status,
+        "indexes": cmd_indexes,
+        "reindex": cmd_reindex,
+        "resize": cmd_resize,
+        "partition": cmd_partition,
+        "add-partition": cmd_add_partition,
+    }[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1016 @@
+"""
+Postgres connection pool and prepared-statement vector store for mem0.
+
+mem0's pgvector provider builds its own psycopg2 `ThreadedConnectionPool`
+(1-5 connections) that raises as soon as it is exhausted, while our read,
+write and job threads can run more queries than that at once. Here the service
+owns the pool instead:
+
+- PgPool: sized to the worker threads; callers wait (bounded) for a free
+  connection instead of failing; idle connections are health-checked before
+  reuse; wait time and checkout counters are exposed for /health.
+- PreparedPGVector: mem0's PGVector with the hot paths (similarity search and
+  insert) running as server-side prepared statements, prepared once per
+  connection and then only EXECUTEd; ANN recall knobs applied per request;
+  partition pruning on the workspace-partitioned layout.
+- list_page: keyset (id-ordered) pages of a scope for /memories/all.
+- lexical_search: full-text leg of hybrid search (GIN index on memory text).
+- fetch_payloads / delete_ids / update_rows / delete_scope_batch: set-based
+  statements behind /memories/bulk and /memories/delete-all.
+- agent_ids_after / near_duplicates / archive_ids / restore_archived and the
+  compaction state table: the statements behind compaction.py.
+- ensure_indexes: scope filter and paging indexes plus a tunable HNSW or
+  IVFFlat index, optionally over halfvec / binary-quantized vectors (searches
+  then re-score a shortlist with the full-precision column); missing ones are
+  built concurrently by IndexBuilder after startup, existing ones cost a
+  catalog lookup.
+
+Only psycopg2 is supported (what requirements.txt installs); with psycopg3
+mem0 keeps managing its own pool.
+"""
+import json
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
+
+from mem0.memory.main import _normalize_iso_timestamp_to_utc
+from mem0.vector_stores.pgvector import PSYCOPG_VERSION, OutputData, PGVector
+
+from metrics import PG_POOL_TIMEOUTS, PG_POOL_WAIT_SECONDS
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# false: let mem0 build its own pool from the connection parameters
+PG_POOL_ENABLED = os.getenv("MEMORY_PG_POOL_ENABLED", "true").lower() == "true"
+PG_POOL_MIN = int(os.getenv("MEMORY_PG_POOL_MIN", "2"))
+# Default covers read + write pool workers and job workers
+PG_POOL_MAX = int(os.getenv("MEMORY_PG_POOL_MAX", "16"))
+# Seconds to wait for a free connection before failing the query
+PG_POOL_TIMEOUT = float(os.getenv("MEMORY_PG_POOL_TIMEOUT", "10"))
+# Connections idle longer than this are checked with SELECT 1 before reuse
+PG_POOL_HEALTHCHECK_IDLE = float(os.getenv("MEMORY_PG_POOL_HEALTHCHECK_IDLE", "30"))
+PG_PREPARED_STATEMENTS = os.getenv("MEMORY_PG_PREPARED_STATEMENTS", "true").lower() == "true"
+
+# ANN index on the collection: hnsw | ivfflat | none
+PG_ANN_INDEX = os.getenv("MEMORY_PG_ANN_INDEX", "hnsw").lower()
+PG_HNSW_M = int(os.getenv("MEMORY_PG_HNSW_M", "16"))
+PG_HNSW_EF_CONSTRUCTION = int(os.getenv("MEMORY_PG_HNSW_EF_CONSTRUCTION", "64"))
+# 0 = derive from the row count when the index is built
+PG_IVFFLAT_LISTS = int(os.getenv("MEMORY_PG_IVFFLAT_LISTS", "0"))
+IVFFLAT_MIN_ROWS = 1000
+# Default query-time recall knobs (0 = pgvector default: ef_search 40, probes 1);
+# overridable per /memories/search request
+PG_EF_SEARCH = int(os.getenv("MEMORY_PG_EF_SEARCH", "0"))
+PG_PROBES = int(os.getenv("MEMORY_PG_PROBES", "0"))
+# pgvector >= 0.8 iterative index scans for filtered queries: relaxed_order | strict_order
+PG_ITERATIVE_SCAN = os.getenv("MEMORY_PG_ITERATIVE_SCAN", "")
+if PG_ITERATIVE_SCAN not in ("", "off", "relaxed_order", "strict_order"):
+    raise ValueError(f"Invalid MEMORY_PG_ITERATIVE_SCAN: {PG_ITERATIVE_SCAN}")
+
+# What the ANN index stores: none (full vectors) | halfvec (half precision) |
+# binary (1 bit per dimension, Hamming distance). The table keeps the full
+# vectors, which re-score the MEMORY_PG_RERANK_FACTOR x limit candidates
+# returned by a quantized index.
+PG_QUANTIZATION = os.getenv("MEMORY_PG_QUANTIZATION", "none").lower()
+if PG_QUANTIZATION not in ("none", "halfvec", "binary"):
+    raise ValueError(f"Invalid MEMORY_PG_QUANTIZATION: {PG_QUANTIZATION}")
+PG_RERANK_FACTOR = int(os.getenv("MEMORY_PG_RERANK_FACTOR", "4"))
+# pgvector's dimension limits for HNSW / IVFFlat indexes, per stored type
+MAX_INDEX_DIMS = {"none": 2000, "halfvec": 4000, "binary": 64000}
+
+# GIN full-text index over memory text + original message, for hybrid search
+PG_TEXT_INDEX = os.getenv("MEMORY_PG_TEXT_INDEX", "true").lower() == "true"
+# 'simple': no stemming or stop words, so names, plates and dates stay whole tokens
+TEXT_DOCUMENT = (
+    "to_tsvector('simple', coalesce(payload->>'data', '') || ' ' || coalesce(payload->>'original_message', ''))"
+)
+
+# Payload keys are inlined into prepared SQL, so they must be plain identifiers
+FILTER_KEY_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+class PoolTimeout(TimeoutError):
+    """No connection became free within MEMORY_PG_POOL_TIMEOUT."""
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """psycopg2 connection remembering which statements it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: set[str] = set()
+        self.last_used = time.monotonic()
+
+
+# =============================================================================
+# Pool
+# =============================================================================
+
+class PgPool:
+    """
+    Blocking, health-checked wrapper around psycopg2's ThreadedConnectionPool.
+
+    Exposes the `getconn`/`putconn`/`closeall` interface mem0's PGVector uses.
+    `closeall` is a no-op because PGVector calls it from `__del__` and several
+    store objects share this pool; the service closes it with `close`.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        minconn: int = PG_POOL_MIN,
+        maxconn: int = PG_POOL_MAX,
+        timeout: float = PG_POOL_TIMEOUT,
+        healthcheck_idle: float = PG_POOL_HEALTHCHECK_IDLE,
+    ):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._pool = ThreadedConnectionPool(minconn, maxconn, dsn=dsn, connection_factory=PreparingConnection)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+        self.discarded = 0
+
+    @classmethod
+    def from_config(cls, config: dict) -> "PgPool":
+        """Build a pool from the pgvector section of the mem0 config."""
+        dsn = psycopg2.extensions.make_dsn(
+            host=config["host"],
+            port=config["port"],
+            user=config["user"],
+            password=config["password"],
+            dbname=config["dbname"],
+        )
+        return cls(dsn)
+
+    def _healthy(self, conn: PreparingConnection) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - conn.last_used < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self) -> PreparingConnection:
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            PG_POOL_TIMEOUTS.inc()
+            raise PoolTimeout(f"no Postgres connection free within {self.timeout:g}s ({self.maxconn} in use)")
+        waited = time.monotonic() - started
+        try:
+            conn = self._pool.getconn()
+            while not self._healthy(conn):
+                self._pool.putconn(conn, close=True)
+                with self._lock:
+                    self.discarded += 1
+                conn = self._pool.getconn()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if waited > 0.001:
+                self.waits += 1
+        PG_POOL_WAIT_SECONDS.observe(waited)
+        return conn
+
+    def putconn(self, conn: PreparingConnection, close: bool = False) -> None:
+        conn.last_used = time.monotonic()
+        # Connections left in a failed or unknown state are not reused
+        broken = conn.closed or conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+        try:
+            self._pool.putconn(conn, close=close or broken)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+                if close or broken:
+                    self.discarded += 1
+            self._slots.release()
+
+    def closeall(self) -> None:
+        # Called by PGVector.__del__; the pool outlives individual store objects
+        pass
+
+    def close(self) -> None:
+        self._pool.closeall()
+
+    def stats(self) -> dict:
+        return {
+            "maxconn": self.maxconn,
+            "in_use": self.in_use,
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "wait_ms_avg": round(self.wait_seconds_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            "timeouts": self.timeouts,
+            "discarded": self.discarded,
+        }
+
+
+# =============================================================================
+# Vector store
+# =============================================================================
+
+# Per-request ANN tuning ({"ef_search": int, "probes": int}); set by the search
+# endpoint and carried into executor threads with the request context
+search_tuning: ContextVar[Optional[dict]] = ContextVar("search_tuning", default=None)
+
+
+def _vector_literal(vector: list[float]) -> str:
+    return "[" + ",".join(map(str, vector)) + "]"
+
+
+class PreparedPGVector(PGVector):
+    """
+    PGVector with service-side query handling:
+
+    - search and insert run as per-connection prepared statements
+    - ANN search parameters (ef_search / probes) are applied per transaction
+    - on a workspace-partitioned collection (see pgvector_admin.py), the
+      agent_id column is written on insert and used for partition pruning
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.use_prepared = PG_PREPARED_STATEMENTS
+        self.partitioned = is_partitioned(self)
+
+    def _execute(self, cur, name: str, sql: str, params: tuple) -> None:
+        """Run `sql` (with {} placeholders) as a prepared statement or directly."""
+        if not self.use_prepared:
+            cur.execute(sql.format(*["%s"] * len(params)), params)
+            return
+        conn = cur.connection
+        if name not in conn.prepared:
+            cur.execute(f"PREPARE {name} AS " + sql.format(*[f"${i}" for i in range(1, len(params) + 1)]))
+            conn.prepared.add(name)
+        placeholders = ", ".join(["%s"] * len(params))
+        cur.execute(f"EXECUTE {name} ({placeholders})", params)
+
+    def _apply_tuning(self, cur, candidates: int = 0) -> None:
+        tuning = search_tuning.get() or {}
+        settings = []
+        if PG_ANN_INDEX == "hnsw":
+            ef_search = tuning.get("ef_search") or PG_EF_SEARCH
+            # An HNSW scan returns at most ef_search rows; keep the whole shortlist
+            if candidates > (ef_search or 40):
+                ef_search = candidates
+            if ef_search:
+                settings.append(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+            if PG_ITERATIVE_SCAN:
+                settings.append(f"SET LOCAL hnsw.iterative_scan = {PG_ITERATIVE_SCAN}")
+        elif PG_ANN_INDEX == "ivfflat":
+            probes = tuning.get("probes") or PG_PROBES
+            if probes:
+                settings.append(f"SET LOCAL ivfflat.probes = {int(probes)}")
+            if PG_ITERATIVE_SCAN:
+                settings.append(f"SET LOCAL ivfflat.iterative_scan = {PG_ITERATIVE_SCAN}")
+        if settings:
+            cur.execute("; ".join(settings))
+
+    def _conditions(self, keys: list[str]) -> list[str]:
+        # {} placeholders for filter values, in key order
+        return [
+            "agent_id = {}" if self.partitioned and key == "agent_id" else f"payload->>'{key}' = {{}}"
+            for key in keys
+        ]
+
+    def search(
+        self,
+        query: str,
+        vectors: list[float],
+        limit: Optional[int] = 5,
+        filters: Optional[dict] = None,
+    ) -> list[OutputData]:
+        keys = sorted(filters) if filters else []
+        if not all(FILTER_KEY_RE.match(key) for key in keys):
+            return super().search(query, vectors, limit, filters)
+
+        # One statement per (collection, filter key set); values stay parameters
+        conditions = self._conditions(keys)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        name = f"mem0_search_{self.collection_name}_{'_'.join(keys) or 'all'}"
+        vector = _vector_literal(vectors)
+        values = [str(filters[key]) for key in keys]
+        candidates = 0
+        if PG_QUANTIZATION == "none":
+            sql = (
+                f"SELECT id, vector <=> {{}}::vector AS distance, payload FROM {self.collection_name} "
+                f"{where} ORDER BY distance LIMIT {{}}"
+            )
+            params = (vector, *values, limit)
+        else:
+            # Shortlist by the quantized index, re-score with the full vectors
+            candidates = limit * PG_RERANK_FACTOR
+            sql = (
+                f"SELECT id, vector <=> {{}}::vector AS distance, payload FROM ("
+                f"SELECT id, vector, payload FROM {self.collection_name} {where} "
+                f"ORDER BY {quantized_distance(self.embedding_model_dims)} LIMIT {{}}"
+                ") AS shortlist ORDER BY distance LIMIT {}"
+            )
+            name += f"_{PG_QUANTIZATION}"
+            params = (vector, *values, vector, candidates, limit)
+
+        with self._get_cursor() as cur:
+            self._apply_tuning(cur, candidates)
+            self._execute(cur, name, sql, params)
+            results = cur.fetchall()
+        return [OutputData(id=str(r[0]), score=float(r[1]), payload=r[2]) for r in results]
+
+    def insert(self, vectors: list[list[float]], payloads=None, ids=None) -> None:
+        name = f"mem0_insert_{self.collection_name}"
+        if self.partitioned:
+            sql = (
+                f"INSERT INTO {self.collection_name} (id, agent_id, vector, payload) "
+                "VALUES ({}::uuid, {}, {}::vector, {}::jsonb)"
+            )
+        else:
+            sql = f"INSERT INTO {self.collection_name} (id, vector, payload) VALUES ({{}}::uuid, {{}}::vector, {{}}::jsonb)"
+        with self._get_cursor(commit=True) as cur:
+            for vector_id, vector, payload in zip(ids, vectors, payloads):
+                params = (vector_id, _vector_literal(vector), json.dumps(payload))
+                if self.partitioned:
+                    params = (vector_id, payload.get("agent_id") or "", *params[1:])
+                self._execute(cur, name, sql, params)
+
+    def list(self, filters: Optional[dict] = None, limit: Optional[int] = 100) -> list[list[OutputData]]:
+        keys = sorted(filters) if filters else []
+        if not self.partitioned or "agent_id" not in keys or not all(FILTER_KEY_RE.match(key) for key in keys):
+            return super().list(filters=filters, limit=limit)
+        where = " AND ".join(self._conditions(keys)).format(*["%s"] * len(keys))
+        with self._get_cursor() as cur:
+            cur.execute(
+                f"SELECT id, vector, payload FROM {self.collection_name} WHERE {where} LIMIT %s",
+                (*[str(filters[key]) for key in keys], limit),
+            )
+            results = cur.fetchall()
+        return [[OutputData(id=str(r[0]), score=None, payload=r[2]) for r in results]]
+
+
+# =============================================================================
+# Pagination and set-based writes
+# =============================================================================
+# Module functions rather than PreparedPGVector methods: they also work on
+# mem0's PGVector when the service pool is disabled.
+
+def scope_conditions(store: PGVector, filters: dict) -> tuple[list[str], list[Any]]:
+    """WHERE conditions (%s placeholders) and parameters for payload filters."""
+    keys = sorted(filters)
+    if not all(FILTER_KEY_RE.match(key) for key in keys):
+        raise ValueError(f"Invalid filter keys: {keys}")
+    partitioned = getattr(store, "partitioned", False)
+    conditions = [
+        "agent_id = %s" if partitioned and key == "agent_id" else f"payload->>'{key}' = %s"
+        for key in keys
+    ]
+    return conditions, [str(filters[key]) for key in keys]
+
+
+# Payload keys mem0's get_all lifts to the top level of each item
+PROMOTED_PAYLOAD_KEYS = ("user_id", "agent_id", "run_id", "actor_id", "role")
+CORE_PAYLOAD_KEYS = {"data", "hash", "created_at", "updated_at", "id", *PROMOTED_PAYLOAD_KEYS}
+
+
+def format_memory(row: Any) -> dict:
+    """A vector store row in the same shape as mem0's get_all items."""
+    payload = row.payload or {}
+    item = {
+        "id": row.id,
+        "memory": payload.get("data", ""),
+        "hash": payload.get("hash"),
+        "metadata": None,
+        "created_at": _normalize_iso_timestamp_to_utc(payload.get("created_at")),
+        "updated_at": _normalize_iso_timestamp_to_utc(payload.get("updated_at")),
+    }
+    for key in PROMOTED_PAYLOAD_KEYS:
+        if key in payload:
+            item[key] = payload[key]
+    metadata = {k: v for k, v in payload.items() if k not in CORE_PAYLOAD_KEYS}
+    if metadata:
+        item["metadata"] = metadata
+    return item
+
+
+def list_page(store: PGVector, filters: dict, after: Optional[str], limit: int) -> list[OutputData]:
+    """
+    One keyset page of a scope: rows with id > `after`, ordered by id.
+
+    Unlike mem0's `list`, vectors are not fetched and there is no OFFSET, so
+    each page costs the same however deep into the scope it is.
+    """
+    conditions, params = scope_conditions(store, filters)
+    if after:
+        conditions.append("id > %s::uuid")
+        params.append(after)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    with store._get_cursor() as cur:
+        cur.execute(
+            f"SELECT id, payload FROM {store.collection_name} {where} ORDER BY id LIMIT %s",
+            (*params, limit),
+        )
+        rows = cur.fetchall()
+    return [OutputData(id=str(r[0]), score=None, payload=r[1]) for r in rows]
+
+
+def recent_page(store: PGVector, filters: dict, limit: int) -> list[OutputData]:
+    """Newest memories of a scope by created_at (mem0 writes mixed UTC offsets, hence the cast)."""
+    conditions, params = scope_conditions(store, filters)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    with store._get_cursor() as cur:
+        cur.execute(
+            f"SELECT id, payload FROM {store.collection_name} {where} "
+            "ORDER BY (payload->>'created_at')::timestamptz DESC NULLS LAST LIMIT %s",
+            (*params, limit),
+        )
+        rows = cur.fetchall()
+    return [OutputData(id=str(r[0]), score=None, payload=r[1]) for r in rows]
+
+
+def lexical_search(
+    store: PGVector, filters: dict, query: str, limit: int, stopwords: list[str]
+) -> list[OutputData]:
+    """
+    Full-text search within a scope: rows containing any significant word of
+    `query` (not in `stopwords`, 2+ characters), best ts_rank_cd first.
+    """
+    conditions, params = scope_conditions(store, filters)
+    where = " AND ".join(conditions + [f"{TEXT_DOCUMENT} @@ q.query"])
+    with store._get_cursor() as cur:
+        cur.execute(
+            f"SELECT id, ts_rank_cd({TEXT_DOCUMENT}, q.query) AS rank, payload FROM {store.collection_name}, ("
+            "SELECT websearch_to_tsquery('simple', string_agg(lexeme, ' or ')) AS query "
+            "FROM unnest(tsvector_to_array(to_tsvector('simple', %s))) AS lexeme "
+            "WHERE length(lexeme) > 1 AND lexeme <> ALL(%s)"
+            f") AS q WHERE {where} ORDER BY rank DESC LIMIT %s",
+            (query, stopwords, *params, limit),
+        )
+        rows = cur.fetchall()
+    return [OutputData(id=str(r[0]), score=float(r[1]), payload=r[2]) for r in rows]
+
+
+def fetch_payloads(store: PGVector, ids: list[str]) -> dict[str, dict]:
+    """Payloads of the given memories that exist, by id."""
+    with store._get_cursor() as cur:
+        cur.execute(f"SELECT id, payload FROM {store.collection_name} WHERE id = ANY(%s::uuid[])", (ids,))
+        return {str(r[0]): r[1] for r in cur.fetchall()}
+
+
+def delete_ids(store: PGVector, ids: list[str]) -> dict[str, dict]:
+    """Delete memories in one statement; returns the deleted payloads by id."""
+    with store._get_cursor(commit=True) as cur:
+        cur.execute(
+            f"DELETE FROM {store.collection_name} WHERE id = ANY(%s::uuid[]) RETURNING id, payload",
+            (ids,),
+        )
+        return {str(r[0]): r[1] for r in cur.fetchall()}
+
+
+def update_rows(store: PGVector, rows: list[tuple[str, list[float], dict]]) -> None:
+    """Replace vector and payload of many memories in one statement."""
+    with store._get_cursor(commit=True) as cur:
+        cur.execute(
+            f"UPDATE {store.collection_name} AS m SET vector = v.vector::vector, payload = v.payload::jsonb "
+            "FROM unnest(%s::uuid[], %s::text[], %s::text[]) AS v(id, vector, payload) WHERE m.id = v.id",
+            (
+                [row[0] for row in rows],
+                [_vector_literal(row[1]) for row in rows],
+                [json.dumps(row[2]) for row in rows],
+            ),
+        )
+
+
+def delete_scope_batch(store: PGVector, filters: dict, limit: int) -> dict[str, dict]:
+    """Delete up to `limit` memories of a scope; returns their payloads by id."""
+    conditions, params = scope_conditions(store, filters)
+    where = " AND ".join(conditions)
+    collection = store.collection_name
+    with store._get_cursor(commit=True) as cur:
+        cur.execute(
+            # Outer filter repeated so a partitioned collection prunes both scans
+            f"DELETE FROM {collection} WHERE {where} AND id IN (SELECT id FROM {collection} WHERE {where} LIMIT %s) "
+            "RETURNING id, payload",
+            (*params, *params, limit),
+        )
+        return {str(r[0]): r[1] for r in cur.fetchall()}
+
+
+# =============================================================================
+# Compaction
+# =============================================================================
+# Archived memories keep their vector and payload in <collection>_archive, so
+# compaction can be undone; <collection>_compaction records how far each
+# agent_id has been compacted.
+
+def ensure_compaction_tables(store: PGVector) -> None:
+    collection = store.collection_name
+    with store._get_cursor(commit=True) as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"{collection}_compaction",))
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {collection}_archive ("
+            "id uuid PRIMARY KEY, vector vector, payload jsonb, reason text NOT NULL, "
+            "archived_at timestamptz NOT NULL DEFAULT now())"
+        )
+        cur.execute(
+            f"CREATE INDEX IF NOT EXISTS {collection}_archive_scope_idx "
+            f"ON {collection}_archive ((payload->>'agent_id'), (payload->>'run_id'))"
+        )
+        cur.execute(
+            f"CREATE TABLE IF NOT EXISTS {collection}_compaction ("
+            "agent_id text PRIMARY KEY, after_id uuid, pass_started_at timestamptz, checked_until timestamptz, "
+            "updated_at timestamptz NOT NULL DEFAULT now())"
+        )
+
+
+def agent_ids_after(store: PGVector, after: Optional[str], limit: int) -> list[str]:
+    """
+    Distinct agent_ids greater than `after`, in order. A skip scan over the
+    paging index (or primary key when partitioned): one index probe per
+    agent_id instead of reading every row.
+    """
+    column = "agent_id" if getattr(store, "partitioned", False) else "(payload->>'agent_id')"
+    collection = store.collection_name
+    with store._get_cursor() as cur:
+        cur.execute(
+            "WITH RECURSIVE agents(agent_id) AS ("
+            f"(SELECT {column} FROM {collection} WHERE {column} > %s ORDER BY 1 LIMIT 1) "
+            f"UNION ALL SELECT (SELECT {column} FROM {collection} WHERE {column} > agents.agent_id ORDER BY 1 LIMIT 1) "
+            "FROM agents WHERE agents.agent_id IS NOT NULL"
+            ") SELECT agent_id FROM agents WHERE agent_id IS NOT NULL LIMIT %s",
+            (after or "", limit),
+        )
+        return [r[0] for r in cur.fetchall()]
+
+
+def near_duplicates(
+    store: PGVector, agent_id: str, ids: list[str], max_distance: float, neighbors: int
+) -> list[tuple[str, str, float, dict]]:
+    """
+    (id, neighbor id, cosine distance, neighbor payload) for the `neighbors`
+    nearest memories of each of `ids` in the same agent_id/run_id scope, kept
+    when within `max_distance`. One ANN probe per id; with a quantized index
+    the full vectors are compared within the scope instead.
+    """
+    conditions, params = scope_conditions(store, {"agent_id": agent_id})
+    # Unqualified columns in the lateral subquery refer to its own rows (m)
+    same_run = "m.payload->>'run_id' IS NOT DISTINCT FROM c.payload->>'run_id'"
+    where = " AND ".join(conditions + [same_run, "m.id <> c.id"])
+    source = "c.agent_id = %s" if getattr(store, "partitioned", False) else "c.payload->>'agent_id' = %s"
+    collection = store.collection_name
+    with store._get_cursor() as cur:
+        cur.execute(
+            f"SELECT c.id, n.id, n.distance, n.payload FROM {collection} AS c CROSS JOIN LATERAL ("
+            f"SELECT m.id, m.payload, m.vector <=> c.vector AS distance FROM {collection} AS m "
+            f"WHERE {where} ORDER BY m.vector <=> c.vector LIMIT %s"
+            f") AS n WHERE {source} AND c.id = ANY(%s::uuid[]) AND n.distance <= %s",
+            (*params, neighbors, agent_id, ids, max_distance),
+        )
+        return [(str(r[0]), str(r[1]), float(r[2]), r[3]) for r in cur.fetchall()]
+
+
+def archive_ids(store: PGVector, ids: list[str], reason: str) -> dict[str, dict]:
+    """Move memories to the archive table in one statement; returns the moved payloads by id."""
+    collection = store.collection_name
+    with store._get_cursor(commit=True) as cur:
+        cur.execute(
+            f"WITH moved AS (DELETE FROM {collection} WHERE id = ANY(%s::uuid[]) RETURNING id, vector, payload) "
+            f"INSERT INTO {collection}_archive (id, vector, payload, reason) SELECT id, vector, payload, %s FROM moved "
+            "ON CONFLICT (id) DO UPDATE SET vector = excluded.vector, payload = excluded.payload, "
+            "reason = excluded.reason, archived_at = now() "
+            "RETURNING id, payload",
+            (ids, reason),
+        )
+        return {str(r[0]): r[1] for r in cur.fetchall()}
+
+
+def restore_archived(store: PGVector, filters: dict, reason: Optional[str] = None) -> int:
+    """Move archived memories of a scope (optionally of one reason) back; returns how many."""
+    keys = sorted(filters)
+    if not all(FILTER_KEY_RE.match(key) for key in keys):
+        raise ValueError(f"Invalid filter keys: {keys}")
+    conditions = [f"payload->>'{key}' = %s" for key in keys]
+    params: list[Any] = [str(filters[key]) for key in keys]
+    if reason:
+        conditions.append("reason = %s")
+        params.append(reason)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+    collection = store.collection_name
+    if getattr(store, "partitioned", False):
+        columns, values = "id, agent_id, vector, payload", "id, coalesce(payload->>'agent_id', ''), vector, payload"
+    else:
+        columns, values = "id, vector, payload", "id, vector, payload"
+    with store._get_cursor(commit=True) as cur:
+        cur.execute(
+            f"WITH restored AS (DELETE FROM {collection}_archive {where} RETURNING id, vector, payload) "
+            f"INSERT INTO {collection} ({columns}) SELECT {values} FROM restored ON CONFLICT DO NOTHING",
+            params,
+        )
+        return cur.rowcount
+
+
+def compaction_position(store: PGVector) -> Optional[dict]:
+    """State of the agent_id compacted most recently, or None before the first run."""
+    with store._get_cursor() as cur:
+        cur.execute(
+            "SELECT agent_id, after_id, pass_started_at, checked_until "
+            f"FROM {store.collection_name}_compaction ORDER BY updated_at DESC LIMIT 1"
+        )
+        row = cur.fetchone()
+    return _compaction_state(row) if row else None
+
+
+def load_compaction_state(store: PGVector, agent_id: str) -> Optional[dict]:
+    with store._get_cursor() as cur:
+        cur.execute(
+            "SELECT agent_id, after_id, pass_started_at, checked_until "
+            f"FROM {store.collection_name}_compaction WHERE agent_id = %s",
+            (agent_id,),
+        )
+        row = cur.fetchone()
+    return _compaction_state(row) if row else None
+
+
+def save_compaction_state(store: PGVector, state: dict) -> None:
+    with store._get_cursor(commit=True) as cur:
+        cur.execute(
+            f"INSERT INTO {store.collection_name}_compaction "
+            "(agent_id, after_id, pass_started_at, checked_until, updated_at) VALUES (%s, %s, %s, %s, now()) "
+            "ON CONFLICT (agent_id) DO UPDATE SET after_id = excluded.after_id, "
+            "pass_started_at = excluded.pass_started_at, checked_until = excluded.checked_until, updated_at = now()",
+            (state["agent_id"], state["after_id"], state["pass_started_at"], state["checked_until"]),
+        )
+
+
+def _compaction_state(row: tuple) -> dict:
+    return {
+        "agent_id": row[0],
+        "after_id": str(row[1]) if row[1] else None,
+        "pass_started_at": row[2],
+        "checked_until": row[3],
+    }
+
+
+# =============================================================================
+# Layout and indexes
+# =============================================================================
+
+def is_partitioned(store: PGVector) -> bool:
+    """Whether the collection is the workspace-partitioned layout."""
+    with store._get_cursor() as cur:
+        cur.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = %s",
+            (store.collection_name,),
+        )
+        return cur.fetchone() is not None
+
+
+def indexed_expression(dims: int, quantization: Optional[str] = None) -> tuple[str, str]:
+    """(indexed expression, operator class) of the ANN index for a quantization."""
+    quantization = quantization or PG_QUANTIZATION
+    if quantization == "halfvec":
+        return f"(vector::halfvec({dims}))", "halfvec_cosine_ops"
+    if quantization == "binary":
+        return f"(binary_quantize(vector)::bit({dims}))", "bit_hamming_ops"
+    return "vector", "vector_cosine_ops"
+
+
+def quantized_distance(dims: int, quantization: Optional[str] = None) -> str:
+    """ORDER BY expression (query vector as a {} placeholder) that uses the quantized index."""
+    quantization = quantization or PG_QUANTIZATION
+    if quantization == "halfvec":
+        return f"vector::halfvec({dims}) <=> {{}}::halfvec({dims})"
+    if quantization == "binary":
+        return f"binary_quantize(vector)::bit({dims}) <~> binary_quantize({{}}::vector)"
+    return "vector <=> {}::vector"
+
+
+def ann_index_name(collection: str, index: Optional[str] = None, quantization: Optional[str] = None) -> str:
+    index = index or PG_ANN_INDEX
+    quantization = quantization or PG_QUANTIZATION
+    return f"{collection}_{index}_idx" if quantization == "none" else f"{collection}_{index}_{quantization}_idx"
+
+
+def ann_index_names(collection: str) -> list[str]:
+    """Every ANN index name the service or pgvector_admin.py may have created."""
+    return [
+        ann_index_name(collection, index, quantization)
+        for index in ("hnsw", "ivfflat")
+        for quantization in MAX_INDEX_DIMS
+    ]
+
+
+def ann_index_sql(
+    collection: str,
+    dims: int,
+    index: Optional[str] = None,
+    quantization: Optional[str] = None,
+    lists: Optional[int] = None,
+    concurrently: bool = False,
+    suffix: str = "",
+) -> Optional[str]:
+    """CREATE INDEX statement for the configured ANN index (None for `none`)."""
+    index = index or PG_ANN_INDEX
+    quantization = quantization or PG_QUANTIZATION
+    how = "CONCURRENTLY " if concurrently else ""
+    name = ann_index_name(collection, index, quantization) + suffix
+    expression, opclass = indexed_expression(dims, quantization)
+    if index == "hnsw":
+        return (
+            f"CREATE INDEX {how}IF NOT EXISTS {name} ON {collection} USING hnsw ({expression} {opclass}) "
+            f"WITH (m = {PG_HNSW_M}, ef_construction = {PG_HNSW_EF_CONSTRUCTION})"
+        )
+    if index == "ivfflat":
+        return (
+            f"CREATE INDEX {how}IF NOT EXISTS {name} ON {collection} USING ivfflat ({expression} {opclass}) "
+            f"WITH (lists = {lists or PG_IVFFLAT_LISTS})"
+        )
+    return None
+
+
+def ivfflat_lists(rows: int) -> int:
+    """pgvector's guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond."""
+    return max(10, rows // 1000 if rows <= 1_000_000 else int(math.sqrt(rows)))
+
+
+def column_dims(store: PGVector) -> Optional[int]:
+    """Declared dimensions of the collection's vector column (None if there is no table yet)."""
+    with store._get_cursor() as cur:
+        cur.execute(
+            "SELECT atttypmod FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = 'vector'",
+            (store.collection_name,),
+        )
+        row = cur.fetchone()
+    return row[0] if row else None
+
+
+@contextmanager
+def autocommit_cursor(store: PGVector):
+    """Cursor on a pooled connection outside a transaction block (for CREATE INDEX CONCURRENTLY)."""
+    if PSYCOPG_VERSION == 3:
+        with store.connection_pool.connection() as conn:
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cur:
+                    yield cur
+            finally:
+                conn.autocommit = False
+        return
+    conn = store.connection_pool.getconn()
+    try:
+        # mem0's read-only cursors return connections with their transaction open
+        conn.rollback()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            yield cur
+    finally:
+        conn.autocommit = False
+        store.connection_pool.putconn(conn)
+
+
+def scope_index_sql(collection: str, partitioned: bool, concurrently: bool = False) -> dict[str, str]:
+    """CREATE INDEX statements of the scope filter/paging and full-text indexes, by index name."""
+    how = "CONCURRENTLY " if concurrently else ""
+    if partitioned:
+        statements = {
+            f"{collection}_run_idx": (
+                f"CREATE INDEX {how}IF NOT EXISTS {collection}_run_idx ON {collection} ((payload->>'run_id'))"
+            ),
+        }
+    else:
+        statements = {
+            f"{collection}_scope_idx": (
+                f"CREATE INDEX {how}IF NOT EXISTS {collection}_scope_idx "
+                f"ON {collection} ((payload->>'agent_id'), (payload->>'run_id'))"
+            ),
+            # Keyset pages (list_page) walk a scope in id order; the partitioned
+            # layout gets this from its (agent_id, id) primary key
+            f"{collection}_page_idx": (
+                f"CREATE INDEX {how}IF NOT EXISTS {collection}_page_idx ON {collection} ((payload->>'agent_id'), id)"
+            ),
+        }
+    if PG_TEXT_INDEX:
+        statements[f"{collection}_text_idx"] = (
+            f"CREATE INDEX {how}IF NOT EXISTS {collection}_text_idx ON {collection} USING gin ({TEXT_DOCUMENT})"
+        )
+    return statements
+
+
+def missing_indexes(cur, collection: str, partitioned: bool, dims: int, concurrently: bool = False) -> dict[str, str]:
+    """
+    CREATE INDEX statements of the wanted indexes the collection lacks, by name.
+
+    An index left invalid by an interrupted concurrent build counts as missing.
+    Only reads the catalog (and counts rows when an IVFFlat index is due).
+    """
+    cur.execute(
+        "SELECT c.relname, i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = to_regclass(%s)",
+        (collection,),
+    )
+    valid = {name for name, is_valid in cur.fetchall() if is_valid}
+    missing = {
+        name: sql for name, sql in scope_index_sql(collection, partitioned, concurrently).items() if name not in valid
+    }
+    if PG_ANN_INDEX == "none" or ann_index_name(collection) in valid:
+        return missing
+    if dims > MAX_INDEX_DIMS[PG_QUANTIZATION]:
+        print(
+            f"[Memory Service] Skipping {PG_ANN_INDEX} index: {dims} dimensions exceed "
+            f"{MAX_INDEX_DIMS[PG_QUANTIZATION]} for MEMORY_PG_QUANTIZATION={PG_QUANTIZATION}"
+        )
+        return missing
+    lists = None
+    if PG_ANN_INDEX == "ivfflat" and not PG_IVFFLAT_LISTS:
+        cur.execute(f"SELECT COUNT(*) FROM {collection}")
+        rows = cur.fetchone()[0]
+        if rows < IVFFLAT_MIN_ROWS:
+            # IVFFlat centroids are trained on existing rows; build once there is data
+            print(f"[Memory Service] Skipping ivfflat index: {rows} rows < {IVFFLAT_MIN_ROWS}")
+            return missing
+        lists = ivfflat_lists(rows)
+    missing[ann_index_name(collection)] = ann_index_sql(collection, dims, lists=lists, concurrently=concurrently)
+    return missing
+
+
+def build_indexes(cur, statements: dict[str, str], concurrently: bool = False) -> None:
+    """Run missing_indexes' statements (the cursor must be in autocommit mode to build concurrently)."""
+    how = "CONCURRENTLY " if concurrently else ""
+    for name, sql in statements.items():
+        # Leftover of an interrupted concurrent build, which IF NOT EXISTS would keep
+        cur.execute(f"DROP INDEX {how}IF EXISTS {name}")
+        started = time.monotonic()
+        cur.execute(sql)
+        print(f"[Memory Service] Built index {name} in {time.monotonic() - started:.1f}s")
+
+
+def ensure_indexes(store: PGVector, on_cursor: Optional[Callable[[Any], None]] = None) -> list[str]:
+    """
+    Create the scope filter/paging, full-text and configured ANN indexes if missing.
+
+    Every worker runs this once ready (IndexBuilder), so when the indexes exist
+    it only reads the catalog. Missing ones are built with CREATE INDEX
+    CONCURRENTLY outside a transaction, so the table stays readable and
+    writable meanwhile; the worker holding the advisory lock builds them and the
+    others go on without them. `on_cursor` receives the building cursor (so
+    a shutdown can cancel the build). Returns the indexes left missing.
+    The partitioned layout cannot build concurrently: there the service only
+    warns, and `python pgvector_admin.py indexes` builds them. Existing indexes
+    are left as they are; rebuild them with `python pgvector_admin.py reindex`.
+    """
+    collection = store.collection_name
+    partitioned = getattr(store, "partitioned", False)
+    dims = store.embedding_model_dims
+    with autocommit_cursor(store) as cur:
+        if on_cursor is not None:
+            on_cursor(cur)
+        missing = missing_indexes(cur, collection, partitioned, dims, concurrently=not partitioned)
+        if not missing:
+            return []
+        if partitioned:
+            print(
+                f"[Memory Service] WARNING: {collection} is missing indexes {', '.join(missing)}; "
+                f"run `python pgvector_admin.py indexes`"
+            )
+            return list(missing)
+        lock_key = f"{collection}_indexes"
+        cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (lock_key,))
+        if not cur.fetchone()[0]:
+            print(f"[Memory Service] Another worker is building {', '.join(missing)}")
+            return list(missing)
+        try:
+            # Re-read under the lock: the previous holder may have built them
+            missing = missing_indexes(cur, collection, partitioned, dims, concurrently=True)
+            build_indexes(cur, missing, concurrently=True)
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (lock_key,))
+    return []
+
+
+class IndexBuilder:
+    """
+    Runs ensure_indexes in a background thread once the service is ready, so a
+    long ANN build never holds back readiness (searches use the scope index
+    until it exists). Shutdown cancels a running build; the invalid index it
+    leaves is dropped and rebuilt by the next start.
+    """
+
+    def __init__(self, store: PGVector):
+        self.store = store
+        self.state = "pending"
+        self.missing: list[str] = []
+        self.error: Optional[str] = None
+        self.seconds: Optional[float] = None
+        self._cursor: Any = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="mem0-indexes", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        self.state = "running"
+        started = time.monotonic()
+        try:
+            self.missing = ensure_indexes(self.store, on_cursor=self._track)
+            # Left to another worker or to pgvector_admin.py (partitioned layout)
+            self.state = "incomplete" if self.missing else "done"
+        except Exception as e:
+            self.state = "failed"
+            self.error = f"{type(e).__name__}: {str(e).strip()}"
+            print(f"[Memory Service] Index build failed: {self.error}")
+        finally:
+            self._cursor = None
+            self.seconds = round(time.monotonic() - started, 3)
+
+    def _track(self, cursor: Any) -> None:
+        self._cursor = cursor
+
+    def shutdown(self) -> None:
+        """Cancel a running build and wait briefly for the thread."""
+        cursor = self._cursor
+        if cursor is not None:
+            try:
+                cursor.connection.cancel()
+            except Exception as e:
+                print(f"[Memory Service] Could not cancel index build: {e}")
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> dict:
+        return {"state": self.state, "missing": self.missing, "error": self.error, "seconds": self.seconds}
+
+
+def attach_pool(vector_store_config: dict) -> Optional[PgPool]:
+    """
+    Create the service-owned pool and inject it into a pgvector config (in place).
+
+    Returns None (mem0 keeps its own pool) when disabled or with psycopg3.
+    """
+    if not PG_POOL_ENABLED:
+        return None
+    if PSYCOPG_VERSION != 2:
+        print("[Memory Service] psycopg3 detected; using mem0's connection pool")
+        return None
+    pool = PgPool.from_config(vector_store_config)
+    vector_store_config["connection_pool"] = pool
+    return pool
+
+
+def service_store(store: Any) -> Any:
+    """
+    Re-create mem0's PGVector store as a PreparedPGVector sharing its pool and
+    check the collection's layout; IndexBuilder creates missing indexes later.
+    """
+    if not isinstance(store, PGVector):
+        return store
+    if isinstance(store.connection_pool, PgPool):
+        store = PreparedPGVector(
+            dbname=None,
+            collection_name=store.collection_name,
+            embedding_model_dims=store.embedding_model_dims,
+            user=None,
+            password=None,
+            host=None,
+            port=None,
+            diskann=store.use_diskann,
+            hnsw=store.use_hnsw,
+            connection_pool=store.connection_pool,
+        )
+    elif is_partitioned(store):
+        raise RuntimeError("Partitioned memories collection requires MEMORY_PG_POOL_ENABLED=true with psycopg2")
+    elif PG_QUANTIZATION != "none":
+        print("[Memory Service] mem0's pgvector search ignores MEMORY_PG_QUANTIZATION; searches scan full vectors")
+    dims = column_dims(store)
+    if dims is not None and dims != store.embedding_model_dims:
+        raise RuntimeError(
+            f"{store.collection_name}.vector has {dims} dimensions but MEMORY_EMBEDDING_DIMS is "
+            f"{store.embedding_model_dims}; run `python pgvector_admin.py resize --dims {store.embedding_model_dims}`"
+        )
+    return store
@@ -0,0 +1,187 @@
+"""
+Pre-LLM filter for /memories/add.
+
+Most group-chat traffic is greetings, acknowledgements, weather chatter and
+casual idioms ("mai mốt đi ăn nghe"), for which the extraction prompt returns
+{"facts": []} anyway. This module recognizes those messages with local rules
+so they never reach Gemini.
+
+Rules are deliberately conservative: anything with digits, links, emails or
+@mentions always goes to the LLM. Modes (MEMORY_PREFILTER_MODE):
+
+- shadow (default): only classify; the message is still ingested and the
+  result is used to count misses (filtered messages that did produce memories)
+- enforce: skip the LLM for filtered messages
+- off: disabled
+"""
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Optional
+
+from dates import IDIOM_RE, TIME_INDICATORS
+from metrics import PREFILTER_SHADOW_MISSED, PREFILTER_SHADOW_OBSERVED, PREFILTER_SKIPPED
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Shadow by default: enforce once shadow_miss_rate in /health looks acceptable, since
+# a filtered message that held a fact is lost without a trace
+PREFILTER_MODES = ("shadow", "enforce", "off")
+PREFILTER_MODE = os.getenv("MEMORY_PREFILTER_MODE", "shadow").lower()
+if PREFILTER_MODE not in PREFILTER_MODES:
+    raise ValueError(f"MEMORY_PREFILTER_MODE must be one of {PREFILTER_MODES}, got {PREFILTER_MODE!r}")
+# Longer messages are never filtered
+PREFILTER_MAX_WORDS = int(os.getenv("MEMORY_PREFILTER_MAX_WORDS", "12"))
+
+
+# =============================================================================
+# Rules
+# =============================================================================
+
+# Greetings, acknowledgements, politeness particles and forms of address
+FILLER_WORDS = {
+    "hi", "hello", "hey", "alo", "chào", "xin", "ok", "oke", "okay", "okie", "okela",
+    "ừ", "ừm", "ờ", "uh", "uhm", "um", "dạ", "vâng", "à", "ạ", "nhé", "nhe", "nha", "nhá", "nghen",
+    "cảm", "cám", "ơn", "thanks", "thank", "thx", "tks", "you", "bạn", "mọi", "người",
+    "anh", "chị", "em", "sếp", "ad", "bot", "cả", "nhà", "team",
+    "yes", "yeah", "yep", "sure", "cool", "nice", "good", "great", "được", "đc", "rồi", "nhiều",
+    "buổi", "sáng", "chiều", "tối", "tốt", "lành", "ngủ", "ngon", "tạm", "biệt", "bye", "gn",
+    "lol", "wow", "ồ", "ô", "quá", "ghê", "thế", "vậy", "luôn", "thật", "hôm", "nay",
+}
+
+# Laughter and elongated acknowledgements: "hahaha", "kkk", "okkk", "ừừ"
+FILLER_TOKEN_RE = re.compile(r'^(?:(?:ha|he|hi|hô|kk?|k)+|o+k+e*|ừ+|ờ+|dạ+|hmm+)$')
+
+WEATHER_RE = re.compile(
+    r'\b(?:trời|thời tiết)\s+(?:(?:hôm nay|nay|sáng nay|chiều nay|tối nay)\s+)?'
+    r'(?:đẹp|mưa|nắng|nóng|lạnh|oi|mát|âm u|gió)'
+    r'|\b(?:nóng|lạnh|mưa|nắng|oi)\s+(?:quá|ghê|thế|vậy)\b'
+)
+
+# Words that only describe the casual activity in an idiom ("mai mốt đi ăn nghe")
+IDIOM_ACTIVITY_WORDS = {
+    "đi", "ăn", "uống", "cafe", "cà", "phê", "cf", "gặp", "chơi", "nhậu", "mình", "tụi", "bọn",
+    "nhau", "lại", "nói", "chuyện", "tính", "sau", "rảnh", "nghe", "nhé", "nha", "nhe", "hen", "ha",
+}
+
+# Never filter messages carrying concrete data
+KEEP_RE = re.compile(r'\d|@|https?://|www\.', re.IGNORECASE)
+TIME_RE = re.compile(TIME_INDICATORS, re.IGNORECASE)
+# "[Sender]: " prefixes of context-formatted messages
+SENDER_PREFIX_RE = re.compile(r'^\s*\[[^\]]*\]:\s*')
+NON_WORD_RE = re.compile(r'[^\w\s]')
+
+
+def _is_filler(token: str) -> bool:
+    return token in FILLER_WORDS or bool(FILLER_TOKEN_RE.match(token))
+
+
+def _classify_line(line: str) -> Optional[str]:
+    words = NON_WORD_RE.sub(" ", line).split()
+    if not words:
+        return "empty"
+    if len(words) > PREFILTER_MAX_WORDS:
+        return None
+    if all(_is_filler(word) for word in words):
+        return "greeting"
+
+    cleaned = " ".join(words)
+    if WEATHER_RE.search(cleaned):
+        rest = WEATHER_RE.sub(" ", cleaned).split()
+        if all(_is_filler(word) for word in rest):
+            return "chatter"
+    if IDIOM_RE.search(cleaned) and not TIME_RE.search(line):
+        rest = IDIOM_RE.sub(" ", cleaned).split()
+        if all(_is_filler(word) or word in IDIOM_ACTIVITY_WORDS for word in rest):
+            return "idiom"
+    return None
+
+
+def classify(message: str) -> Optional[str]:
+    """
+    Reason a message carries nothing worth extracting, or None to keep it.
+
+    Multi-line (context-formatted) messages are filtered only when every line is.
+    """
+    text = unicodedata.normalize("NFC", message).lower()
+    if KEEP_RE.search(text):
+        return None
+    reasons = set()
+    for line in text.splitlines():
+        reason = _classify_line(SENDER_PREFIX_RE.sub("", line))
+        if reason is None:
+            return None
+        reasons.add(reason)
+    reasons.discard("empty")
+    return min(reasons) if reasons else "empty"
+
+
+# =============================================================================
+# Filter with counters
+# =============================================================================
+
+class Prefilter:
+    """Mode-aware wrapper around `classify` with savings and shadow counters."""
+
+    def __init__(self, mode: str = PREFILTER_MODE):
+        if mode not in PREFILTER_MODES:
+            raise ValueError(f"prefilter mode must be one of {PREFILTER_MODES}, got {mode!r}")
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.skipped = 0
+        self.reasons: dict[str, int] = {}
+        self.shadow_observed = 0
+        self.shadow_missed = 0
+
+    @property
+    def enforcing(self) -> bool:
+        return self.mode == "enforce"
+
+    def check(self, message: str) -> Optional[str]:
+        """Classify a message; in enforce mode a non-None reason means skip the LLM."""
+        if self.mode == "off":
+            return None
+        reason = classify(message)
+        with self._lock:
+            self.checked += 1
+            if reason is not None:
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+                if self.enforcing:
+                    self.skipped += 1
+        if reason is not None and self.enforcing:
+            PREFILTER_SKIPPED.labels(reason).inc()
+        return reason
+
+    def observe(self, reason: Optional[str], result: Any) -> None:
+        """Shadow mode: compare a filter verdict with the real `memory.add` result."""
+        if self.mode != "shadow" or reason is None:
+            return
+        results = result.get("results", []) if isinstance(result, dict) else result
+        with self._lock:
+            self.shadow_observed += 1
+            if results:
+                self.shadow_missed += 1
+        PREFILTER_SHADOW_OBSERVED.labels(reason).inc()
+        if results:
+            PREFILTER_SHADOW_MISSED.labels(reason).inc()
+            print(f"[Memory Service] Prefilter miss ({reason}): {len(results)} memory changes")
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "checked": self.checked,
+            "llm_calls_saved": self.skipped,
+            "filtered": sum(self.reasons.values()),
+            "reasons": dict(self.reasons),
+            "shadow_observed": self.shadow_observed,
+            "shadow_missed": self.shadow_missed,
+            "shadow_miss_rate": round(self.shadow_missed / self.shadow_observed, 4) if self.shadow_observed else 0.0,
+        }
+
+
+prefilter = Prefilter()
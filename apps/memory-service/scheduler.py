@@ -0,0 +1,291 @@
+"""
+Per-tenant fair scheduling for the read/write pools.
+
+A tenant is the agent_id of a call: `workspace_{id}`, or `group_{id}` for a
+group without a workspace. Handlers declare who a call is for and how many
+LLM and embedding calls it makes at most (`schedule_as`); the pools in
+executor.py then decide what runs next:
+
+- Fair queuing: every pool keeps one FIFO per tenant and serves them in
+  start-time fair queuing order, weighted by MEMORY_TENANT_WEIGHTS. A tenant
+  importing history with hundreds of queued calls gets its share of the
+  workers, not all of them, and another tenant's search waits for at most
+  one call per busy tenant instead of the whole backlog.
+- Rate limits: token buckets per tenant (MEMORY_TENANT_LLM_RPM,
+  MEMORY_TENANT_EMBED_RPM) and for the whole service (MEMORY_LLM_RPM,
+  MEMORY_EMBED_RPM, e.g. the Gemini quota). A tenant over its rate stays
+  queued while others keep going; a bucket may go negative by one call's
+  cost, so large batches are never blocked outright. Buckets are per
+  process and each worker gets 1/WEB_CONCURRENCY of every rate, so the
+  configured rates hold for the host (the buckets are checked on every
+  dispatch, under the pool lock, where a shared store would add I/O).
+- Reads before writes: writes cannot take the last MEMORY_READ_RESERVE share
+  of the service buckets, and while reads are queued the write pool starts
+  at most MEMORY_WRITE_WORKERS_UNDER_READ_LOAD calls at a time.
+- Queue shares: one tenant may hold at most MEMORY_TENANT_QUEUE_SHARE of a
+  pool's queue; beyond that its calls get 429 while others are still served.
+
+Costs are the caller's upper bound (an add is one extraction and one update
+LLM call), charged when the call starts; mem0 runs its internals on its own
+threads, so actual component calls cannot be attributed to a tenant.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from metrics import TENANT_QUEUE_DEPTH, TENANT_THROTTLED, TENANT_WAIT_SECONDS
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+def _parse_weights(raw: str) -> dict[str, float]:
+    """'workspace_1=2,workspace_7=0.5' -> {"workspace_1": 2.0, "workspace_7": 0.5}"""
+    weights = {}
+    for part in raw.split(","):
+        if "=" in part:
+            tenant, weight = part.split("=", 1)
+            weights[tenant.strip()] = float(weight)
+    return weights
+
+
+TENANT_WEIGHTS = _parse_weights(os.getenv("MEMORY_TENANT_WEIGHTS", ""))
+
+# Calls per minute; 0 = unlimited
+TENANT_LLM_RPM = float(os.getenv("MEMORY_TENANT_LLM_RPM", "0"))
+TENANT_EMBED_RPM = float(os.getenv("MEMORY_TENANT_EMBED_RPM", "0"))
+LLM_RPM = float(os.getenv("MEMORY_LLM_RPM", "0"))
+EMBED_RPM = float(os.getenv("MEMORY_EMBED_RPM", "0"))
+# Buckets hold this many seconds of their rate, the largest burst allowed
+BURST_SECONDS = float(os.getenv("MEMORY_RATE_BURST_SECONDS", "10"))
+# uvicorn worker processes sharing the rates above (each keeps its own buckets)
+WORKER_PROCESSES = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+# How often idle (full again) tenant buckets are dropped
+BUCKET_SWEEP_SECONDS = 60
+# Share of the service buckets only reads may use
+READ_RESERVE = float(os.getenv("MEMORY_READ_RESERVE", "0.2"))
+
+# Largest share of a pool's queue one tenant may hold
+TENANT_QUEUE_SHARE = float(os.getenv("MEMORY_TENANT_QUEUE_SHARE", "0.5"))
+
+
+def tenant_label(tenant: str) -> str:
+    """Metrics label: workspaces by id; groups without a workspace share one label."""
+    if tenant.startswith("workspace_"):
+        return tenant
+    return "groups" if tenant else "unscoped"
+
+
+# =============================================================================
+# Calls
+# =============================================================================
+
+class Call:
+    """Tenant and upper-bound LLM/embedding cost of a pool call."""
+
+    __slots__ = ("tenant", "llm", "embed")
+
+    def __init__(self, tenant: str = "", llm: int = 0, embed: int = 0):
+        self.tenant = tenant
+        self.llm = llm
+        self.embed = embed
+
+
+_current_call: ContextVar[Call] = ContextVar("memory_scheduler_call", default=Call())
+
+
+def schedule_as(agent_id: Optional[str], llm: int = 0, embed: int = 0) -> None:
+    """Attribute the following pool calls of this request (or task) to a tenant."""
+    _current_call.set(Call(agent_id or "", llm, embed))
+
+
+def current_call() -> Call:
+    return _current_call.get()
+
+
+# =============================================================================
+# Rate limits
+# =============================================================================
+
+class TokenBucket:
+    """`rate_per_minute` tokens per minute, holding at most BURST_SECONDS worth."""
+
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def full(self) -> bool:
+        """Whether the bucket refilled completely (it is then as good as a new one)."""
+        self._refill()
+        return self.tokens >= self.capacity
+
+    def delay(self, reserve: float = 0.0) -> float:
+        """Seconds until more than `reserve` of the capacity is available (0 = now)."""
+        self._refill()
+        floor = reserve * self.capacity
+        if self.tokens > floor:
+            return 0.0
+        return (floor - self.tokens) / self.rate + 0.001
+
+    def take(self, amount: int) -> None:
+        self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    Token buckets on LLM and embedding calls, per tenant and service-wide.
+    Rates are split evenly between the `workers` processes of the host.
+    """
+
+    RESOURCES = ("llm", "embed")
+
+    def __init__(self, workers: int = WORKER_PROCESSES):
+        self._lock = threading.Lock()
+        self._service = {
+            "llm": TokenBucket(LLM_RPM / workers) if LLM_RPM > 0 else None,
+            "embed": TokenBucket(EMBED_RPM / workers) if EMBED_RPM > 0 else None,
+        }
+        self._tenant_rpm = {"llm": TENANT_LLM_RPM / workers, "embed": TENANT_EMBED_RPM / workers}
+        self._tenants: dict[tuple[str, str], TokenBucket] = {}
+        self._swept = time.monotonic()
+
+    def _buckets(self, call: Call, resource: str) -> list[tuple[TokenBucket, bool]]:
+        """(bucket, is_service_bucket) pairs a call draws `resource` from."""
+        buckets = []
+        rpm = self._tenant_rpm[resource]
+        if rpm > 0:
+            key = (call.tenant, resource)
+            bucket = self._tenants.get(key)
+            if bucket is None:
+                bucket = self._tenants[key] = TokenBucket(rpm * TENANT_WEIGHTS.get(call.tenant, 1.0))
+            buckets.append((bucket, False))
+        if self._service[resource] is not None:
+            buckets.append((self._service[resource], True))
+        return buckets
+
+    def delay(self, call: Call, read: bool) -> tuple[float, Optional[str]]:
+        """Seconds `call` must wait for tokens, and the resource it waits for."""
+        with self._lock:
+            for resource in self.RESOURCES:
+                if not getattr(call, resource):
+                    continue
+                for bucket, service in self._buckets(call, resource):
+                    wait = bucket.delay(READ_RESERVE if service and not read else 0.0)
+                    if wait > 0:
+                        return wait, resource
+        return 0.0, None
+
+    def take(self, call: Call) -> None:
+        with self._lock:
+            for resource in self.RESOURCES:
+                amount = getattr(call, resource)
+                if amount:
+                    for bucket, _ in self._buckets(call, resource):
+                        bucket.take(amount)
+            if time.monotonic() - self._swept >= BUCKET_SWEEP_SECONDS:
+                self._sweep()
+
+    def _sweep(self) -> None:
+        """Forget tenant buckets that refilled: one is created again on the tenant's next call."""
+        for key in [key for key, bucket in self._tenants.items() if bucket.full()]:
+            del self._tenants[key]
+        self._swept = time.monotonic()
+
+
+rate_limiter = RateLimiter()
+
+
+# =============================================================================
+# Fair queue
+# =============================================================================
+
+class FairQueue:
+    """
+    Per-tenant FIFOs served in start-time fair queuing order.
+
+    Each queued call gets a start tag: max(virtual time, finish tag of the
+    tenant's previous call). The head with the smallest start tag runs next
+    and advances the virtual time to its tag; a tenant's finish tag grows by
+    1 / weight per call, so a heavier tenant is picked proportionally more
+    often. Not thread-safe; the owning pool holds its lock.
+    """
+
+    def __init__(self, pool: str, limiter: RateLimiter = rate_limiter):
+        self.pool = pool
+        self.limiter = limiter
+        self.read = pool == "read"
+        self._queues: dict[str, deque] = {}
+        self._finish: dict[str, float] = {}
+        self._virtual = 0.0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def depth(self, tenant: str) -> int:
+        queue = self._queues.get(tenant)
+        return len(queue) if queue else 0
+
+    def push(self, call: Call, item: Any) -> None:
+        start = max(self._virtual, self._finish.get(call.tenant, 0.0))
+        self._finish[call.tenant] = start + 1.0 / TENANT_WEIGHTS.get(call.tenant, 1.0)
+        # [start tag, call, item, enqueued at, throttled resources already counted]
+        self._queues.setdefault(call.tenant, deque()).append([start, call, item, time.monotonic(), set()])
+        self._size += 1
+        TENANT_QUEUE_DEPTH.labels(self.pool, tenant_label(call.tenant)).inc()
+
+    def pop(self) -> tuple[Optional[Any], float]:
+        """
+        Next runnable item, or None and the seconds until a throttled tenant
+        may run (inf when the queue is empty).
+        """
+        best = None
+        retry_in = float("inf")
+        for tenant, queue in self._queues.items():
+            entry = queue[0]
+            if best is not None and entry[0] >= best[0]:
+                continue
+            wait, resource = self.limiter.delay(entry[1], self.read)
+            if wait > 0:
+                if resource not in entry[4]:
+                    entry[4].add(resource)
+                    TENANT_THROTTLED.labels(self.pool, tenant_label(tenant), resource).inc()
+                retry_in = min(retry_in, wait)
+                continue
+            best = entry
+        if best is None:
+            return None, retry_in
+
+        start, call, item, enqueued_at, _ = best
+        queue = self._queues[call.tenant]
+        queue.popleft()
+        if not queue:
+            del self._queues[call.tenant]
+        self._size -= 1
+        self._virtual = start
+        # Tenants with nothing queued and no credit left are forgotten
+        for tenant in [t for t, finish in self._finish.items() if finish <= start and t not in self._queues]:
+            del self._finish[tenant]
+
+        self.limiter.take(call)
+        label = tenant_label(call.tenant)
+        TENANT_QUEUE_DEPTH.labels(self.pool, label).dec()
+        TENANT_WAIT_SECONDS.labels(self.pool, label).observe(time.monotonic() - enqueued_at)
+        return item, 0.0
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._size,
+            "tenants": {tenant: len(queue) for tenant, queue in self._queues.items()},
+        }
@@ -0,0 +1,259 @@
+"""
+Response encoding: orjson or MessagePack bodies, gzip/brotli compression.
+
+FastAPI validates a handler's return value against its response_model and
+turns it into plain Python objects (pydantic, in Python for `data: Any`),
+then json.dumps the result. For a 1000-item /memories/all page that is
+milliseconds of CPU per request, most of the handler's own cost
+(benchmarks/bench_serialization.py). Here:
+
+- EncodedRoute: handlers' return values skip response_model serialization
+  and are encoded in one pass by MemoryJSONResponse. response_model still
+  documents the schema in OpenAPI.
+- MemoryJSONResponse: orjson, or MessagePack when the request sent
+  `Accept: application/msgpack`; smaller and cheaper to decode for clients
+  with a msgpack decoder. Error responses from FastAPI itself (validation,
+  HTTPException) stay JSON; clients decode by Content-Type.
+- EncodingMiddleware: picks the body format for the request, and compresses
+  responses of at least MEMORY_COMPRESS_MIN_BYTES with brotli or gzip per
+  Accept-Encoding. Streamed responses (NDJSON export) are compressed chunk by
+  chunk, flushed after each one so lines are not held back.
+"""
+import functools
+import gzip
+import inspect
+import os
+import zlib
+from contextvars import ContextVar
+from decimal import Decimal
+from typing import Any, Callable, Optional
+
+import brotli
+import msgpack
+import orjson
+from fastapi.routing import APIRoute, request_response
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse, Response
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Smallest body compressed; 0 disables compression
+COMPRESS_MIN_BYTES = int(os.getenv("MEMORY_COMPRESS_MIN_BYTES", "1024"))
+# Compression costs more CPU than encoding; these levels keep it to a few ms
+# per 600 KB page (brotli 1 compresses about as well as gzip 5, 4x faster)
+GZIP_LEVEL = int(os.getenv("MEMORY_GZIP_LEVEL", "3"))
+BROTLI_QUALITY = int(os.getenv("MEMORY_BROTLI_QUALITY", "1"))
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "application/x-ndjson", "text/")
+
+
+# =============================================================================
+# Encoders
+# =============================================================================
+
+def _default(obj: Any) -> Any:
+    """Types orjson/msgpack do not encode natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return str(obj)
+
+
+def _default_msgpack(obj: Any) -> Any:
+    # msgpack has no datetime/UUID/enum types: send them as JSON would
+    return orjson.loads(orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS))
+
+
+def dumps_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def dumps_msgpack(content: Any) -> bytes:
+    return msgpack.packb(content, default=_default_msgpack, use_bin_type=True)
+
+
+def dumps_line(content: Any) -> bytes:
+    """One NDJSON line."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+
+
+# Body format the current request asked for: "json" | "msgpack"
+_wire_format: ContextVar[str] = ContextVar("memory_wire_format", default="json")
+
+
+def wants_msgpack(headers: Headers) -> bool:
+    accept = headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_TYPES)
+
+
+class MemoryJSONResponse(JSONResponse):
+    """JSON via orjson, or MessagePack when the request negotiated it."""
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            # Shallow: field values are encoded as they are, nested models by _default
+            content = dict(content)
+        if _wire_format.get() == "msgpack":
+            self.media_type = MSGPACK_TYPES[0]
+            return dumps_msgpack(content)
+        return dumps_json(content)
+
+
+class EncodedRoute(APIRoute):
+    """
+    Route whose handler results are encoded by MemoryJSONResponse directly,
+    without FastAPI's response_model validation and conversion. Handlers
+    returning a Response (streams, /metrics) are passed through.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        # Dependencies are resolved from the handler's own signature and module;
+        # only the call made with them is replaced
+        if inspect.iscoroutinefunction(endpoint):
+            self.dependant.call = _encoded(endpoint)
+            self.app = request_response(self.get_route_handler())
+
+
+def _encoded(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        return MemoryJSONResponse(result)
+
+    return wrapper
+
+
+# =============================================================================
+# Middleware
+# =============================================================================
+
+def _choose_encoding(headers: Headers) -> Optional[str]:
+    """br or gzip per Accept-Encoding (q=0 excluded), br preferred."""
+    accepted = set()
+    for part in headers.get("accept-encoding", "").split(","):
+        token, _, params = part.partition(";")
+        name, _, value = params.partition("=")
+        try:
+            if name.strip() == "q" and float(value) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(token.strip().lower())
+    for encoding in ("br", "gzip"):
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+    @staticmethod
+    def compress_whole(encoding: str, data: bytes) -> bytes:
+        if encoding == "br":
+            return brotli.compress(data, quality=BROTLI_QUALITY)
+        return gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+
+class EncodingMiddleware:
+    """
+    ASGI middleware: body format negotiation (see MemoryJSONResponse) and
+    response compression. Plain ASGI, like MetricsMiddleware.
+    """
+
+    def __init__(self, app, min_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.min_size = min_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        token = _wire_format.set("msgpack" if wants_msgpack(headers) else "json")
+        try:
+            encoding = _choose_encoding(headers) if self.min_size > 0 else None
+            if encoding is None:
+                await self.app(scope, receive, send)
+            else:
+                await self.app(scope, receive, _CompressingSend(send, encoding, self.min_size))
+        finally:
+            _wire_format.reset(token)
+
+
+class _CompressingSend:
+    """`send` wrapper compressing the response body once it is known to qualify."""
+
+    def __init__(self, send, encoding: str, min_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.min_size = min_size
+        self.start: Optional[dict] = None  # held until the first body chunk
+        self.compressor: Optional[_Compressor] = None
+
+    async def __call__(self, message: dict) -> None:
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if self.start is not None:
+            await self._first_body(self.start, message)
+            self.start = None
+        elif self.compressor is not None:
+            more_body = message.get("more_body", False)
+            body = self.compressor.compress(message.get("body", b""), final=not more_body)
+            await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
+        else:
+            await self.send(message)
+
+    async def _first_body(self, start: dict, message: dict) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        headers = MutableHeaders(raw=start["headers"])
+        compressible = (
+            "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            and (more_body or len(body) >= self.min_size)
+        )
+        if not compressible:
+            await self.send(start)
+            await self.send(message)
+            return
+
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        if more_body:
+            del headers["content-length"]
+            self.compressor = _Compressor(self.encoding)
+            body = self.compressor.compress(body, final=False)
+        else:
+            body = _Compressor.compress_whole(self.encoding, body)
+            headers["content-length"] = str(len(body))
+        await self.send(start)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,123 @@
+"""
+Cross-worker shared state.
+
+With several uvicorn workers each process has its own Memory, executors and
+in-process caches. State that must agree across workers lives here, in a SQLite
+file on the host (the same volume as the job queue):
+
+- counters: monotonically increasing integers, e.g. per-scope generations
+  used to invalidate every worker's search cache after a write
+- windowed counters: fixed-window hit counts, so that one worker per host
+  starts each compaction cycle; a key keeps only its current window
+
+The job queue (jobs.py) and the embedding disk tier (embedding_cache.py) are
+already file-backed and therefore shared as well.
+
+These SQLite calls wait up to 30 s for another worker's lock; async handlers
+make them through `run_io`, on a few dedicated threads, so lock contention
+never stalls the event loop.
+"""
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+SHARED_STATE_DB = os.getenv("MEMORY_SHARED_STATE_DB", "memory_state.db")
+# Threads running host-shared SQLite calls for async handlers
+SHARED_IO_WORKERS = 4
+
+
+# =============================================================================
+# Store
+# =============================================================================
+
+class SharedState:
+    """SQLite-backed counters shared by all worker processes on a host."""
+
+    def __init__(self, path: str = SHARED_STATE_DB):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, created (with the schema) on first use
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters ("
+                "key TEXT PRIMARY KEY, value INTEGER NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> int:
+        row = self._conn().execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Atomically add `amount` to a counter and return the new value."""
+        row = self._conn().execute(
+            "INSERT INTO counters (key, value, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value, updated_at = excluded.updated_at "
+            "RETURNING value",
+            (key, amount, time.time()),
+        ).fetchone()
+        return row[0]
+
+    def hit(self, key: str, window_seconds: float) -> int:
+        """
+        Count a hit in the current fixed window; returns hits so far in the
+        window. The first hit of a window prunes the key's earlier windows.
+        """
+        window_key = f"{key}@{int(time.time() // window_seconds)}"
+        hits = self.incr(window_key)
+        if hits == 1:
+            self.prune(key, window_key)
+        return hits
+
+    def prune(self, key: str, current: str) -> int:
+        """Drop the windows of `key` other than `current`. Generations are kept."""
+        prefix = f"{key}@"
+        cur = self._conn().execute(
+            "DELETE FROM counters WHERE substr(key, 1, ?) = ? AND key != ?",
+            (len(prefix), prefix, current),
+        )
+        return cur.rowcount
+
+
+shared_state = SharedState()
+
+
+_io_executor = ThreadPoolExecutor(max_workers=SHARED_IO_WORKERS, thread_name_prefix="mem0-state")
+
+
+async def run_io(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking call on a host-shared SQLite file (this module, dedup, jobs) off the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_io_executor, functools.partial(fn, *args, **kwargs))
+
+
+def scope_generation(tag: str) -> Optional[int]:
+    """Shared generation of a cache scope, or None if the shared store is unavailable."""
+    try:
+        return shared_state.get(f"gen:{tag}")
+    except sqlite3.Error as e:
+        print(f"[Memory Service] Shared state read failed: {e}")
+        return None
+
+
+def bump_scope_generation(tag: str) -> None:
+    """Invalidate a scope in every worker's cache."""
+    try:
+        shared_state.incr(f"gen:{tag}")
+    except sqlite3.Error as e:
+        print(f"[Memory Service] Shared state write failed: {e}")
@@ -0,0 +1,118 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from batching import MicroBatcher, extract_facts_batch
+
+
+def fake_memory(response: str) -> SimpleNamespace:
+    """Memory stand-in whose extraction LLM answers `response`."""
+    calls = []
+
+    def generate_response(messages, response_format=None):
+        calls.append(messages)
+        return response
+
+    return SimpleNamespace(
+        config=SimpleNamespace(custom_fact_extraction_prompt="Extract facts."),
+        llm=SimpleNamespace(generate_response=generate_response),
+        calls=calls,
+    )
+
+
+def item(text: str, sender: str = "An") -> dict:
+    return {
+        "messages": [{"role": "user", "content": text}],
+        "add_kwargs": {"user_id": "u1", "agent_id": "workspace_1", "metadata": {"sender_name": sender}},
+    }
+
+
+@pytest.mark.parametrize("facts, count, expected", [
+    # Facts go back to the message that produced them
+    (
+        [{"source": 1, "text": "An thích cà phê"}, {"source": 3, "text": "Bình ở Hà Nội"}],
+        3,
+        [["An thích cà phê"], [], ["Bình ở Hà Nội"]],
+    ),
+    ([{"source": "2", "fact": " Họp lúc 9h "}], 2, [[], ["Họp lúc 9h"]]),
+    # Out-of-range or malformed sources are dropped
+    ([{"source": 0, "text": "a"}, {"source": 4, "text": "b"}, {"source": "x", "text": "c"}], 3, [[], [], []]),
+    ([{"source": 1, "text": ""}, {"source": 1}], 1, [[]]),
+    # Unattributed facts are dropped when the batch has several messages...
+    (["An thích cà phê", {"source": 2, "text": "Bình ở Hà Nội"}], 2, [[], ["Bình ở Hà Nội"]]),
+    # ...and kept for a single message
+    (["An thích cà phê"], 1, [["An thích cà phê"]]),
+])
+def test_facts_map_to_source_message(facts, count, expected):
+    memory = fake_memory(json.dumps({"facts": facts}, ensure_ascii=False))
+    items = [item(f"message {i}") for i in range(count)]
+    assert extract_facts_batch(memory, items) == expected
+
+
+def test_one_llm_call_numbers_every_message():
+    memory = fake_memory('{"facts": []}')
+    items = [item("xin chào", sender="An"), item("dòng 1\ndòng 2", sender="Bình")]
+    assert extract_facts_batch(memory, items) == [[], []]
+
+    assert len(memory.calls) == 1
+    system, user = memory.calls[0]
+    assert system["content"].startswith("Extract facts.")
+    assert user["content"] == "Input:\n[1] An: xin chào\n[2] Bình: dòng 1 | dòng 2"
+
+
+@pytest.mark.parametrize("response", ["not json at all", ""])
+def test_unparseable_response_yields_no_facts(response):
+    memory = fake_memory(response)
+    assert extract_facts_batch(memory, [item("a"), item("b")]) == [[], []]
+
+
+# =============================================================================
+# Micro-batcher
+# =============================================================================
+
+def run_batcher(process, keys: list[str], max_size: int = 10) -> list:
+    """Submit one item per key concurrently; results (or exceptions) in order."""
+    async def main():
+        batcher = MicroBatcher(process, max_size=max_size, window_seconds=0.01)
+        submits = [batcher.submit(key, {"n": n}) for n, key in enumerate(keys)]
+        return await asyncio.gather(*submits, return_exceptions=True)
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("keys, max_size, batches", [
+    (["a", "a", "a"], 10, [[0, 1, 2]]),
+    # Scopes are never mixed
+    (["a", "b", "a"], 10, [[0, 2], [1]]),
+    # A full bucket is flushed without waiting for the window
+    (["a", "a", "a"], 2, [[0, 1], [2]]),
+])
+def test_micro_batcher_groups_by_scope(keys, max_size, batches):
+    seen = []
+
+    async def process(items):
+        seen.append([i["n"] for i in items])
+        return [i["n"] * 10 for i in items]
+
+    assert run_batcher(process, keys, max_size) == [n * 10 for n in range(len(keys))]
+    assert sorted(seen) == batches
+
+
+def test_micro_batcher_delivers_per_item_exceptions():
+    error = RuntimeError("update stage failed")
+
+    async def process(items):
+        return [error if i["n"] == 1 else {"results": []} for i in items]
+
+    assert run_batcher(process, ["a", "a", "a"]) == [{"results": []}, error, {"results": []}]
+
+
+def test_micro_batcher_fails_whole_batch_on_error():
+    error = RuntimeError("LLM down")
+
+    async def process(items):
+        raise error
+
+    assert run_batcher(process, ["a", "a"]) == [error, error]
@@ -0,0 +1,85 @@
+from datetime import date
+
+import pytest
+
+import compaction
+from compaction import clusters, is_expired, last_date, number_signature, pick_survivor
+
+TODAY = date(2026, 6, 1)
+
+
+@pytest.fixture(autouse=True)
+def retention(monkeypatch):
+    monkeypatch.setattr(compaction, "RETENTION_DAYS", 30)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Lịch họp ngày 18/12/2026 lúc 10:00", date(2026, 12, 18)),
+    ("Bay từ 02/03/2025 đến 05/03/2025", date(2025, 3, 5)),
+    ("Nộp báo cáo trong tháng 2/2024", date(2024, 2, 29)),
+    ("Kế hoạch tháng 12/2025", date(2025, 12, 31)),
+    ("Ngày 31/02/2025 không tồn tại", None),
+    ("Họp team lúc 9h", None),
+])
+def test_last_date(text, expected):
+    assert last_date(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Lịch họp với khách hàng ngày 10/01/2026",
+    "Anh Nam hẹn gặp đối tác ngày 02/04/2026",
+    "Hạn nộp hồ sơ là 15/03/2026",
+    "Deadline dự án ngày 20/04/2026",
+    "Chuyến bay đi Hà Nội ngày 01/02/2026",
+    "Cuộc họp quý diễn ra trong tháng 3/2026",
+])
+def test_past_schedule_facts_expire(text):
+    assert is_expired(text, TODAY)
+
+
+@pytest.mark.parametrize("text", [
+    # Everyday words sharing a syllable with schedule words
+    "Công ty hạn chế làm thêm giờ từ 01/01/2020",
+    "Chị Lan thích đọc lịch sử, mua sách ngày 03/03/2019",
+    "Cả nhà đi du lịch Đà Nẵng ngày 10/07/2023",
+    "Gặp vợ lần đầu ngày 12/05/2015",
+    # Dated facts that stay true
+    "Sinh nhật anh Minh ngày 12/05/1990, có hẹn ăn tối mỗi năm",
+    "Kỷ niệm thành lập công ty, cuộc họp toàn thể ngày 01/03/2010",
+])
+def test_permanent_facts_do_not_expire(text):
+    assert not is_expired(text, TODAY)
+
+
+def test_expiry_waits_for_retention_and_can_be_disabled(monkeypatch):
+    assert not is_expired("Lịch họp ngày 10/05/2026", TODAY)
+    assert not is_expired("Lịch họp tuần sau", TODAY)
+    monkeypatch.setattr(compaction, "RETENTION_DAYS", 0)
+    assert not is_expired("Lịch họp ngày 10/01/2020", TODAY)
+
+
+def test_number_signature():
+    assert number_signature("Họp lúc 10:00 ngày 18/12/2026") == number_signature("18/12/2026, 10:00: họp")
+    assert number_signature("Họp lúc 10:00 ngày 18/12/2026") != number_signature("Họp lúc 11:00 ngày 18/12/2026")
+    assert number_signature("Thích cà phê") == ()
+
+
+def test_clusters():
+    groups = clusters([("a", "b"), ("b", "c"), ("d", "e"), ("f", "f")])
+    assert sorted(map(sorted, groups)) == [["a", "b", "c"], ["d", "e"]]
+    assert clusters([]) == []
+
+
+def test_pick_survivor():
+    payloads = {
+        "a": {"data": "Họp lúc 10:00", "created_at": "2026-01-02T00:00:00+00:00"},
+        "b": {"data": "Họp khách hàng lúc 10:00", "created_at": "2026-01-01T00:00:00+00:00"},
+        "c": {"data": "Họp nhóm A lúc 10:00", "updated_at": "2026-01-03T00:00:00"},
+        "d": {"data": "Họp nhóm B lúc 10:00", "created_at": "2026-01-01T00:00:00+00:00"},
+        "e": {"data": "Họp nhóm C lúc 10:00"},
+    }
+    # Longest text wins
+    assert pick_survivor({"a", "b"}, payloads) == "b"
+    # Same length: most recently written (naive timestamps are UTC), then undated last
+    assert pick_survivor({"c", "d", "e"}, payloads) == "c"
+    assert pick_survivor({"d", "e"}, payloads) == "d"
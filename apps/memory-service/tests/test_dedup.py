@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from dedup import AddDeduplicator, DedupStore
+
+
+@pytest.fixture
+def dedup(tmp_path):
+    return AddDeduplicator(DedupStore(path=str(tmp_path / "dedup.db"), ttl=3600))
+
+
+class SlowAdd:
+    """Add stand-in that blocks until released, then returns or raises `outcome`."""
+
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        self.started.set()
+        await self.release.wait()
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+async def copies(dedup: AddDeduplicator, add: SlowAdd, count: int, key: str = "add:k") -> list[asyncio.Task]:
+    """Start `count` concurrent copies of one add and wait until the first one runs."""
+    tasks = [asyncio.create_task(dedup.run(key, "workspace_1", add)) for _ in range(count)]
+    await add.started.wait()
+    return tasks
+
+
+@pytest.mark.parametrize("count", [1, 2, 5])
+def test_concurrent_copies_run_once(dedup, count):
+    result = {"results": [{"id": "m1", "event": "ADD"}]}
+
+    async def main():
+        add = SlowAdd(result)
+        tasks = await copies(dedup, add, count)
+        add.release.set()
+        return add, await asyncio.gather(*tasks)
+
+    add, results = asyncio.run(main())
+    assert add.calls == 1
+    assert results == [result] * count
+    assert (dedup.misses, dedup.coalesced, dedup.hits) == (1, count - 1, 0)
+    assert dedup.store.get("add:k") == result
+
+
+def test_later_copy_gets_stored_result(dedup):
+    async def main():
+        first, second = SlowAdd({"results": []}), SlowAdd({"results": ["other"]})
+        first.release.set()
+        second.release.set()
+        return first, second, [await dedup.run("add:k", "workspace_1", add) for add in (first, second)]
+
+    first, second, results = asyncio.run(main())
+    assert results == [{"results": []}, {"results": []}]
+    assert (first.calls, second.calls, dedup.hits) == (1, 0, 1)
+
+
+def test_failed_add_reaches_waiters_and_is_not_remembered(dedup):
+    error = RuntimeError("LLM down")
+
+    async def main():
+        add = SlowAdd(error)
+        tasks = await copies(dedup, add, 3)
+        add.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # A retry runs the add again
+        retry = SlowAdd({"results": []})
+        retry.release.set()
+        return results, await dedup.run("add:k", "workspace_1", retry), retry
+
+    results, retried, retry = asyncio.run(main())
+    assert results == [error] * 3
+    assert retried == {"results": []} and retry.calls == 1
+    assert dedup._inflight == {}
+
+
+def test_cancelled_add_releases_waiters(dedup):
+    async def main():
+        add = SlowAdd({"results": []})
+        tasks = await copies(dedup, add, 3)
+        await asyncio.sleep(0)  # let the copies start waiting
+        tasks[0].cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        inflight = dict(dedup._inflight)
+        retry = SlowAdd({"results": []})
+        retry.release.set()
+        await dedup.run("add:k", "workspace_1", retry)
+        return results, inflight, retry
+
+    results, inflight, retry = asyncio.run(main())
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+    assert inflight == {}
+    assert retry.calls == 1
+    assert dedup.store.get("add:k") == {"results": []}
+
+
+def test_disabled_store_runs_every_copy(tmp_path):
+    dedup = AddDeduplicator(DedupStore(path=str(tmp_path / "dedup.db"), ttl=0))
+
+    async def main():
+        add = SlowAdd({"results": []})
+        add.release.set()
+        await asyncio.gather(*(dedup.run("add:k", "workspace_1", add) for _ in range(3)))
+        return add
+
+    assert asyncio.run(main()).calls == 3
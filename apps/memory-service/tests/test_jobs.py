@@ -0,0 +1,53 @@
+import time
+
+import pytest
+
+from jobs import JobQueue
+
+DAY = 86400
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(path=str(tmp_path / "jobs.db"), max_attempts=1)
+
+
+def finish(queue: JobQueue, status: str, age: float) -> str:
+    """Enqueue, claim and finish a job with `status`, `age` seconds ago."""
+    job_id = queue.enqueue("add", {"messages": []})
+    job = queue.claim()
+    if status == "done":
+        queue.complete(job_id, {"results": []})
+    elif status == "dead":
+        queue.fail(job_id, job["attempts"], "boom", transient=False)
+    with queue._connect() as conn:
+        conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - age, job_id))
+    return job_id
+
+
+@pytest.mark.parametrize("status, age, kept", [
+    ("done", 8 * DAY, False),
+    ("dead", 8 * DAY, False),
+    ("done", 1 * DAY, True),
+    ("dead", 1 * DAY, True),
+    # Unfinished jobs are never pruned, however old
+    ("running", 8 * DAY, True),
+])
+def test_prune_deletes_finished_jobs_past_retention(queue, status, age, kept):
+    job_id = finish(queue, status, age)
+    assert queue.prune(7 * DAY) == (0 if kept else 1)
+    assert (queue.get(job_id) is not None) == kept
+
+
+def test_prune_keeps_queued_jobs(queue):
+    job_id = queue.enqueue("add", {"messages": []})
+    with queue._connect() as conn:
+        conn.execute("UPDATE jobs SET updated_at = 0 WHERE id = ?", (job_id,))
+    assert queue.prune(DAY) == 0
+    assert queue.get(job_id)["status"] == "queued"
+
+
+def test_zero_retention_keeps_everything(queue):
+    job_id = finish(queue, "done", 365 * DAY)
+    assert queue.prune(0) == 0
+    assert queue.get(job_id)["status"] == "done"
@@ -0,0 +1,162 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import scheduler
+from executor import BoundedExecutor
+from scheduler import Call, FairQueue, RateLimiter, TokenBucket
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scheduler, "time", SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(scheduler, "TENANT_WEIGHTS", {})
+    for name in ("LLM_RPM", "EMBED_RPM", "TENANT_LLM_RPM", "TENANT_EMBED_RPM"):
+        monkeypatch.setattr(scheduler, name, 0.0)
+    return clock
+
+
+def drain(queue: FairQueue) -> list:
+    order = []
+    while True:
+        item, _ = queue.pop()
+        if item is None:
+            return order
+        order.append(item)
+
+
+# =============================================================================
+# Fair queue
+# =============================================================================
+
+@pytest.mark.parametrize("pushes, expected", [
+    # A backlog does not hold back a tenant arriving later
+    (["a1", "a2", "a3", "b1"], ["a1", "b1", "a2", "a3"]),
+    (["a1", "a2", "b1", "b2", "c1"], ["a1", "b1", "c1", "a2", "b2"]),
+    # One tenant alone is served in FIFO order
+    (["a1", "a2", "a3"], ["a1", "a2", "a3"]),
+])
+def test_fair_queue_interleaves_tenants(pushes, expected):
+    queue = FairQueue("write", limiter=RateLimiter(workers=1))
+    for item in pushes:
+        queue.push(Call(item[0]), item)
+    assert drain(queue) == expected
+
+
+@pytest.mark.parametrize("weights, expected", [
+    ({}, ["a", "b", "a", "b", "a", "b", "a", "b"]),
+    ({"a": 2.0}, ["a", "b", "a", "a", "b", "a", "b", "b"]),
+    ({"b": 3.0}, ["a", "b", "b", "b", "a", "b", "a", "a"]),
+])
+def test_fair_queue_weights(monkeypatch, weights, expected):
+    monkeypatch.setattr(scheduler, "TENANT_WEIGHTS", weights)
+    queue = FairQueue("write", limiter=RateLimiter(workers=1))
+    for tenant in ("a", "b"):
+        for _ in range(4):
+            queue.push(Call(tenant), tenant)
+    assert drain(queue) == expected
+
+
+def test_fair_queue_skips_rate_limited_tenant(monkeypatch, clock):
+    # 6 calls per minute, one token: a's first call leaves the bucket at -1
+    monkeypatch.setattr(scheduler, "TENANT_LLM_RPM", 6.0)
+    queue = FairQueue("write", limiter=RateLimiter(workers=1))
+    queue.push(Call("a", llm=2), "a1")
+    queue.push(Call("a", llm=2), "a2")
+    queue.push(Call("b", llm=1), "b1")
+
+    assert drain(queue) == ["a1", "b1"]
+    item, retry_in = queue.pop()
+    assert item is None
+    assert retry_in == pytest.approx(10.0, abs=0.01)
+
+    clock.now += retry_in
+    assert drain(queue) == ["a2"]
+    assert queue.pop() == (None, float("inf"))
+
+
+# =============================================================================
+# Rate limits
+# =============================================================================
+
+def test_token_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(60)  # 1 per second, 10 seconds of burst
+    assert bucket.capacity == 10
+    bucket.take(10)
+    assert bucket.delay() == pytest.approx(0.001)
+    clock.now += 3
+    assert bucket.delay() == 0.0
+    assert not bucket.full()
+    clock.now += 60
+    assert bucket.full()
+    assert bucket.tokens == 10
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+def test_rates_are_split_between_worker_processes(monkeypatch, workers):
+    monkeypatch.setattr(scheduler, "LLM_RPM", 600.0)
+    monkeypatch.setattr(scheduler, "TENANT_EMBED_RPM", 120.0)
+    limiter = RateLimiter(workers=workers)
+    assert limiter._service["llm"].rate == pytest.approx(10.0 / workers)
+    assert limiter._service["embed"] is None
+    assert limiter._tenant_rpm == {"llm": 0.0, "embed": 120.0 / workers}
+
+
+@pytest.mark.parametrize("read, waits", [(True, False), (False, True)])
+def test_writes_leave_read_reserve(monkeypatch, read, waits):
+    monkeypatch.setattr(scheduler, "LLM_RPM", 60.0)
+    monkeypatch.setattr(scheduler, "READ_RESERVE", 0.2)
+    limiter = RateLimiter(workers=1)
+    call = Call("a", llm=9)
+    limiter.take(call)  # 1 of 10 tokens left, below the 2 reserved for reads
+    wait, resource = limiter.delay(call, read)
+    assert (wait > 0) == waits
+    assert resource == ("llm" if waits else None)
+
+
+def test_idle_tenant_buckets_are_swept(monkeypatch, clock):
+    monkeypatch.setattr(scheduler, "TENANT_LLM_RPM", 60.0)
+    limiter = RateLimiter(workers=1)
+    limiter.take(Call("a", llm=5))
+    assert ("a", "llm") in limiter._tenants
+
+    clock.now += scheduler.BUCKET_SWEEP_SECONDS
+    limiter.take(Call("b", llm=5))
+    assert set(limiter._tenants) == {("b", "llm")}
+
+
+# =============================================================================
+# Read priority
+# =============================================================================
+
+def test_writes_yield_workers_while_reads_wait():
+    read = BoundedExecutor("read", 1, 4)
+    write = BoundedExecutor("write", 4, 4)
+    write.yield_to = read
+    write.yield_workers = 1
+    release = threading.Event()
+    try:
+        read._queue.push(Call(), "waiting read")
+        futures = [write.submit(release.wait) for _ in range(3)]
+        assert (write._running, write.queue_depth) == (1, 2)
+
+        # Reads drained: the write pool uses all its workers again
+        read._queue.pop()
+        write.dispatch()
+        assert (write._running, write.queue_depth) == (3, 0)
+        release.set()
+        assert all(future.result(timeout=5) for future in futures)
+    finally:
+        release.set()
+        read.shutdown()
+        write.shutdown()
@@ -2,6 +2,7 @@
 export {
   addMemory,
   searchMemories,
+  getMemoryContext,
   getAllMemories,
   updateMemory,
   deleteMemory,
@@ -10,6 +11,7 @@ export {
   isMemoryEnabled,
   getMemoryHealth,
   type MemoryItem,
+  type MemoryContext,
   type MemoryHistoryEntry,
   type ContextMessage,
 } from './mem0-client.js';
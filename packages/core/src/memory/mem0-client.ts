@@ -14,6 +14,17 @@ export interface MemoryItem {
   updated_at?: string;
 }
 
+// Prompt-ready bundle from /memories/context (compact view)
+export interface MemoryContext {
+  context: string;
+  memories: Array<Pick<MemoryItem, 'id' | 'memory' | 'score' | 'created_at'> & {
+    sender_name?: string;
+    sent_at?: string;
+  }>;
+  tokens: number;
+  omitted: number;
+}
+
 // Type for memory history entries
 export interface MemoryHistoryEntry {
   id: string;
@@ -24,9 +35,9 @@ export interface MemoryHistoryEntry {
   timestamp: string;
 }
 
-interface MemoryResponse {
+interface MemoryResponse<T = unknown[]> {
   success: boolean;
-  data?: unknown[];
+  data?: T;
   error?: string;
 }
 
@@ -87,8 +98,9 @@ export async function addMemory(params: {
   sentAt?: Date;
   contextMessages?: ContextMessage[];  // Recent messages for context
   metadata?: Record<string, unknown>;
+  asyncMode?: boolean;  // Queue extraction in the service and return immediately
 }): Promise<void> {
-  const { userId, groupId, workspaceId, message, senderName, groupName, platform, sentAt, contextMessages } = params;
+  const { userId, groupId, workspaceId, message, senderName, groupName, platform, sentAt, contextMessages, asyncMode } = params;
 
   // Format context messages as conversation if provided
   let messageToSend = message;
@@ -109,6 +121,7 @@ export async function addMemory(params: {
     group_name: groupName,
     platform,
     sent_at: sentAt?.toISOString(),
+    async_mode: asyncMode,
   });
 
   if (!response.success) {
@@ -145,6 +158,44 @@ export async function searchMemories(params: {
   return (response.data as MemoryItem[]) || [];
 }
 
+/**
+ * Memories for a chat turn in one call: searches all queries concurrently,
+ * de-duplicates hits, appends recent memories and trims to a token budget
+ * Multi-tenant scoping via workspaceId
+ */
+export async function getMemoryContext(params: {
+  userId: string;
+  groupId: string;
+  workspaceId?: string;
+  queries: string[];
+  limit?: number;
+  recent?: number;
+  maxTokens?: number;
+}): Promise<MemoryContext | null> {
+  const { userId, groupId, workspaceId, queries, limit = 5, recent = 0, maxTokens } = params;
+
+  const response = await memoryRequest<MemoryResponse<MemoryContext>>(
+    '/memories/context',
+    'POST',
+    {
+      user_id: userId,
+      group_id: groupId,
+      workspace_id: workspaceId,
+      queries,
+      limit,
+      recent,
+      max_tokens: maxTokens,
+    }
+  );
+
+  if (!response.success) {
+    console.error('[Memory] Context failed:', response.error);
+    return null;
+  }
+
+  return response.data ?? null;
+}
+
 /**
  * Get all memories for a user/group
  * Multi-tenant scoping via workspaceId
@@ -225,23 +276,31 @@ export async function getMemoryHistory(
 /**
  * Delete all memories for a user/group
  * Multi-tenant scoping via workspaceId
+ * Returns the number of memories deleted (0 on failure)
  */
 export async function deleteAllMemories(params: {
   userId: string;
   groupId: string;
   workspaceId?: string;
-}): Promise<void> {
+}): Promise<number> {
   const { userId, groupId, workspaceId } = params;
 
-  const response = await memoryRequest<MemoryResponse>('/memories/delete-all', 'POST', {
-    user_id: userId,
-    group_id: groupId,
-    workspace_id: workspaceId,
-  });
+  const response = await memoryRequest<MemoryResponse<{ deleted: number }>>(
+    '/memories/delete-all',
+    'POST',
+    {
+      user_id: userId,
+      group_id: groupId,
+      workspace_id: workspaceId,
+    }
+  );
 
   if (!response.success) {
     console.error('[Memory] DeleteAll failed:', response.error);
+    return 0;
   }
+
+  return response.data?.deleted ?? 0;
 }
 
 interface HealthResponse {